@@ -1,6 +1,5 @@
 import sys
 from pathlib import Path
-import pandas as pd
 
 
 
@@ -15,43 +14,140 @@ import pandas as pd
 #Adding project root to sys.path
 sys.path.append(str(Path(__file__).parent))
 
-from src.storage.database_sqlite import DataSQLiteStorage
+from src.storage.database_sqlite import (
+	DataSQLiteStorage,
+	UNIQUE_MEMBERS_ROLLUP_QUERY,
+	TOP_ZIP5_ROLLUP_QUERY,
+	INGESTION_ERROR_RATE_ROLLUP_QUERY,
+	REJECT_REASONS_ROLLUP_QUERY,
+	MEMBERS_BY_ZIP5_QUERY,
+	MEMBERS_BY_PLAN_QUERY,
+	MEMBERS_INGESTED_SINCE_QUERY,
+	IDENTITY_LOOKUP_QUERY,
+	MEMBERS_AS_OF_QUERY
+)
 
-def analytics_queries():
-	
-
-	
-	print("*********************************************\n")
-	print("Count of unique members per client\n")
-	unique_member_query = """
+# Same answers computed from the base tables with full GROUP BY scans
+UNIQUE_MEMBERS_QUERY = """
 		SELECT client_id, COUNT(distinct member_id) as unique_member_count
 		FROM members
 		GROUP BY client_id
 	"""
 
-	storage = DataSQLiteStorage()
-	conn = storage._db_connection()
-
-	unique_member_df = pd.read_sql(unique_member_query, conn)
-
-	print(unique_member_df)
-	print("*********************************************\n")
-	print("Top ZIP codes by member count\n")
-	top_zip5_query = """
+TOP_ZIP5_QUERY = """
 		SELECT zip5, count(*) as member_count
 		FROM members
 		GROUP BY zip5
 		ORDER BY member_count DESC
 	"""
-	top_zip5_member_df = pd.read_sql(top_zip5_query, conn)
-	print(top_zip5_member_df)
+
+INGESTION_ERROR_RATE_QUERY = "SELECT client_id, sum(invalid_rows) * 1.0 / SUM(total_rows) as ingestion_error_rate from audit_log GROUP BY client_id;"
+
+# Every query shipped with the project, checked by check_query_plans
+SHIPPED_QUERIES = {
+	"unique_members": UNIQUE_MEMBERS_QUERY,
+	"top_zip5": TOP_ZIP5_QUERY,
+	"ingestion_error_rate": INGESTION_ERROR_RATE_QUERY,
+	"unique_members_rollup": UNIQUE_MEMBERS_ROLLUP_QUERY,
+	"top_zip5_rollup": TOP_ZIP5_ROLLUP_QUERY,
+	"ingestion_error_rate_rollup": INGESTION_ERROR_RATE_ROLLUP_QUERY,
+	"reject_reasons_rollup": REJECT_REASONS_ROLLUP_QUERY,
+	"members_by_zip5": MEMBERS_BY_ZIP5_QUERY,
+	"members_by_plan": MEMBERS_BY_PLAN_QUERY,
+	"members_ingested_since": MEMBERS_INGESTED_SINCE_QUERY,
+	"identity_lookup": IDENTITY_LOOKUP_QUERY,
+	"members_as_of": MEMBERS_AS_OF_QUERY,
+}
+
+# The base table versions of the rollup answers (--full-scan) read a whole covering
+# index by design, every other shipped query has to seek
+ALLOWED_INDEX_SCANS = {
+	"unique_members": ("idx_members_client_member",),
+	"top_zip5": ("idx_members_zip5",),
+	"ingestion_error_rate": ("idx_audit_log_client_rows",),
+}
+
+def format_table(columns, rows) -> str:
+	"""
+	Plain text table of a few result rows - no pandas import just to print them
+	"""
+	cells = [[str(column) for column in columns]] + [["" if value is None else str(value) for value in row] for row in rows]
+	widths = [max(len(row[i]) for row in cells) for i in range(len(columns))]
+	return "\n".join("  ".join(value.rjust(width) for value, width in zip(row, widths)) for row in cells)
+
+def print_query(storage: DataSQLiteStorage, sql: str):
+	print(format_table(*storage.query_table(sql)))
+
+def check_query_plans(storage: DataSQLiteStorage = None):
+	"""
+	Fails (RuntimeError) if any shipped query falls back to a full table scan
+	"""
+	storage = storage or DataSQLiteStorage()
+	storage.check_query_plans(SHIPPED_QUERIES, allowed_index_scans=ALLOWED_INDEX_SCANS)
+	print(f"Query plans OK - {len(SHIPPED_QUERIES)} queries use indexes")
+
+def analytics_queries(use_rollups: bool = True, storage: DataSQLiteStorage = None):
+	"""
+	use_rollups - read the summary tables DataSQLiteStorage maintains at ingest time,
+	False runs the original queries over members/audit_log
+	storage - a long lived DataSQLiteStorage(query_cache_size=...) serves repeated calls
+	(dashboards) from its result cache until a client's data changes
+	"""
+	if use_rollups:
+		unique_member_query = UNIQUE_MEMBERS_ROLLUP_QUERY
+		top_zip5_query = TOP_ZIP5_ROLLUP_QUERY
+		ingestion_error_rate_query = INGESTION_ERROR_RATE_ROLLUP_QUERY
+	else:
+		unique_member_query = UNIQUE_MEMBERS_QUERY
+		top_zip5_query = TOP_ZIP5_QUERY
+		ingestion_error_rate_query = INGESTION_ERROR_RATE_QUERY
+
+	print("*********************************************\n")
+	print("Count of unique members per client\n")
+
+	owned = storage is None
+	storage = storage or DataSQLiteStorage()
+
+	print_query(storage, unique_member_query)
+	print("*********************************************\n")
+	print("Top ZIP codes by member count\n")
+	print_query(storage, top_zip5_query)
+	print("*********************************************\n")
+	print("Ingestion error rate (bad rows / total)\n")
+	print_query(storage, ingestion_error_rate_query)
+	print("*********************************************\n")
+	print("Rejected rows by field and error code\n")
+	print_query(storage, REJECT_REASONS_ROLLUP_QUERY)
+
+	if owned:
+		storage.close()
+def analytics_queries_parquet(parquet_root: str = "data/parquet/members", client_id: str = None):
+	"""
+	Member analytics from the Parquet serving layer, client_id prunes the scan to one partition.
+	The error rate comes from the audit data, which only lives in SQLite.
+	"""
+	from src.storage.parquet_storage import DataParquetStorage
+
+	storage = DataParquetStorage(parquet_root)
+	partition_filter = storage.partition_filter(client_id=client_id)
+
+	print("*********************************************\n")
+	print("Count of unique members per client\n")
+	print(format_table(["client_id", "unique_member_count"], storage.unique_members_per_client(filter=partition_filter)))
+	print("*********************************************\n")
+	print("Top ZIP codes by member count\n")
+	print(format_table(["zip5", "member_count"], storage.top_zip5(filter=partition_filter)))
 	print("*********************************************\n")
 	print("Ingestion error rate (bad rows / total)\n")
-	ingestion_error_rate_query = "SELECT client_id, sum(invalid_rows) * 1.0 / SUM(total_rows) as ingestion_error_rate from audit_log GROUP BY client_id;"
-	ingestion_error_rate_df = pd.read_sql(ingestion_error_rate_query, conn)
-	print(ingestion_error_rate_df)
+	sqlite_storage = DataSQLiteStorage()
+	print(format_table(["client_id", "ingestion_error_rate"], sqlite_storage.ingestion_error_rate()))
+	sqlite_storage.close()
 
-	conn.close()
 if __name__ == "__main__":
 
-	analytics_queries()
\ No newline at end of file
+	if "--parquet" in sys.argv:
+		analytics_queries_parquet()
+	elif "--check-plans" in sys.argv:
+		check_query_plans()
+	else:
+		analytics_queries(use_rollups="--full-scan" not in sys.argv)
@@ -0,0 +1,114 @@
+"""
+Synthetic member files for the benchmarks
+
+Writes <output_dir>/<client_id>/members.csv with the sample_inputs/sample_data.csv columns.
+
+rows			- total rows, split evenly across the clients (10k .. 50M)
+error_rate		- share of rows with one broken field (phone, zip5, dob, gender, email or a missing member_id)
+duplicate_rate	- share of rows repeating an earlier member_id of the same client, with a new plan
+seed			- same arguments + seed give the same files
+
+Rows are written in blocks, memory stays flat whatever the size.
+
+python benchmarks/generate_members.py <output_dir> <rows> [clients] [error_rate] [duplicate_rate]
+"""
+
+import csv
+import random
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List, Tuple
+
+COLUMNS = ["member_id", "first_name", "last_name", "dob", "gender", "phone", "email", "zip5", "plan_id"]
+
+FIRST_NAMES = ["John", "Jane", "Bob", "Alice", "Maria", "David", "Linda", "James", "Susan", "Wei", "Priya", "Carlos"]
+LAST_NAMES = ["Doe", "Smith", "Johnson", "Brown", "Garcia", "Miller", "Davis", "Lopez", "Chen", "Patel", "Kim", "Nguyen"]
+GENDERS = ["M", "F", "O", "m", "f"]
+PLANS = ["PLAN_A", "PLAN_B", "PLAN_C", "PLAN_D"]
+# small pools - real files repeat a few thousand dobs/zips across millions of rows
+DOBS = [(date(1940, 1, 1) + timedelta(days=i * 7)).isoformat() for i in range(4000)]
+ZIPS = [f"{94000 + i:05d}" for i in range(600)]
+
+# field -> broken value, each rejected by RawMemberSchema.normalize
+CORRUPTIONS = [
+	("phone", "555-12"),
+	("zip5", "9410"),
+	("dob", "1980/05/15"),
+	("gender", "X"),
+	("email", "not-an-email"),
+	("member_id", ""),
+]
+
+BLOCK_SIZE = 100_000
+
+
+def _member_row(rng: random.Random, member_id: int) -> List[str]:
+	first = rng.choice(FIRST_NAMES)
+	last = rng.choice(LAST_NAMES)
+	return [
+		str(member_id),
+		first,
+		last,
+		rng.choice(DOBS),
+		rng.choice(GENDERS),
+		f"555-{rng.randrange(1000):03d}-{rng.randrange(10000):04d}",
+		f"{first.lower()}.{last.lower()}{member_id}@example.com",
+		rng.choice(ZIPS),
+		rng.choice(PLANS),
+	]
+
+
+def generate_client_file(file_path, rows: int, error_rate: float = 0.05, duplicate_rate: float = 0.0, seed: int = 0) -> Path:
+	rng = random.Random(seed)
+	file_path = Path(file_path)
+	file_path.parent.mkdir(parents=True, exist_ok=True)
+
+	next_member_id = 1
+	with open(file_path, "w", newline="", encoding="utf-8") as f:
+		writer = csv.writer(f)
+		writer.writerow(COLUMNS)
+		block = []
+		for _ in range(rows):
+			if next_member_id > 1 and rng.random() < duplicate_rate:
+				row = _member_row(rng, rng.randrange(1, next_member_id))
+			else:
+				row = _member_row(rng, next_member_id)
+				next_member_id += 1
+
+			if rng.random() < error_rate:
+				field, value = rng.choice(CORRUPTIONS)
+				row[COLUMNS.index(field)] = value
+
+			block.append(row)
+			if len(block) >= BLOCK_SIZE:
+				writer.writerows(block)
+				block = []
+		writer.writerows(block)
+
+	return file_path
+
+
+def generate_member_files(output_dir, rows: int, clients: int = 1, error_rate: float = 0.05,
+						  duplicate_rate: float = 0.0, seed: int = 0) -> List[Tuple[str, str]]:
+	"""
+	Returns - [(client_id, file_path)], a manifest run_batch accepts
+	"""
+	manifest = []
+	for i in range(clients):
+		# first clients take the remainder
+		client_rows = rows // clients + (1 if i < rows % clients else 0)
+		client_id = f"client_{i + 1:03d}"
+		file_path = generate_client_file(Path(output_dir) / client_id / "members.csv", client_rows,
+										 error_rate=error_rate, duplicate_rate=duplicate_rate, seed=seed + i)
+		manifest.append((client_id, str(file_path)))
+	return manifest
+
+
+if __name__ == "__main__":
+	output_dir, rows = sys.argv[1], int(sys.argv[2])
+	clients = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+	error_rate = float(sys.argv[4]) if len(sys.argv) > 4 else 0.05
+	duplicate_rate = float(sys.argv[5]) if len(sys.argv) > 5 else 0.0
+	for client_id, file_path in generate_member_files(output_dir, rows, clients, error_rate, duplicate_rate):
+		print(client_id, file_path)
@@ -0,0 +1,197 @@
+"""
+Benchmark harness - times every pipeline stage on synthetic member files
+
+Stages
+- upload_file			IngestionS3Simulator.upload_file (copy + checksum)
+- parse					MemberCSVReader, chunk_size rows at a time
+- normalize				RawMemberSchema.normalize, row by row
+- normalize_fast		RawMemberSchema.normalize_fast, row by row
+- validate_dataframe	column-wise validation, its valid rows are what gets inserted
+- insert_members		DataSQLiteStorage.insert_members
+- query_<name>			every analytics_queries.py query without parameters
+
+normalize/normalize_fast run on the first normalize_rows rows only (they are the
+slow paths, at 50M rows they would run for hours), rows/s stays comparable.
+
+Results are JSON (config, environment and StageMetrics stages). With --baseline the
+run is compared with an earlier result of the same config and exits 1 when a stage
+got slower than the tolerance allows.
+
+python benchmarks/run_benchmarks.py --rows 100000 --clients 4 --output benchmarks/results.json
+python benchmarks/run_benchmarks.py --rows 100000 --clients 4 --baseline benchmarks/results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List
+
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+	sys.path.insert(0, str(ROOT))
+
+from analytics_queries import SHIPPED_QUERIES
+from benchmarks.generate_members import generate_member_files
+from src.ingestion.csv_reader import MemberCSVReader
+from src.ingestion.ingest_s3_simulation import IngestionS3Simulator
+from src.metrics.stage_metrics import StageMetrics
+from src.storage.database_sqlite import DataSQLiteStorage
+from src.validation.schema_validation import RawMemberSchema, validate_dataframe
+
+ANALYTICS_QUERIES = {name: sql for name, sql in SHIPPED_QUERIES.items() if "?" not in sql}
+
+
+def run_benchmark(workdir, rows: int = 10_000, clients: int = 1, error_rate: float = 0.05, duplicate_rate: float = 0.0,
+				  seed: int = 0, chunk_size: int = 100_000, normalize_rows: int = 50_000) -> Dict[str, Any]:
+	"""
+	Generates the files under workdir and runs every stage on them
+
+	Returns - {"config", "environment", "created", "generate_seconds", "total_seconds", "process_peak_rss_bytes", "stages"}
+	"""
+	workdir = Path(workdir)
+	config = {
+		"rows": rows,
+		"clients": clients,
+		"error_rate": error_rate,
+		"duplicate_rate": duplicate_rate,
+		"seed": seed,
+		"chunk_size": chunk_size,
+		"normalize_rows": normalize_rows
+	}
+
+	started = time.perf_counter()
+	manifest = generate_member_files(workdir / "input", rows, clients, error_rate, duplicate_rate, seed)
+	generate_seconds = time.perf_counter() - started
+
+	metrics = StageMetrics()
+	reader = MemberCSVReader()
+	simulator = IngestionS3Simulator(raw_path=str(workdir / "raw"))
+	storage = DataSQLiteStorage(db_path=str(workdir / "benchmark.db"))
+	normalize_budget = normalize_rows
+
+	try:
+		for client_id, file_path in manifest:
+			with metrics.stage("upload_file", bytes=Path(file_path).stat().st_size):
+				metadata = simulator.upload_file(client_id, file_path)
+
+			valid_count = 0
+			rejected_count = 0
+			chunks = reader.read_chunks(metadata["local_path"], chunk_size)
+			for df in metrics.timed_iter("parse", chunks):
+				if normalize_budget > 0:
+					sample = df.head(normalize_budget).to_dict(orient="records")
+					normalize_budget -= len(sample)
+					for method in ("normalize", "normalize_fast"):
+						with metrics.stage(method, rows=len(sample)):
+							for row in sample:
+								getattr(RawMemberSchema(row), method)()
+
+				with metrics.stage("validate_dataframe", rows=len(df)):
+					valid_df, rejected_df = validate_dataframe(df)
+				records = valid_df.assign(client_id=client_id).to_dict(orient="records")
+				valid_count += len(records)
+				rejected_count += len(rejected_df)
+
+				with metrics.stage("insert_members", rows=len(records)):
+					storage.insert_members(client_id, records)
+
+			storage.insert_audit_log(client_id, file_path, valid_count, rejected_count, metadata["ingestion_time"].isoformat())
+
+		conn = storage._db_connection()
+		try:
+			for name, sql in ANALYTICS_QUERIES.items():
+				with metrics.stage(f"query_{name}") as stage:
+					stage["rows"] = len(conn.execute(sql).fetchall())
+		finally:
+			conn.close()
+	finally:
+		storage.close()
+
+	result = metrics.to_dict()
+	return {
+		"config": config,
+		"environment": {
+			"python": platform.python_version(),
+			"platform": platform.platform(),
+			"cpu_count": os.cpu_count()
+		},
+		"created": datetime.now().isoformat(),
+		"generate_seconds": round(generate_seconds, 6),
+		"total_seconds": result["total_seconds"],
+		"process_peak_rss_bytes": result["process_peak_rss_bytes"],
+		"stages": result["stages"]
+	}
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2, min_seconds: float = 0.01) -> List[Dict[str, Any]]:
+	"""
+	Stages slower than the baseline by more than tolerance (and min_seconds, to ignore noise on tiny stages)
+
+	Returns - [{"stage", "baseline_seconds", "seconds", "slowdown"}]
+	"""
+	if current["config"] != baseline["config"]:
+		raise ValueError(f"Baseline was run with a different config: {baseline['config']}")
+
+	regressions = []
+	for name, base in baseline["stages"].items():
+		stage = current["stages"].get(name)
+		if stage is None:
+			continue
+		if stage["seconds"] - base["seconds"] > max(base["seconds"] * tolerance, min_seconds):
+			regressions.append({
+				"stage": name,
+				"baseline_seconds": base["seconds"],
+				"seconds": stage["seconds"],
+				"slowdown": round(stage["seconds"] / base["seconds"], 2) if base["seconds"] else None
+			})
+	return regressions
+
+
+def main(argv=None) -> int:
+	parser = argparse.ArgumentParser(description="Pipeline stage benchmarks on synthetic member files")
+	parser.add_argument("--rows", type=int, default=10_000)
+	parser.add_argument("--clients", type=int, default=1)
+	parser.add_argument("--error-rate", type=float, default=0.05)
+	parser.add_argument("--duplicate-rate", type=float, default=0.0)
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--chunk-size", type=int, default=100_000)
+	parser.add_argument("--normalize-rows", type=int, default=50_000)
+	parser.add_argument("--output", help="write the results JSON here")
+	parser.add_argument("--baseline", help="earlier results JSON to compare with")
+	parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown per stage, 0.2 = 20%%")
+	parser.add_argument("--workdir", help="keep the generated files and database here instead of a temp directory")
+	args = parser.parse_args(argv)
+
+	options = dict(rows=args.rows, clients=args.clients, error_rate=args.error_rate, duplicate_rate=args.duplicate_rate,
+				   seed=args.seed, chunk_size=args.chunk_size, normalize_rows=args.normalize_rows)
+	if args.workdir:
+		result = run_benchmark(args.workdir, **options)
+	else:
+		with tempfile.TemporaryDirectory() as workdir:
+			result = run_benchmark(workdir, **options)
+
+	for name, stage in result["stages"].items():
+		print(f"{name:40} {stage['seconds']:10.3f}s {stage['rows_per_second'] or 0:14,.0f} rows/s"
+			  f" {(stage['bytes_per_second'] or 0) / 1e6:10.1f} MB/s")
+
+	if args.output:
+		Path(args.output).write_text(json.dumps(result, indent=2))
+
+	if args.baseline:
+		regressions = compare(result, json.loads(Path(args.baseline).read_text()), tolerance=args.tolerance)
+		for regression in regressions:
+			print(f"REGRESSION {regression['stage']}: {regression['baseline_seconds']:.3f}s -> {regression['seconds']:.3f}s")
+		if regressions:
+			return 1
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Startup benchmark - interpreter start + imports of the pipeline entry points
+
+Every command runs in a fresh interpreter (that is what an event-triggered, per-file
+invocation pays), repeat times, the fastest and median wall times are reported.
+
+- python				- bare interpreter, the floor
+- import_pipeline		- import src.main, heavy modules are imported lazily
+- import_pipeline_eager	- import src.main plus pandas/numpy/pydantic/email-validator,
+						  what importing src.main cost when they were module level imports
+- cli_help				- python -m src --help
+- cli_query				- python -m src query unique-members on an empty database
+- cli_audit				- python -m src audit on an empty audit folder
+- analytics_queries		- import analytics_queries
+
+heavy_modules lists which of pandas/numpy/pydantic/pyarrow importing src.main loaded (should be none).
+
+python benchmarks/startup_benchmark.py --repeat 10 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ("pandas", "numpy", "pydantic", "email_validator", "pyarrow")
+
+
+def _time_command(args: List[str], repeat: int, env: Dict[str, str]) -> Dict[str, float]:
+	timings = []
+	for _ in range(repeat):
+		started = time.perf_counter()
+		subprocess.run([sys.executable] + args, cwd=ROOT, env=env, check=True,
+					   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+		timings.append(time.perf_counter() - started)
+	return {"min_seconds": round(min(timings), 4), "median_seconds": round(statistics.median(timings), 4)}
+
+
+def heavy_modules_loaded(module: str = "src.main") -> List[str]:
+	code = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+	output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True).stdout.strip()
+	return output.split(",") if output else []
+
+
+def run_startup_benchmark(repeat: int = 5) -> Dict[str, Any]:
+	"""
+	Returns - {"repeat", "python", "commands": {name: {"min_seconds", "median_seconds"}}, "heavy_modules", "saved_seconds"}
+	"""
+	env = dict(os.environ, PYTHONPATH=str(ROOT))
+	with tempfile.TemporaryDirectory() as workdir:
+		commands = {
+			"python": ["-c", "pass"],
+			"import_pipeline": ["-c", "import src.main"],
+			"import_pipeline_eager": ["-c", "import pandas, numpy, pydantic, email_validator, src.main"],
+			"cli_help": ["-m", "src", "--help"],
+			"cli_query": ["-m", "src", "query", "unique-members", "--db", str(Path(workdir) / "startup.db")],
+			"cli_audit": ["-m", "src", "audit", "--audit-path", str(Path(workdir) / "audit")],
+			"analytics_queries": ["-c", "import analytics_queries"],
+		}
+		# one untimed run each, so .pyc compilation isn't measured
+		for args in commands.values():
+			_time_command(args, 1, env)
+		timings = {name: _time_command(args, repeat, env) for name, args in commands.items()}
+
+	return {
+		"repeat": repeat,
+		"python": sys.version.split()[0],
+		"commands": timings,
+		"heavy_modules": heavy_modules_loaded(),
+		"saved_seconds": round(timings["import_pipeline_eager"]["median_seconds"] - timings["import_pipeline"]["median_seconds"], 4)
+	}
+
+
+def main(argv=None) -> int:
+	parser = argparse.ArgumentParser(description="Interpreter startup + import time of the pipeline entry points")
+	parser.add_argument("--repeat", type=int, default=5)
+	parser.add_argument("--output", help="write the results JSON here")
+	args = parser.parse_args(argv)
+
+	result = run_startup_benchmark(args.repeat)
+	for name, timing in result["commands"].items():
+		print(f"{name:<24}{timing['median_seconds']:>8.3f}s median{timing['min_seconds']:>8.3f}s min")
+	print(f"lazy imports save {result['saved_seconds']:.3f}s per invocation, heavy modules on import: {result['heavy_modules'] or 'none'}")
+
+	if args.output:
+		Path(args.output).write_text(json.dumps(result, indent=2))
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
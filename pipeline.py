@@ -14,15 +14,32 @@ Ingestion log created
 This is a POC simulation program
 In real scenerio this will be triggered when client files are dropped in S3 bucket
 
+Batch mode - many clients/files in parallel
+python pipeline.py <directory with <client_id>/<file>.csv | manifest.csv with client_id,file_path>
+
+Watch mode - long running, files dropped in <landing>/<client_id>/ are ingested within seconds
+python pipeline.py --watch [landing folder, default data/landing]
+
 """
 
 from pathlib import Path
-from src.main import run_pipeline
+from src.main import run_pipeline, run_batch
+import json
 import shutil
-
-client_id = "client_001"
-source_path = Path("sample_inputs")
-source_file = "sample_data.csv"
-
-client_file = source_path / source_file
-result = run_pipeline(client_id, client_file)
+import sys
+
+if __name__ == "__main__":
+	# guard needed - the batch process pool re-imports this module on Windows
+	if len(sys.argv) > 1 and sys.argv[1] == "--watch":
+		from src.watch_service import watch
+		watch(*sys.argv[2:3])
+	elif len(sys.argv) > 1:
+		summary = run_batch(sys.argv[1])
+		print(json.dumps({key: value for key, value in summary.items() if key != "files"}, indent=2))
+	else:
+		client_id = "client_001"
+		source_path = Path("sample_inputs")
+		source_file = "sample_data.csv"
+
+		client_file = source_path / source_file
+		result = run_pipeline(client_id, client_file)
@@ -0,0 +1,7 @@
+import sys
+
+from .cli import main
+
+# guard needed - the batch process pool re-imports the main module on Windows/macOS
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Append-only JSON Lines audit sink
+
+Audit records are appended as compact JSON lines to segment files
+	data/audit/segments/audit-<started>-<pid>-<NNNNNN>.jsonl
+A background thread writes pending records in batches with one fsync per batch,
+segments rotate at segment_max_bytes. Every sink (process + random suffix) writes its
+own segments, so concurrent runs never share or overwrite a file. A failed write is
+rolled back and its records stay queued for the next flush.
+
+Each record is also added to an SQLite index (segment, offset, client_id,
+timestamp, checksum, event_type), AuditLogReader uses it to seek straight to
+matching lines instead of scanning every file.
+"""
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, date
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+INDEX_FILE = "audit_index.db"
+
+
+def _json_default(value):
+	if isinstance(value, (datetime, date)):
+		return value.isoformat()
+	if isinstance(value, Path):
+		return str(value)
+	if isinstance(value, tuple):
+		return list(value)
+	raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _connect_index(audit_path: Path) -> sqlite3.Connection:
+	conn = sqlite3.connect(audit_path / INDEX_FILE, timeout=30)
+	conn.execute("PRAGMA journal_mode = WAL")
+	conn.execute('''
+		CREATE TABLE IF NOT EXISTS audit_entries (
+			segment TEXT NOT NULL,
+			offset INTEGER NOT NULL,
+			length INTEGER NOT NULL,
+			event_type TEXT,
+			client_id TEXT,
+			timestamp TEXT,
+			checksum TEXT,
+			PRIMARY KEY (segment, offset)
+		)
+		''')
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_entries_client_time ON audit_entries(client_id, timestamp)")
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_entries_time ON audit_entries(timestamp)")
+	conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_entries_checksum ON audit_entries(checksum)")
+	return conn
+
+
+def _append(path: Path, data: bytes):
+	"""
+	Appends and fsyncs data, on error the file is truncated back so no partial line is left
+	"""
+	fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+	try:
+		start = os.lseek(fd, 0, os.SEEK_END)
+		try:
+			view = memoryview(data)
+			while view:
+				view = view[os.write(fd, view):]
+			os.fsync(fd)
+		except OSError:
+			os.ftruncate(fd, start)
+			raise
+	finally:
+		os.close(fd)
+
+
+class JsonlAuditSink:
+	"""
+	Buffered writer of audit records into rotating JSON Lines segments
+	"""
+
+	def __init__(self, audit_path="data/audit", segment_max_bytes: int = 64 * 1024 * 1024, flush_interval: float = 0.5):
+		self.audit_path = Path(audit_path)
+		self.segment_path = self.audit_path / "segments"
+		self.segment_path.mkdir(parents=True, exist_ok=True)
+		self.segment_max_bytes = segment_max_bytes
+		self.flush_interval = flush_interval
+
+		# unique per sink - a second sink of the same process must not append to this one's segments
+		self._prefix = f"audit-{datetime.now().strftime('%y%m%d_%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+		self._segment_number = 1
+		self._offset = 0
+
+		self._lock = threading.Lock()			# guards _pending and the segment position
+		self._flush_lock = threading.Lock()		# one flush at a time, keeps lines in append order
+		self._pending: List[tuple] = []
+		self._unindexed: List[tuple] = []		# written, index rows not committed yet (flush lock)
+		self._closed = False
+		self._wake = threading.Event()
+		self._thread = threading.Thread(target=self._run, name="audit-flush", daemon=True)
+		self._thread.start()
+		atexit.register(self.close)
+
+	def _segment_name(self) -> str:
+		return f"{self._prefix}-{self._segment_number:06d}.jsonl"
+
+	def append(self, record: Dict[str, Any]) -> str:
+		"""
+		Queues the record, the background thread writes it
+
+		Returns - "<segment file>:<byte offset>" where the line will be
+		"""
+		line = (json.dumps(record, separators=(",", ":"), default=_json_default) + "\n").encode("utf-8")
+		index_row = (
+			record.get("event_type"),
+			record.get("client_id"),
+			_json_default(record["timestamp"]) if "timestamp" in record else None,
+			record.get("checksum")
+		)
+
+		with self._lock:
+			if self._closed:
+				raise ValueError("Audit sink is closed")
+			if self._offset and self._offset + len(line) > self.segment_max_bytes:
+				self._segment_number += 1
+				self._offset = 0
+			segment, offset = self._segment_name(), self._offset
+			self._pending.append((segment, offset, line, index_row))
+			self._offset += len(line)
+
+		return f"{self.segment_path / segment}:{offset}"
+
+	def flush(self):
+		"""
+		Writes every queued record, one fsync per touched segment, then indexes them.
+
+		If a segment write fails, that segment's records and everything after them go
+		back to the front of the queue (the next flush writes them at the same offsets)
+		and the error is raised. Records whose index rows failed are indexed by the next flush.
+		"""
+		with self._flush_lock:
+			with self._lock:
+				pending, self._pending = self._pending, []
+			if not pending and not self._unindexed:
+				return
+
+			# segments only grow, so each segment's records are contiguous in pending
+			by_segment: Dict[str, List[bytes]] = {}
+			for segment, _, line, _ in pending:
+				by_segment.setdefault(segment, []).append(line)
+			written = 0
+			error = None
+			try:
+				for segment, lines in by_segment.items():
+					_append(self.segment_path / segment, b"".join(lines))
+					written += len(lines)
+			except Exception as e:
+				with self._lock:
+					self._pending[:0] = pending[written:]
+				error = e
+
+			self._unindexed.extend(pending[:written])
+			if self._unindexed:
+				try:
+					conn = _connect_index(self.audit_path)
+					try:
+						with conn:
+							conn.executemany(
+								"INSERT OR REPLACE INTO audit_entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+								[(segment, offset, len(line)) + index_row for segment, offset, line, index_row in self._unindexed]
+							)
+					finally:
+						conn.close()
+					self._unindexed = []
+				except Exception as e:
+					error = error or e
+			if error is not None:
+				raise error
+
+	def _run(self):
+		while not self._closed:
+			self._wake.wait(self.flush_interval)
+			self._wake.clear()
+			try:
+				self.flush()
+			except Exception as e:
+				# records are still queued, the next interval retries - the thread must keep running
+				print(f"Audit flush error, {len(self._pending)} records kept for the next flush-------------{e}")
+
+	def close(self):
+		"""
+		Stops the flush thread and writes what is left
+		"""
+		with self._lock:
+			if self._closed:
+				return
+			self._closed = True
+		self._wake.set()
+		self._thread.join()
+		self.flush()
+
+
+class AuditLogReader:
+	"""
+	Finds audit records through the segment index
+	"""
+
+	def __init__(self, audit_path="data/audit"):
+		self.audit_path = Path(audit_path)
+		self.segment_path = self.audit_path / "segments"
+
+	def find(self, client_id: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+			 checksum: Optional[str] = None, event_type: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+		"""
+		since/until - ISO timestamps, inclusive
+		Returns - matching audit records in time order
+		"""
+		conditions, params = [], []
+		for column, operator, value in (
+			("client_id", "=", client_id),
+			("timestamp", ">=", since),
+			("timestamp", "<=", until),
+			("checksum", "=", checksum),
+			("event_type", "=", event_type),
+		):
+			if value is not None:
+				conditions.append(f"{column} {operator} ?")
+				params.append(value)
+
+		sql = "SELECT segment, offset, length FROM audit_entries"
+		if conditions:
+			sql += " WHERE " + " AND ".join(conditions)
+		sql += " ORDER BY timestamp, segment, offset"
+		if limit is not None:
+			sql += f" LIMIT {int(limit)}"
+
+		if not (self.audit_path / INDEX_FILE).exists():
+			return []
+		conn = _connect_index(self.audit_path)
+		try:
+			entries = conn.execute(sql, params).fetchall()
+		finally:
+			conn.close()
+
+		records = []
+		handles = {}
+		try:
+			for segment, offset, length in entries:
+				if segment not in handles:
+					handles[segment] = open(self.segment_path / segment, "rb")
+				f = handles[segment]
+				f.seek(offset)
+				records.append(json.loads(f.read(length)))
+		finally:
+			for f in handles.values():
+				f.close()
+		return records
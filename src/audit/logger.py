@@ -2,6 +2,10 @@ from typing import Dict, Any
 from pathlib import Path
 from datetime import datetime
 import json
+import os
+import uuid
+
+from .jsonl_sink import JsonlAuditSink
 
 """
 AuditLogger module handles HIPPA compliance audit logging for the  pipeline
@@ -10,17 +14,25 @@ The class creates audit logs that capture
 - timestamp - when data was accessed
 - event_type - what operation was performed ingestion/validation etc
 - record_count - success/failure metrics
+
+sink="json"  - one pretty-printed JSON file per event (default)
+sink="jsonl" - compact JSON lines appended to rotating segment files by a
+			   background flush thread, searchable with jsonl_sink.AuditLogReader
 """
 class AuditLogger:
-	def __init__(self, audit_path="data/audit"):
+	def __init__(self, audit_path="data/audit", sink: str = "json", **sink_options):
 		# Initialized with the storage path of the file
 		self.audit_path = Path(audit_path)
+		if sink not in ("json", "jsonl"):
+			raise ValueError(f"Unknown audit sink: {sink}")
+		self.sink = sink
 		"""
 		mkdir if it doesnot exists
 		parents=True - creates parent directory if doesn't exists
 		exists_ok=True - doesnt raise error if directory already exists
 		"""
 		self.audit_path.mkdir(parents=True, exist_ok=True)
+		self.jsonl_sink = JsonlAuditSink(self.audit_path, **sink_options) if sink == "jsonl" else None
 		
 	"""
 	Used chatgpt as the timestamp and JSON was createing issue and didn't have time to debug - handling the datetime object automatically
@@ -39,8 +51,12 @@ class AuditLogger:
 		else:
 			return data
 
-	def audit_log(self, valid_row_count: int, rejected_row_count: int, metadata: Dict[str, Any]) -> str:
-		""" log """
+	def audit_log(self, valid_row_count: int, rejected_row_count: int, metadata: Dict[str, Any], delta: Dict[str, int] = None,
+			metrics: Dict[str, Any] = None) -> str:
+		""" log
+		delta - new/changed/unchanged(/missing) member counts of a delta ingestion
+		metrics - per stage timings of the file (StageMetrics.to_dict)
+		"""
 		#Write to JSON
 		audit_record = {
 			"event_type": "ingestion",
@@ -58,21 +74,58 @@ class AuditLogger:
 				"audit_trail_maintained": True
 			}
 		}
+		if delta is not None:
+			audit_record["delta"] = delta
+		if metrics is not None:
+			audit_record["metrics"] = metrics
+
+		return self._write(audit_record, "ingestion")
+
+	def audit_skip(self, metadata: Dict[str, Any], previous_result: Dict[str, Any]) -> str:
+		""" log a file that was skipped because the same content was already processed """
+		audit_record = {
+			"event_type": "ingestion_skipped_duplicate",
+			"timestamp": datetime.now(),
+			"client_id": metadata["client_id"],
+			"file_name": metadata["file_name"],
+			"checksum": metadata["checksum"],
+			"previous_file_name": previous_result.get("file_name"),
+			"previous_processed_at": previous_result.get("processed_at"),
+			"previous_audit_log": previous_result.get("audit_log"),
+			"compliance": {
+				"hippa_compliant": True,
+				"data_encrypted": True,
+				"audit_trail_maintained": True
+			}
+		}
+
+		return self._write(audit_record, "skipped")
+
+	def _write(self, audit_record: Dict[str, Any], prefix: str) -> str:
+		"""
+		Returns - the JSON file path, or "<segment>:<offset>" for the jsonl sink
+		"""
+		if self.jsonl_sink is not None:
+			return self.jsonl_sink.append(audit_record)
 
 		# DOUBLE SAFETY: Recursively check and convert any datetime objects
 		serializable_record = self._ensure_serializable(audit_record)
 
-		timestamp_str = datetime.now().strftime('%y%m%d_%H%M%S')
-		#print(timestamp_str)
-		audit_filename = f"ingestion_{metadata["client_id"]}_{timestamp_str}.json"
-		#print(audit_filename)
+		# microseconds + pid + random suffix - concurrent runs in the same second don't overwrite each other
+		timestamp_str = datetime.now().strftime('%y%m%d_%H%M%S_%f')
+		audit_filename = f"{prefix}_{audit_record['client_id']}_{timestamp_str}_{os.getpid()}_{uuid.uuid4().hex[:6]}.json"
 		audit_log = self.audit_path / audit_filename
-		#print(audit_log)
 
-		#print(f"Audit log file created : {audit_log}")
 		with open(audit_log, 'w') as f:
 			json.dump(serializable_record, f, indent=2) #indent=2 for formatting
 
-		
+		return str(audit_log)
+
+	def flush(self):
+		""" writes buffered jsonl records now """
+		if self.jsonl_sink is not None:
+			self.jsonl_sink.flush()
 
-		return str(audit_log)
\ No newline at end of file
+	def close(self):
+		if self.jsonl_sink is not None:
+			self.jsonl_sink.close()
@@ -0,0 +1,230 @@
+"""
+Command line entry point - python -m src <command>
+
+python -m src ingest sample_inputs/sample_data.csv --client-id client_001
+python -m src ingest data/incoming				(batch: <dir>/<client_id>/<file>.csv or a manifest CSV)
+python -m src query top-zip5 --limit 5
+python -m src audit --client-id client_001 --since 2025-10-01
+python -m src duplicates --client-id client_001 --min-keys 2
+python -m src history client_001 --as-of 2025-10-01
+python -m src history client_001 --since 2025-09-01 --until 2025-10-01
+python -m src raw --archive-after-days 30 --delete-after-days 365
+
+Only argparse/json are imported up front. query and audit never load pandas or
+pydantic, ingest loads them when the file is parsed (see main.py startup).
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import List, Dict, Any
+
+# query name -> (DataSQLiteStorage method, column names)
+QUERIES = {
+	"unique-members": ("unique_members_per_client", ("client_id", "unique_member_count")),
+	"top-zip5": ("top_zip5", ("zip5", "member_count")),
+	"error-rate": ("ingestion_error_rate", ("client_id", "ingestion_error_rate")),
+	"reject-reasons": ("reject_reasons", ("client_id", "field", "code", "row_count")),
+}
+
+
+def _print_json(value):
+	print(json.dumps(value, indent=2, default=str))
+
+
+def ingest(args) -> int:
+	from .main import RadiantGrapgDemoDataPipeline, run_batch
+
+	options = {
+		"validation_mode": args.validation_mode,
+		"deduplicate": not args.no_deduplicate,
+		"delta": args.delta,
+		"audit_sink": args.audit_sink,
+		"validation_workers": args.validation_workers,
+		"raw_compression": args.raw_compression,
+	}
+	if args.client_id is None:
+		summary = run_batch(args.source, max_workers=args.workers, **options)
+		_print_json({key: value for key, value in summary.items() if key != "files"})
+		return 1 if summary["failed_count"] else 0
+
+	pipeline = RadiantGrapgDemoDataPipeline(chunk_size=args.chunk_size, **options)
+	try:
+		result = pipeline.data_process(args.client_id, args.source)
+	except Exception as e:
+		# same shape as a failed file in a batch summary
+		result = {"client_id": args.client_id, "file_name": args.source, "status": "failed", "error": str(e)}
+	finally:
+		pipeline.logger.close()
+	_print_json(result)
+	return 1 if result["status"] == "failed" else 0
+
+
+def query(args) -> int:
+	from .storage.database_sqlite import DataSQLiteStorage
+
+	method, columns = QUERIES[args.name]
+	storage = DataSQLiteStorage(args.db)
+	try:
+		rows = getattr(storage, method)()
+	finally:
+		storage.close()
+	if args.limit is not None:
+		rows = rows[:args.limit]
+
+	if args.json:
+		_print_json([dict(zip(columns, row)) for row in rows])
+	else:
+		print("\t".join(columns))
+		for row in rows:
+			print("\t".join("" if value is None else str(value) for value in row))
+	return 0
+
+
+def duplicates(args) -> int:
+	from .storage.database_sqlite import DataSQLiteStorage
+
+	storage = DataSQLiteStorage(args.db)
+	try:
+		pairs = storage.likely_duplicates(client_id=args.client_id, min_keys=args.min_keys, limit=args.limit)
+	finally:
+		storage.close()
+
+	for pair in pairs:
+		print(json.dumps(pair))
+	return 0
+
+
+def history(args) -> int:
+	from .storage.database_sqlite import DataSQLiteStorage, history_timestamp
+
+	if args.as_of is None and args.since is None:
+		raise SystemExit("history needs --as-of or --since")
+	storage = DataSQLiteStorage(args.db)
+	try:
+		if args.as_of is not None:
+			for member in storage.members_as_of(args.client_id, args.as_of):
+				print(json.dumps(member))
+		else:
+			until = args.until or history_timestamp()
+			_print_json(storage.history_diff(args.client_id, args.since, until))
+	except ValueError as e:
+		raise SystemExit(f"history: {e}")
+	finally:
+		storage.close()
+	return 0
+
+
+def raw(args) -> int:
+	from .ingestion.ingest_s3_simulation import IngestionS3Simulator
+
+	simulator = IngestionS3Simulator(args.raw_path, compression=args.compression, archive_path=args.archive_path)
+	if args.archive_after_days is None and args.delete_after_days is None:
+		for sidecar in simulator.list_objects(args.client_id):
+			print(json.dumps(sidecar))
+		return 0
+	_print_json(simulator.apply_retention(args.archive_after_days, args.delete_after_days, client_id=args.client_id))
+	return 0
+
+
+def _json_audit_records(audit_path: Path, client_id=None, since=None, until=None, checksum=None,
+						event_type=None, limit=None) -> List[Dict[str, Any]]:
+	"""
+	Same filters as AuditLogReader.find over the one-file-per-event json sink (full scan)
+	"""
+	records = []
+	for path in audit_path.glob("*.json"):
+		with open(path) as f:
+			record = json.load(f)
+		timestamp = str(record.get("timestamp", ""))
+		if ((client_id is None or record.get("client_id") == client_id)
+				and (checksum is None or record.get("checksum") == checksum)
+				and (event_type is None or record.get("event_type") == event_type)
+				and (since is None or timestamp >= since)
+				and (until is None or timestamp <= until)):
+			records.append(record)
+	records.sort(key=lambda record: str(record.get("timestamp", "")))
+	return records if limit is None else records[:limit]
+
+
+def audit(args) -> int:
+	from .audit.jsonl_sink import AuditLogReader
+
+	filters = {"client_id": args.client_id, "since": args.since, "until": args.until,
+			   "checksum": args.checksum, "event_type": args.event_type, "limit": args.limit}
+	# the indexed jsonl trail when there is one, plus the per-event json files
+	records = AuditLogReader(args.audit_path).find(**filters)
+	records += _json_audit_records(Path(args.audit_path), **filters)
+	records.sort(key=lambda record: str(record.get("timestamp", "")))
+	if args.limit is not None:
+		records = records[:args.limit]
+
+	for record in records:
+		print(json.dumps(record, default=str))
+	return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+	parser = argparse.ArgumentParser(prog="python -m src", description="RadiantGraph demo member data pipeline")
+	commands = parser.add_subparsers(dest="command", required=True)
+
+	ingest_parser = commands.add_parser("ingest", help="ingest one client file, or a batch directory/manifest")
+	ingest_parser.add_argument("source", help="client file, <dir>/<client_id>/<file>.csv tree or manifest CSV")
+	ingest_parser.add_argument("--client-id", help="client of a single file, leave out for a batch")
+	ingest_parser.add_argument("--validation-mode", choices=("row", "vectorized"), default="row")
+	ingest_parser.add_argument("--chunk-size", type=int, help="streaming mode, single file only")
+	ingest_parser.add_argument("--delta", action="store_true", help="only write new or changed members")
+	ingest_parser.add_argument("--no-deduplicate", action="store_true", help="process files already ingested again")
+	ingest_parser.add_argument("--audit-sink", choices=("json", "jsonl"), default="json")
+	ingest_parser.add_argument("--workers", type=int, help="batch process pool size")
+	ingest_parser.add_argument("--validation-workers", type=int, default=1, help="processes validating one large file")
+	ingest_parser.add_argument("--raw-compression", choices=("gzip", "zstd"), help="compress the raw copy once parsed")
+	ingest_parser.set_defaults(handler=ingest)
+
+	query_parser = commands.add_parser("query", help="analytics from the rollup tables")
+	query_parser.add_argument("name", choices=sorted(QUERIES))
+	query_parser.add_argument("--db", default="data/radiantgraphdemo.db")
+	query_parser.add_argument("--limit", type=int)
+	query_parser.add_argument("--json", action="store_true", help="JSON instead of tab separated rows")
+	query_parser.set_defaults(handler=query)
+
+	audit_parser = commands.add_parser("audit", help="search the audit trail, one JSON record per line")
+	audit_parser.add_argument("--audit-path", default="data/audit")
+	audit_parser.add_argument("--client-id")
+	audit_parser.add_argument("--since", help="ISO timestamp, inclusive")
+	audit_parser.add_argument("--until", help="ISO timestamp, inclusive")
+	audit_parser.add_argument("--checksum")
+	audit_parser.add_argument("--event-type", help="ingestion | ingestion_skipped_duplicate")
+	audit_parser.add_argument("--limit", type=int)
+	audit_parser.set_defaults(handler=audit)
+
+	duplicates_parser = commands.add_parser("duplicates", help="likely duplicate members from the identity index, one JSON pair per line")
+	duplicates_parser.add_argument("--db", default="data/radiantgraphdemo.db")
+	duplicates_parser.add_argument("--client-id", help="only pairs involving this client")
+	duplicates_parser.add_argument("--min-keys", type=int, default=1, help="identity keys a pair must share (name+dob+zip5, phone, email)")
+	duplicates_parser.add_argument("--limit", type=int)
+	duplicates_parser.set_defaults(handler=duplicates)
+
+	history_parser = commands.add_parser("history", help="members_history - the roster at a point in time, or what changed between two")
+	history_parser.add_argument("client_id")
+	history_parser.add_argument("--db", default="data/radiantgraphdemo.db")
+	history_parser.add_argument("--as-of", help="UTC date/timestamp, one JSON member per line")
+	history_parser.add_argument("--since", help="UTC date/timestamp, prints added/removed/changed members up to --until")
+	history_parser.add_argument("--until", help="UTC date/timestamp, default now")
+	history_parser.set_defaults(handler=history)
+
+	raw_parser = commands.add_parser("raw", help="raw object tiers - list the sidecar index, or apply a retention policy")
+	raw_parser.add_argument("--raw-path", default="data/raw")
+	raw_parser.add_argument("--archive-path", help="default <raw-path>/../archive")
+	raw_parser.add_argument("--client-id")
+	raw_parser.add_argument("--archive-after-days", type=int, help="compress and move older objects to the archive tier")
+	raw_parser.add_argument("--delete-after-days", type=int, help="delete older objects from every tier")
+	raw_parser.add_argument("--compression", choices=("gzip", "zstd"), help="archive codec, default gzip")
+	raw_parser.set_defaults(handler=raw)
+
+	return parser
+
+
+def main(argv=None) -> int:
+	args = build_parser().parse_args(argv)
+	return args.handler(args)
@@ -0,0 +1,183 @@
+"""
+Member CSV reader - declared schema instead of pandas type inference
+
+- string_dtypes	- every column is read as str and empty cells as "", so zip5 "02134" or
+				  member_id "0012" keep their leading zeros and validation gets the values
+				  exactly as the client sent them (no int/float -> str round trips, no "nan")
+- columns		- column projection, only the member columns are parsed; columns the file
+				  doesn't have are skipped, extra client columns are never read
+- engine		- pyarrow (multi-threaded) when installed, else the C parser. pandas can't
+				  read chunks with pyarrow, chunked reads always use the C parser.
+				  String reads go through pyarrow.csv directly - pandas' pyarrow engine infers
+				  types first and casts to str afterwards, which loses the leading zeros.
+				  Plain .csv files are parsed from their memory mapping (MappedRawFile),
+				  pyarrow reads the mapped pages without copying them. read_range parses one
+				  byte range of the mapping (MappedRawFile.split) for parallel validation
+- delimiter		- sniffed from the header line (, ; tab |), compressed files are decompressed
+				  up to their first newline for it
+- compression	- inferred from the extension: .csv.gz, .csv.zst (C parser needs zstandard), .csv.bz2 ...
+
+pandas and pyarrow are imported on the first read, not with the module (see main.py startup)
+"""
+from __future__ import annotations
+
+import bz2
+import csv
+import gzip
+import io
+import lzma
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Iterator, Optional, Sequence, Dict, Any, TYPE_CHECKING
+
+from .mapped_file import MappedRawFile, sniff_delimiter
+
+if TYPE_CHECKING:
+	import pandas as pd
+
+PYARROW_AVAILABLE = find_spec("pyarrow") is not None
+
+# RawMemberSchema fields, zip_code is the older name of zip5
+MEMBER_COLUMNS = ("member_id", "first_name", "last_name", "dob", "gender", "phone", "email", "zip5", "zip_code", "plan_id")
+
+# client files the pipeline picks up
+CSV_SUFFIXES = (".csv", ".csv.gz", ".csv.zst", ".csv.bz2", ".csv.xz")
+
+
+def is_csv_file(path) -> bool:
+	return Path(path).name.lower().endswith(CSV_SUFFIXES)
+
+
+def _open_compressed(path):
+	name = Path(path).name.lower()
+	if name.endswith(".gz"):
+		return gzip.open(path, "rb")
+	if name.endswith(".bz2"):
+		return bz2.open(path, "rb")
+	if name.endswith(".xz"):
+		return lzma.open(path, "rb")
+	if name.endswith(".zst"):
+		import zstandard	# the C parser needs it for .csv.zst as well
+		return zstandard.open(path, "rb")
+	raise ValueError(f"Unknown compression: {path}")
+
+
+def _pyarrow():
+	import pyarrow as pa
+	import pyarrow.csv as pa_csv
+	return pa, pa_csv
+
+
+class MemberCSVReader:
+	def __init__(self, columns: Optional[Sequence[str]] = MEMBER_COLUMNS, engine: str = "auto", string_dtypes: bool = True):
+		"""
+		columns			- parsed columns, None reads every column
+		engine			- auto | pyarrow | c | python
+		string_dtypes	- False goes back to pandas type inference
+		"""
+		if engine not in ("auto", "pyarrow", "c", "python"):
+			raise ValueError(f"Unknown CSV engine: {engine}")
+		if engine == "pyarrow" and not PYARROW_AVAILABLE:
+			raise ImportError("The pyarrow CSV engine needs pyarrow - pip install pyarrow")
+		self.columns = tuple(columns) if columns is not None else None
+		self.engine = engine
+		self.string_dtypes = string_dtypes
+
+	def _engine(self, chunked: bool) -> str:
+		if self.engine == "auto":
+			return "pyarrow" if PYARROW_AVAILABLE and not chunked else "c"
+		if self.engine == "pyarrow" and chunked:
+			return "c"
+		return self.engine
+
+	@staticmethod
+	def delimiter(file_path) -> str:
+		if Path(file_path).name.lower().endswith(".csv"):
+			with MappedRawFile(file_path) as mapped:
+				return mapped.delimiter()
+		with _open_compressed(file_path) as f:
+			return sniff_delimiter(f.readline())
+
+	def _options(self, file_path, engine: str) -> Dict[str, Any]:
+		import pandas as pd
+
+		options: Dict[str, Any] = {"compression": "infer", "engine": engine, "sep": self.delimiter(file_path)}
+		if self.columns is not None:
+			# the header tells which of the declared columns the file has
+			header = pd.read_csv(file_path, nrows=0, compression="infer", sep=options["sep"]).columns
+			options["usecols"] = [column for column in header if column in self.columns]
+		if self.string_dtypes:
+			options["dtype"] = str
+			options["keep_default_na"] = False
+			options["na_values"] = []
+		return options
+
+	def _read_pyarrow_strings(self, file_path) -> pd.DataFrame:
+		pa, _ = _pyarrow()
+		if Path(file_path).name.lower().endswith(".csv"):
+			with MappedRawFile(file_path) as mapped:
+				# the buffer must be released before the mapping is closed
+				return self._parse_pyarrow(pa.py_buffer(mapped.buffer), mapped.header(), mapped.delimiter())
+
+		with pa.input_stream(str(file_path), compression="detect") as stream:
+			head = stream.read(1 << 20)
+		with pa.input_stream(str(file_path), compression="detect") as stream:
+			header_line = head.split(b"\n", 1)[0]
+			return self._parse_pyarrow(stream, header_line, sniff_delimiter(header_line))
+
+	@staticmethod
+	def _header_names(header_line: bytes, delimiter: str):
+		return next(csv.reader([header_line.decode("utf-8-sig").rstrip("\r\n")], delimiter=delimiter))
+
+	def _parse_pyarrow(self, source, header_line: bytes, delimiter: str, has_header: bool = True) -> pd.DataFrame:
+		pa, pa_csv = _pyarrow()
+		header = self._header_names(header_line, delimiter)
+		columns = header if self.columns is None else [column for column in header if column in self.columns]
+
+		# without a header row in source the names come from header_line
+		read_options = pa_csv.ReadOptions() if has_header else pa_csv.ReadOptions(column_names=header)
+		table = pa_csv.read_csv(source, read_options=read_options, parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+			convert_options=pa_csv.ConvertOptions(
+				include_columns=columns,
+				column_types={column: pa.string() for column in columns},
+				strings_can_be_null=False,
+				null_values=[]
+			))
+		return table.to_pandas()
+
+	def read(self, file_path) -> pd.DataFrame:
+		import pandas as pd
+
+		engine = self._engine(chunked=False)
+		if engine == "pyarrow" and self.string_dtypes:
+			return self._read_pyarrow_strings(file_path)
+		return pd.read_csv(file_path, **self._options(file_path, engine))
+
+	def read_range(self, file_path, start: int, end: int) -> pd.DataFrame:
+		"""
+		Rows in the byte range [start, end) of a plain .csv file, parsed with the file's header.
+		The range must start and end on row boundaries (see MappedRawFile.split), the index starts at 0.
+		"""
+		import pandas as pd
+
+		with MappedRawFile(file_path) as mapped:
+			header_line, delimiter = mapped.header(), mapped.delimiter()
+			if self._engine(chunked=False) == "pyarrow" and self.string_dtypes:
+				pa, _ = _pyarrow()
+				return self._parse_pyarrow(pa.py_buffer(mapped.buffer).slice(start, end - start), header_line, delimiter, has_header=False)
+			with mapped.view(start, end) as view:
+				data = io.BytesIO(view)
+
+		options = self._options(file_path, self._engine(chunked=False))
+		return pd.read_csv(data, header=None, names=self._header_names(header_line, delimiter), **options)
+
+	def read_chunks(self, file_path, chunk_size: int, dtype=None) -> Iterator[pd.DataFrame]:
+		"""
+		dtype - overrides the declared dtypes (see RadiantGrapgDemoDataPipeline._resolve_chunk_dtypes)
+		"""
+		import pandas as pd
+
+		options = self._options(file_path, self._engine(chunked=True))
+		if dtype is not None:
+			options["dtype"] = dtype
+		return pd.read_csv(file_path, chunksize=chunk_size, **options)
@@ -1,17 +1,112 @@
 import os
 from datetime import datetime
+import gzip
 import hashlib
+import json
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
 import shutil
+import uuid
+
+from .mapped_file import MappedRawFile
+
+try:
+	import xxhash	# optional, much faster non-cryptographic checksums
+except ImportError:
+	xxhash = None
+
+try:
+	import zstandard	# optional, zstd compressed raw objects
+except ImportError:
+	zstandard = None
 
 """
 This class is used as a simulation for S3 into local development
 Allowing pipeline to be developed locally with AWS
 """
 
+# Write block size for copying client files
+COPY_BUFFER_SIZE = 1024 * 1024
+
+XXHASH_ALGORITHMS = ("xxh64", "xxh3_64", "xxh3_128", "xxh32")
+
+# compression -> suffix added to the raw object, the CSV reader infers the codec from it
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+# objects with one of these suffixes are stored as they are
+COMPRESSED_SUFFIXES = (".gz", ".zst", ".bz2", ".xz", ".zip")
+
+# Sidecar metadata of every raw object - <raw_path>/.meta/<client_id>/<object name>.json
+METADATA_DIR = ".meta"
+
+
+def new_hasher(algorithm: str):
+	"""
+	hashlib algorithm (md5, blake2b, sha256 ...) or, when the xxhash package is installed, xxh64/xxh3_64/xxh3_128/xxh32
+	"""
+	if algorithm in XXHASH_ALGORITHMS:
+		if xxhash is None:
+			raise ValueError(f"Checksum algorithm {algorithm} needs the xxhash package")
+		return getattr(xxhash, algorithm)()
+	return hashlib.new(algorithm)
+
+
+def compressed_writer(path, compression: str):
+	"""
+	Binary file object writing path compressed with gzip or zstd (needs the zstandard package)
+	"""
+	if compression == "gzip":
+		return gzip.open(path, "wb", compresslevel=6)
+	if compression == "zstd":
+		if zstandard is None:
+			raise ValueError("zstd compression needs the zstandard package")
+		return zstandard.ZstdCompressor(level=3).stream_writer(open(path, "wb"), closefd=True)
+	raise ValueError(f"Unknown compression: {compression}")
+
+
+def open_raw(path):
+	"""
+	Binary stream of a raw object's content, decompressed by suffix (.gz/.zst)
+	"""
+	path = Path(path)
+	if path.suffix == ".gz":
+		return gzip.open(path, "rb")
+	if path.suffix == ".zst":
+		if zstandard is None:
+			raise ValueError("zstd compressed objects need the zstandard package")
+		return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+	return open(path, "rb")
+
+
 class IngestionS3Simulator:
-	def __init__(self, raw_path="data/raw"):
+	def __init__(self, raw_path="data/raw", checksum_algorithms: Iterable[str] = ("md5",),
+			compression: Optional[str] = None, archive_path=None):
+		"""
+		checksum_algorithms - computed while the file is copied, returned in metadata["checksums"].
+		md5 is always included, metadata["checksum"] stays the MD5
+
+		Storage tiers of the raw objects
+		- raw		- <raw_path>/<client_id>/, plain after upload_file, compressed by
+					  compress_object once the pipeline has parsed it
+		- archive	- <archive_path>/<client_id>/ (default <raw_path>/../archive), always compressed,
+					  objects are moved there and deleted by apply_retention
+
+		compression		- gzip | zstd (needs zstandard) used by compress_object/apply_retention,
+						  None keeps the raw tier uncompressed (archive then uses gzip)
+
+		Every object has a sidecar metadata file (see METADATA_DIR) - get_metadata reads
+		size and checksums from it instead of hashing the object.
+		"""
+		self.checksum_algorithms = tuple(dict.fromkeys(("md5",) + tuple(checksum_algorithms)))
+		for algorithm in self.checksum_algorithms:
+			new_hasher(algorithm)	# fail fast on unknown/unavailable algorithms
+		if compression is not None:
+			if compression not in COMPRESSION_SUFFIXES:
+				raise ValueError(f"Unknown compression: {compression}")
+			if compression == "zstd" and zstandard is None:
+				raise ValueError("zstd compression needs the zstandard package")
+		self.compression = compression
+
 		# Initialized with the storage path of the file
 		self.raw_path = Path(raw_path)
 		"""
@@ -20,6 +115,7 @@ class IngestionS3Simulator:
 		exists_ok=True - doesnt raise error if directory already exists
 		"""
 		self.raw_path.mkdir(parents=True, exist_ok=True)
+		self.archive_path = Path(archive_path) if archive_path is not None else self.raw_path.parent / "archive"
 
 	
 
@@ -33,26 +129,63 @@ class IngestionS3Simulator:
 	    Returns:
 	        str: The MD5 checksum of the file in hexadecimal format, or None if the file is not found.
 	    """
-	    md5_hash = hashlib.md5()
 	    try:
-	        with open(file_path, "rb") as f:
-	            # Read and update hash in chunks of 4KB
-	            for byte_block in iter(lambda: f.read(4096), b""):
-	                md5_hash.update(byte_block)
-	        return md5_hash.hexdigest()
+	        # hashed straight from the mapped pages (see MappedRawFile)
+	        with MappedRawFile(file_path) as mapped:
+	            return mapped.checksums({"md5": hashlib.md5()})["md5"]
 	    except FileNotFoundError:
 	        #print(f"Error: File '{file_path}' not found.")
 	        return None
 
+	def _copy_and_hash(self, source_path, target_path, expected: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+		"""
+		Maps the source once - every block of the mapping is hashed and written as a
+		memoryview slice, there is no read() into a user space buffer at all.
+		Replaces shutil.copy2 + a second full read for the MD5.
 
+		expected - checksums the caller computed before (e.g. the dedup MD5). The stored
+		checksums always come from the bytes written, a mismatch means the source changed
+		in between: the copy is removed and ValueError raised
+
+		Returns - {algorithm: hexdigest}
+		"""
+		hashers = {algorithm: new_hasher(algorithm) for algorithm in self.checksum_algorithms}
+
+		with MappedRawFile(source_path) as mapped, open(target_path, "wb") as dst:
+			for block in mapped.blocks(block_size=COPY_BUFFER_SIZE):
+				for hasher in hashers.values():
+					hasher.update(block)
+				dst.write(block)
+
+		# keep the timestamps/permissions copy2 used to preserve
+		shutil.copystat(source_path, target_path)
+
+		checksums = {algorithm: hasher.hexdigest() for algorithm, hasher in hashers.items()}
+		changed = [algorithm for algorithm, digest in (expected or {}).items()
+			if algorithm in checksums and checksums[algorithm] != digest]
+		if changed:
+			Path(target_path).unlink(missing_ok=True)
+			raise ValueError(f"{source_path} changed while it was uploaded, {', '.join(changed)} checksum differs")
+		return checksums
+
+
+
+	def file_checksum(self, file_path) -> str:
+		"""
+		Checksum of a client file before it is uploaded, same value as upload_file's "checksum"
+		"""
+		return self._calculate_md5(file_path)
 
 	"""
 	Upload file with full metadata tracking
 
+	expected_checksums - {algorithm: hexdigest} computed for file_path before (file_checksum),
+	checked against the copy - ValueError when the file changed in between
+
 	Returns:
 		Metadata dictionary
 	"""
-	def upload_file(self, client_id: str, file_path: str, content: bytes = None) -> dict:
+	def upload_file(self, client_id: str, file_path: str, content: bytes = None, expected_checksums: Optional[Dict[str, str]] = None) -> dict:
 		#timestamp for file version
 		timestamp = datetime.now().strftime('%y%m%d_%H%M%S')
 		# extract filename from the full path
@@ -60,43 +193,234 @@ class IngestionS3Simulator:
 		#create client specific folder
 		client_path = self.raw_path / client_id
 		client_path.mkdir(exist_ok=True)
-		#create unique target filename
-		target_path = client_path / f"{timestamp}_{filename}"
+		#create unique target filename - pid + random suffix, parallel uploads of the same name in the same second don't collide
+		target_path = client_path / f"{timestamp}_{os.getpid()}_{uuid.uuid4().hex[:6]}_{filename}"
 
-		#write the file content
+		#write the file content, hashing it on the way
 		if content:
 			with open(target_path, 'wb') as f:
 				f.write(content)
+			checksums = {}
+			for algorithm in self.checksum_algorithms:
+				hasher = new_hasher(algorithm)
+				hasher.update(content)
+				checksums[algorithm] = hasher.hexdigest()
 		else:
-			shutil.copy2(file_path, target_path)
+			checksums = self._copy_and_hash(file_path, target_path, expected=expected_checksums)
 
-		file_hash = self._calculate_md5(target_path)
-		return {
+		metadata = {
 			"client_id": client_id,
 			"file_name": file_path,
 			"ingestion_time": datetime.now(),
 			"file_size": target_path.stat().st_size,
-			"checksum": file_hash,
+			"checksum": checksums["md5"],
+			"checksums": checksums,
 			"local_path": str(target_path)
 		}
+		self._write_sidecar(client_id, target_path.name, {
+			**metadata,
+			"file_name": str(file_path),
+			"ingestion_time": metadata["ingestion_time"].isoformat(),
+			"object": target_path.name,
+			"stored_size": metadata["file_size"],
+			"compression": None,
+			"tier": "raw",
+		})
+		return metadata
+
+	def _sidecar_path(self, client_id: str, name: str) -> Path:
+		return self.raw_path / METADATA_DIR / client_id / f"{name}.json"
+
+	def _read_sidecar(self, client_id: str, name: str) -> Optional[dict]:
+		try:
+			with open(self._sidecar_path(client_id, name)) as f:
+				return json.load(f)
+		except FileNotFoundError:
+			return None
+
+	def _write_sidecar(self, client_id: str, name: str, sidecar: dict):
+		"""
+		Written to a temp file and renamed, a reader never sees half a sidecar
+		"""
+		path = self._sidecar_path(client_id, name)
+		path.parent.mkdir(parents=True, exist_ok=True)
+		temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+		with open(temp_path, "w") as f:
+			json.dump(sidecar, f, default=str)
+		os.replace(temp_path, path)
+
+	def _object_path(self, sidecar: dict) -> Path:
+		return Path(sidecar["local_path"])
+
+	def _find_object(self, client_id: str, filename: str):
+		"""
+		filename - the name upload_file gave the object, with or without the compression suffix
+
+		Returns - (name, sidecar or None, current path or None)
+		"""
+		for name in dict.fromkeys([filename] + [filename[:-len(suffix)] for suffix in COMPRESSION_SUFFIXES.values() if filename.endswith(suffix)]):
+			sidecar = self._read_sidecar(client_id, name)
+			if sidecar is not None:
+				path = self._object_path(sidecar)
+				return name, sidecar, path if path.exists() else None
+		# objects uploaded before sidecars existed
+		path = self.raw_path / client_id / filename
+		return filename, None, path if path.exists() else None
+
+	def _compress(self, source_path: Path, target_path: Path, compression: str):
+		temp_path = target_path.with_name(f".{target_path.name}.{os.getpid()}.tmp")
+		with MappedRawFile(source_path) as mapped, compressed_writer(temp_path, compression) as dst:
+			for block in mapped.blocks(block_size=COPY_BUFFER_SIZE):
+				dst.write(block)
+		shutil.copystat(source_path, temp_path)
+		os.replace(temp_path, target_path)
+		source_path.unlink()
+
+	def compress_object(self, client_id: str, filename: str, compression: Optional[str] = None) -> dict:
+		"""
+		Compresses a raw object in place (<name>.gz / <name>.zst), the plain copy is removed.
+		Objects already compressed (client sent .csv.gz ...) are left as they are.
+		The parser reads the compressed object as a stream (see csv_reader / open_raw).
+
+		compression - default self.compression, gzip when that is None too
+
+		Returns - the updated sidecar metadata (local_path, stored_size, compression)
+		"""
+		compression = compression or self.compression or "gzip"
+		name, sidecar, path = self._find_object(client_id, filename)
+		if path is None:
+			raise FileNotFoundError(f"No raw object {client_id}/{filename}")
+		if sidecar is None:
+			sidecar = self._build_sidecar(client_id, name, path)
+		if path.suffix in COMPRESSED_SUFFIXES:
+			return sidecar
+
+		target_path = path.with_name(path.name + COMPRESSION_SUFFIXES[compression])
+		self._compress(path, target_path, compression)
+		sidecar.update({"local_path": str(target_path), "stored_size": target_path.stat().st_size, "compression": compression})
+		self._write_sidecar(client_id, name, sidecar)
+		return sidecar
+
+	def _build_sidecar(self, client_id: str, name: str, path: Path) -> dict:
+		"""
+		Sidecar of an object uploaded before sidecars existed - hashes it once
+		"""
+		hashers = {algorithm: new_hasher(algorithm) for algorithm in self.checksum_algorithms}
+		size = 0
+		with open_raw(path) as f:
+			for block in iter(lambda: f.read(COPY_BUFFER_SIZE), b""):
+				size += len(block)
+				for hasher in hashers.values():
+					hasher.update(block)
+		checksums = {algorithm: hasher.hexdigest() for algorithm, hasher in hashers.items()}
+		sidecar = {
+			"client_id": client_id,
+			"file_name": name,
+			"ingestion_time": datetime.fromtimestamp(path.stat().st_mtime).isoformat(),
+			"file_size": size,
+			"checksum": checksums["md5"],
+			"checksums": checksums,
+			"local_path": str(path),
+			"object": name,
+			"stored_size": path.stat().st_size,
+			"compression": next((c for c, suffix in COMPRESSION_SUFFIXES.items() if path.suffix == suffix), None),
+			"tier": "archive" if self.archive_path in path.parents else "raw",
+		}
+		self._write_sidecar(client_id, name, sidecar)
+		return sidecar
+
+	def open_object(self, client_id: str, filename: str):
+		"""
+		Binary stream of an object's original content, whatever tier/compression it is in
+		"""
+		_, _, path = self._find_object(client_id, filename)
+		if path is None:
+			raise FileNotFoundError(f"No raw object {client_id}/{filename}")
+		return open_raw(path)
+
+	def list_objects(self, client_id: Optional[str] = None) -> List[dict]:
+		"""
+		Sidecar metadata of every object (of one client), oldest first
+		"""
+		index_path = self.raw_path / METADATA_DIR
+		objects = []
+		for sidecar_path in index_path.glob(f"{client_id or '*'}/*.json"):
+			try:
+				with open(sidecar_path) as f:
+					objects.append(json.load(f))
+			except FileNotFoundError:
+				continue	# deleted since the glob (delete_file, another retention run)
+		objects.sort(key=lambda sidecar: sidecar["ingestion_time"])
+		return objects
+
+	def apply_retention(self, archive_after_days: Optional[int] = None, delete_after_days: Optional[int] = None,
+			client_id: Optional[str] = None, now: Optional[datetime] = None) -> Dict[str, List[str]]:
+		"""
+		Retention policy over the sidecar index, ages are from the ingestion time
+		- archive_after_days	- raw tier objects are compressed (if not yet) into the archive tier
+		- delete_after_days		- objects in any tier are deleted with their sidecar
+
+		Objects deleted or archived concurrently (another retention run, delete_file) are skipped.
+
+		Returns - {"archived": [object names], "deleted": [object names]}
+		"""
+		now = now or datetime.now()
+		result = {"archived": [], "deleted": []}
+		for sidecar in self.list_objects(client_id):
+			age = now - datetime.fromisoformat(sidecar["ingestion_time"])
+			name, path = sidecar["object"], self._object_path(sidecar)
+			if delete_after_days is not None and age > timedelta(days=delete_after_days):
+				path.unlink(missing_ok=True)
+				self._sidecar_path(sidecar["client_id"], name).unlink(missing_ok=True)
+				result["deleted"].append(name)
+			elif archive_after_days is not None and age > timedelta(days=archive_after_days) and sidecar["tier"] == "raw" and path.exists():
+				archive_client_path = self.archive_path / sidecar["client_id"]
+				archive_client_path.mkdir(parents=True, exist_ok=True)
+				try:
+					if path.suffix in COMPRESSED_SUFFIXES:
+						target_path = archive_client_path / path.name
+						shutil.move(path, target_path)
+					else:
+						compression = self.compression or "gzip"
+						target_path = archive_client_path / (path.name + COMPRESSION_SUFFIXES[compression])
+						self._compress(path, target_path, compression)
+						sidecar["compression"] = compression
+				except FileNotFoundError:
+					continue
+				sidecar.update({"local_path": str(target_path), "stored_size": target_path.stat().st_size, "tier": "archive"})
+				self._write_sidecar(sidecar["client_id"], name, sidecar)
+				result["archived"].append(name)
+		return result
 
 	def delete_file(self, client_id: str, filename: str) -> bool:
 
-		file_path = self.raw_path / client_id / filename
-		if file_path.exists():
-			file_path.unlink()
+		name, sidecar, file_path = self._find_object(client_id, filename)
+		if sidecar is not None:
+			self._sidecar_path(client_id, name).unlink(missing_ok=True)
+		if file_path is not None:
+			file_path.unlink(missing_ok=True)
 			return True
 		return False
 
 	def get_metadata(self, client_id: str, filename: str) -> dict:
-
-		file_path = self.raw_path / client_id / filename
-		if not file_path.exists():
+		"""
+		Served from the sidecar, the object is not read. file_size/checksum are of the
+		original content, stored_size is what the object takes in its tier.
+		"""
+		name, sidecar, file_path = self._find_object(client_id, filename)
+		if file_path is None:
 			return None
+		if sidecar is None:
+			sidecar = self._build_sidecar(client_id, name, file_path)
 
 		return {
 			"client_id": client_id,
 			"file_name": filename,
-			"file_size": file_path.stat().st_size,
-			"checksum": self._calculate_md5(file_path)
+			"file_size": sidecar["file_size"],
+			"checksum": sidecar["checksum"],
+			"checksums": sidecar["checksums"],
+			"stored_size": sidecar["stored_size"],
+			"compression": sidecar["compression"],
+			"tier": sidecar["tier"],
+			"local_path": sidecar["local_path"]
 		}
@@ -0,0 +1,163 @@
+"""
+Memory-mapped view of a raw client file
+
+One read-only mmap of data/raw/<client_id>/<file> serves every pass over the bytes:
+
+- checksums		- hashlib/xxhash are fed memoryview slices of the mapping, no read() copies
+- delimiter		- sniffed from the header line (, ; tab |)
+- count_rows	- newlines counted with numpy over the mapped pages
+- split			- newline-aligned byte ranges for parallel validation
+- parsing		- MemberCSVReader hands the mapping to pyarrow as a zero-copy buffer
+
+Pages come straight from the page cache, so a file copied into data/raw just before is
+not read from disk again. Row counting and splitting assume no newlines inside quoted
+cells, which member files don't have. Compressed files (.csv.gz ...) are mapped too,
+but only hashing applies to them - counting and splitting need plain CSV.
+"""
+
+import mmap
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+# hashing/counting block, large enough to amortize the per-call overhead
+SCAN_BLOCK_SIZE = 8 * 1024 * 1024
+
+DELIMITERS = (b",", b";", b"\t", b"|")
+NEWLINE = ord("\n")
+
+
+def sniff_delimiter(header: bytes) -> str:
+	"""
+	Most frequent candidate delimiter of a header line, "," when there is none
+	"""
+	counts = {delimiter: header.count(delimiter) for delimiter in DELIMITERS}
+	delimiter = max(DELIMITERS, key=lambda candidate: counts[candidate])
+	return delimiter.decode() if counts[delimiter] else ","
+
+
+class MappedRawFile:
+	"""
+	with MappedRawFile(path) as mapped:
+		checksums = mapped.checksums({"md5": hashlib.md5()})
+		ranges = mapped.split(4)
+	"""
+
+	def __init__(self, path):
+		self.path = Path(path)
+		self.size = self.path.stat().st_size
+		self._file = None
+		self._mmap = None
+
+	def open(self) -> "MappedRawFile":
+		self._file = open(self.path, "rb")
+		# an empty file can't be mapped, it is treated as an empty buffer
+		if self.size:
+			self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+			if hasattr(self._mmap, "madvise"):
+				self._mmap.madvise(mmap.MADV_SEQUENTIAL)
+		return self
+
+	def close(self):
+		if self._mmap is not None:
+			try:
+				self._mmap.close()
+			except BufferError:
+				# a slice is still referenced (e.g. by an exception traceback), the mapping is
+				# released with it - never hide the original error behind this one
+				pass
+			self._mmap = None
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+
+	def __enter__(self):
+		return self.open()
+
+	def __exit__(self, exc_type, exc, tb):
+		self.close()
+
+	@property
+	def buffer(self):
+		""" the mapping (or b"" for an empty file), usable wherever the buffer protocol is """
+		if self._file is None:
+			raise ValueError(f"{self.path} is not open")
+		return self._mmap if self._mmap is not None else b""
+
+	def view(self, start: int = 0, end: int = None) -> memoryview:
+		""" zero-copy slice of the file, release() it before close() """
+		return memoryview(self.buffer)[start:end]
+
+	def blocks(self, start: int = 0, end: int = None, block_size: int = SCAN_BLOCK_SIZE) -> Iterable[memoryview]:
+		end = self.size if end is None else end
+		with memoryview(self.buffer) as view:
+			for offset in range(start, end, block_size):
+				with view[offset:min(offset + block_size, end)] as block:
+					yield block
+
+	def checksums(self, hashers: Dict[str, object]) -> Dict[str, str]:
+		"""
+		hashers - {algorithm: hashlib-style object}, e.g. ingest_s3_simulation.new_hasher
+
+		Returns - {algorithm: hexdigest}
+		"""
+		for block in self.blocks():
+			for hasher in hashers.values():
+				hasher.update(block)
+		return {algorithm: hasher.hexdigest() for algorithm, hasher in hashers.items()}
+
+	def header_end(self) -> int:
+		""" offset of the first data row """
+		newline = self.buffer.find(b"\n") if self.size else -1
+		return self.size if newline == -1 else newline + 1
+
+	def header(self) -> bytes:
+		return bytes(self.buffer[:self.header_end()])
+
+	def delimiter(self) -> str:
+		""" see sniff_delimiter """
+		return sniff_delimiter(self.header())
+
+	def count_newlines(self, start: int = 0, end: int = None) -> int:
+		import numpy as np
+
+		count = 0
+		for block in self.blocks(start, end):
+			count += int(np.count_nonzero(np.frombuffer(block, dtype=np.uint8) == NEWLINE))
+		return count
+
+	def count_rows(self) -> int:
+		"""
+		Data rows (header excluded), a last row without a trailing newline counts too
+		"""
+		start = self.header_end()
+		if start >= self.size:
+			return 0
+		rows = self.count_newlines(start)
+		if self.buffer[self.size - 1] != NEWLINE:
+			rows += 1
+		return rows
+
+	def split(self, parts: int, min_bytes: int = 0) -> List[Tuple[int, int]]:
+		"""
+		Splits the data rows into at most parts byte ranges of about the same size,
+		every range starts at the beginning of a row and ends after a newline (or at EOF)
+
+		min_bytes - ranges aren't made smaller than this
+
+		Returns - [(start, end)], empty when the file has no data rows
+		"""
+		start = self.header_end()
+		data_size = self.size - start
+		if data_size <= 0:
+			return []
+		parts = max(1, min(parts, data_size // min_bytes if min_bytes else parts))
+		target = -(-data_size // parts)
+
+		ranges = []
+		while start < self.size:
+			newline = self.buffer.find(b"\n", min(start + target, self.size) - 1)
+			end = self.size if newline == -1 else newline + 1
+			ranges.append((start, end))
+			start = end
+		return ranges
+
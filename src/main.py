@@ -8,23 +8,37 @@ src
 - validation
 requirements.txt
 pipeline.py
+
+Startup - importing this module only loads the standard library and the pipeline's own
+light modules. pandas, numpy, pydantic/email-validator and pyarrow are imported the first
+time a file is parsed or validated, so the audit/query CLI commands (python -m src) and
+duplicate skips never pay for them.
 """
+from __future__ import annotations
+
 import csv
-import sys
 import os
+import time
+from collections import deque
 from pathlib import Path
-from typing import Tuple, List, Dict, Any
-import pandas as pd
-from pydantic import ValidationError
-sys.path.append(str(Path(__file__).parent))  #adds the directory containing the current Python script to the list of paths Python searches when importing modules
+from typing import Tuple, List, Dict, Any, Optional, TYPE_CHECKING
 
 #importing the custom modules
-from audit.logger import AuditLogger	#creates audit for HIPPA compliance
-from ingestion.ingest_s3_simulation import IngestionS3Simulator #AWS S3 simulation
-from validation.schema_validation import RawMemberSchema #Data validation and schema normalization
-from storage.database_sqlite import DataSQLiteStorage #SQLite DB connection and operation
+from .audit.logger import AuditLogger	#creates audit for HIPPA compliance
+from .ingestion.ingest_s3_simulation import IngestionS3Simulator #AWS S3 simulation
+from .ingestion.csv_reader import MemberCSVReader, is_csv_file	#declared schema CSV parsing
+from .ingestion.mapped_file import MappedRawFile	#mmap view of the raw file
+from .validation.rejects_writer import RejectsWriter	#rejected rows + error summary
+from .metrics.stage_metrics import StageMetrics, MetricsExporter	#per stage timings
+from .storage.database_sqlite import DataSQLiteStorage #SQLite DB connection and operation
 from datetime import datetime
 
+if TYPE_CHECKING:
+	import pandas as pd
+
+# below this a file is validated serially, a process pool costs more than it saves
+PARALLEL_VALIDATION_MIN_BYTES = 64 * 1024 * 1024
+
 class RadiantGrapgDemoDataPipeline:
 	"""
 	1.	Client Files		→ 	S3/SFTP
@@ -38,43 +52,236 @@ class RadiantGrapgDemoDataPipeline:
 	5.	Analytics Serving	→ 	SQLite/Parquet + Example Queries
 	"""
 
-	def __init__(self):
+	def __init__(self, validation_mode: str = "row", chunk_size: Optional[int] = None, deduplicate: bool = True,
+			delta: bool = False, report_missing: bool = False, parquet_root: Optional[str] = None, audit_sink: str = "json",
+			metrics_path: Optional[str] = "data/metrics", prometheus: bool = False, csv_reader: Optional[MemberCSVReader] = None,
+			validation_workers: int = 1, parallel_min_bytes: int = PARALLEL_VALIDATION_MIN_BYTES,
+			history_retention_days: Optional[int] = None, raw_compression: Optional[str] = None,
+			metrics_instance: Optional[str] = None):
+		"""
+		validation_mode
+		- row			- RawMemberSchema/MemberSchema per row
+		- vectorized	- validate_dataframe, whole pandas columns at once
+
+		chunk_size
+		- None			- whole file is read, validated and stored in one go
+		- N				- streaming mode, N rows at a time are read, validated, stored and rejects written
+
+		deduplicate
+		- True			- a file whose content was already processed for the client is skipped,
+						  the earlier result is returned and the skip is audited
+
+		delta
+		- True			- only new or changed members (by members.row_hash) are written, the
+						  audit record reports new/changed/unchanged counts
+		report_missing	- with delta, also count stored members missing from the file
+
+		parquet_root
+		- path			- valid records are also written to the partitioned Parquet serving layer (needs pyarrow)
+
+		audit_sink
+		- json			- one JSON file per audit event
+		- jsonl			- buffered JSON lines segments with an index (see audit.jsonl_sink)
+
+		metrics_path	- per stage wall time/rows/bytes/RSS of every file are appended here
+						  (see metrics.stage_metrics), None only keeps them in the audit record and result
+		prometheus		- also keep this process's running totals in <metrics_path>/pipeline_metrics-<instance>.prom
+
+		metrics_instance
+		- None			- the Prometheus file is named after the pid and removed when the process exits
+		- name			- stable file name and pipeline_instance label for a long running service
+
+		csv_reader		- how client files are parsed, defaults to MemberCSVReader() - member columns
+						  only, all as strings, pyarrow engine when installed, gzip/zstd files read as is
+
+		validation_workers
+		- 1				- serial validation
+		- N				- whole file mode: a plain .csv file of at least parallel_min_bytes is split
+						  into N newline-aligned byte ranges (MappedRawFile.split) that are parsed and
+						  validated in a process pool, results are merged back in file order.
+						  0 uses every available core. Compressed files, streaming mode and
+						  csv_reader(string_dtypes=False) (per range dtype inference) stay serial
+
+		history_retention_days
+		- None			- every members_history version is kept
+		- N				- versions that ended more than N days ago are compacted away on ingest
+
+		raw_compression
+		- None			- the raw copy of every client file stays as uploaded
+		- gzip | zstd	- the raw copy is compressed once it has been parsed (zstd needs zstandard),
+						  see IngestionS3Simulator for the tiers and retention
+		"""
+		if validation_mode not in ("row", "vectorized"):
+			raise ValueError(f"Unknown validation_mode: {validation_mode}")
+		if chunk_size is not None and chunk_size <= 0:
+			raise ValueError(f"chunk_size must be positive: {chunk_size}")
+		if validation_workers < 0:
+			raise ValueError(f"validation_workers can't be negative: {validation_workers}")
+		self.validation_mode = validation_mode
+		self.chunk_size = chunk_size
+		self.deduplicate = deduplicate
+		self.delta = delta
+		self.report_missing = report_missing
+		self.csv_reader = csv_reader or MemberCSVReader()
+		self.validation_workers = validation_workers or available_cores()
+		self.parallel_min_bytes = parallel_min_bytes
 
 		#Initialize with all the components
-		self.logger = AuditLogger()
-		self.ingest_s3_simulation = IngestionS3Simulator()
+		self.logger = AuditLogger(sink=audit_sink)
+		self.metrics_exporter = MetricsExporter(metrics_path, prometheus=prometheus, instance=metrics_instance) if metrics_path is not None else None
+		self.ingest_s3_simulation = IngestionS3Simulator(compression=raw_compression)
 		#self.schema_validation = RawMemberSchema()
-		self.database_sqlite = DataSQLiteStorage()
+		self.database_sqlite = DataSQLiteStorage(history_retention_days=history_retention_days)
+		self.parquet_storage = None
+		if parquet_root is not None:
+			from .storage.parquet_storage import DataParquetStorage	# optional dependency
+			self.parquet_storage = DataParquetStorage(parquet_root)
 
 		#print("Pipeline initialized...Done")
 
 	def data_process(self, client_id: str, file_path: str) -> Dict[str, Any]:
 		#2.	Secure Ingestion 	→ 	AWS S3 + IAM
 		
+		metrics = StageMetrics(client_id, file_path)
+
+		# Step 0 -> Skip content that was already processed
+		checksum = None
+		if self.deduplicate:
+			checksum, previous_result = self.find_processed(client_id, file_path, metrics)
+			if previous_result is not None:
+				return self.skip_duplicate(client_id, file_path, checksum, previous_result)
+
+		if self.chunk_size:
+			# Step 1 -> Ingestion of the client file
+			ingestion_metadata = self._upload(client_id, file_path, metrics, checksum)
+
+			#Step 2 -> Data Validation
+			#Step 3 -> Store validated data
+			# Streaming - chunks are stored as they are validated
+			valid_count, rejects, member_counts = self._stream_input_file(
+					client_id,
+					ingestion_metadata['local_path'],
+					ingestion_metadata['file_name'],
+					metrics,
+					ingestion_metadata['ingestion_time']
+				)
+			ingestion_metadata["rejects"] = rejects
+			self._compress_raw(client_id, ingestion_metadata, metrics)
+
+			#Step 4 -> Audit and Compliance
+			return self._audit(client_id, ingestion_metadata, valid_count, rejects["rejected_row_count"], member_counts)
+
+		ingestion_metadata, valid_records, rejected_count = self.ingest_and_validate(client_id, file_path, metrics, checksum)
+		return self.store_validated(client_id, ingestion_metadata, valid_records, rejected_count)
+
+	def find_processed(self, client_id: str, file_path: str, metrics: StageMetrics = None) -> Tuple[str, Optional[Dict[str, Any]]]:
+		"""
+		Hashes the client file in place (no copy) and looks it up in the content hash index
+
+		Returns - (checksum, earlier result or None)
+		"""
+		metrics = metrics or StageMetrics(client_id, file_path)
+		with metrics.stage("checksum", bytes=Path(file_path).stat().st_size):
+			checksum = self.ingest_s3_simulation.file_checksum(file_path)
+			return checksum, self.database_sqlite.get_processed_file(client_id, checksum)
+
+	def _upload(self, client_id: str, file_path: str, metrics: StageMetrics, checksum: Optional[str] = None) -> Dict[str, Any]:
+		"""
+		checksum - MD5 from find_processed, the copy hashes what it writes and fails when that
+		differs (the file changed after the dedup check, its checksum would be recorded wrong)
+		"""
+		with metrics.stage("ingest") as stage:
+			ingestion_metadata = self.ingest_s3_simulation.upload_file(client_id, file_path,
+				expected_checksums={"md5": checksum} if checksum is not None else None)
+			stage["bytes"] = ingestion_metadata["file_size"]
+		ingestion_metadata["metrics"] = metrics
+		return ingestion_metadata
+
+	def _compress_raw(self, client_id: str, ingestion_metadata: Dict[str, Any], metrics: StageMetrics):
+		"""
+		Parsing is done with the raw copy, it moves to its compressed form
+		"""
+		if self.ingest_s3_simulation.compression is None:
+			return
+		with metrics.stage("compress", bytes=ingestion_metadata["file_size"]):
+			sidecar = self.ingest_s3_simulation.compress_object(client_id, Path(ingestion_metadata["local_path"]).name)
+		ingestion_metadata["local_path"] = sidecar["local_path"]
+		ingestion_metadata["stored_size"] = sidecar["stored_size"]
+
+	def skip_duplicate(self, client_id: str, file_path: str, checksum: str, previous_result: Dict[str, Any]) -> Dict[str, Any]:
+		"""
+		No copy, validation or DB work - only the skip is written to the audit trail
+		"""
+		metadata = {"client_id": client_id, "file_name": str(file_path), "checksum": checksum}
+		skip_audit_log = self.logger.audit_skip(metadata, previous_result)
+
+		result = dict(previous_result)
+		result["status"] = "skipped_duplicate"
+		result["skip_audit_log"] = skip_audit_log
+		return result
+
+	def ingest_and_validate(self, client_id: str, file_path: str, metrics: StageMetrics = None,
+			checksum: Optional[str] = None) -> Tuple[Dict[str, Any], List[Dict], int]:
+		"""
+		Steps 1-2, no database access - safe to run in a worker process (see run_batch)
+		Rejected rows are written to data/rejected here, their summary (see RejectsWriter)
+		is added to ingestion_metadata["rejects"] and the stage timings to ingestion_metadata["metrics"].
 
+		Returns - (ingestion_metadata, valid_records, rejected_count)
+		"""
 		# Step 1 -> Ingestion of the client file
 		#upload_file(self, client_id: str, file_path: str, content: bytes = None) -> dict:
-		ingestion_metadata = self.ingest_s3_simulation.upload_file(client_id, file_path)
+		metrics = metrics or StageMetrics(client_id, file_path)
+		ingestion_metadata = self._upload(client_id, file_path, metrics, checksum)
 		#print(f"File Ingestion {client_id} {file_path}...Done")
 
 		#Step 2 -> Data Validation
-		#print("Step 2 -> Data Validation--------------------")
-
-		
-		valid_records, rejected_records = self._process_input_file(
+		valid_records, rejects = self._process_input_file(
 				client_id, 
 				ingestion_metadata['local_path'],
-				ingestion_metadata['file_name']
+				ingestion_metadata['file_name'],
+				metrics
 			)
-		#print(f"Valid Records - {valid_records}")
-		#print(f"rejected_records - {rejected_records}")
+		ingestion_metadata["rejects"] = rejects
+		self._compress_raw(client_id, ingestion_metadata, metrics)
+
+		return ingestion_metadata, valid_records, rejects["rejected_row_count"]
+
+	def store_validated(self, client_id: str, ingestion_metadata: Dict[str, Any], valid_records: List[Dict], rejected_count: int) -> Dict[str, Any]:
+		"""
+		Steps 3-4, all database writes for one file
+		"""
+		metrics = ingestion_metadata.setdefault("metrics", StageMetrics(client_id, ingestion_metadata["file_name"]))
+
 		#Step 3 -> Store validated data
-		self.database_sqlite.insert_members(client_id, valid_records)
-		#print(f"Inserted {len(valid_records)} valid records into Table MEMBERS")
+		with metrics.stage("db_upsert", rows=len(valid_records)):
+			if self.delta:
+				self.database_sqlite.reset_delta_tracking(client_id)
+			member_counts = self.database_sqlite.insert_members(client_id, valid_records, delta=self.delta)
+		if self.parquet_storage is not None:
+			with metrics.stage("parquet", rows=len(valid_records)):
+				self.parquet_storage.insert_members(client_id, valid_records, ingestion_time=ingestion_metadata["ingestion_time"])
 
 		#Step 4 -> Audit and Compliance
+		return self._audit(client_id, ingestion_metadata, len(valid_records), rejected_count, member_counts)
+
+	def _audit(self, client_id: str, ingestion_metadata: Dict[str, Any], valid_count: int, rejected_count: int, member_counts: Dict[str, int]) -> Dict[str, Any]:
+		delta = None
+		if self.delta:
+			delta = {
+				"new": member_counts["inserted"],
+				"changed": member_counts["updated"],
+				"unchanged": member_counts["unchanged"]
+			}
+			if self.report_missing:
+				delta["missing"] = self.database_sqlite.count_missing_members(client_id)
+
+		metrics = ingestion_metadata.get("metrics") or StageMetrics(client_id, ingestion_metadata["file_name"])
+		audit_started = time.perf_counter()
+
 		#audit_log(self, valid_row_count: int, rejected_row_count: int, metadata: Dict[str, Any]) -> str:
-		audit_log = self.logger.audit_log(len(valid_records), len(rejected_records), ingestion_metadata)
+		# the audit record has every stage up to here, the exported metrics include the audit stage too
+		audit_log = self.logger.audit_log(valid_count, rejected_count, ingestion_metadata, delta=delta, metrics=metrics.to_dict())
 
 		#Insert into DB as well
 		ingestion_time = ingestion_metadata["ingestion_time"]
@@ -85,135 +292,361 @@ class RadiantGrapgDemoDataPipeline:
 
 		file_name_str = str(ingestion_metadata['file_name'])
 
-		self.database_sqlite.insert_audit_log(client_id, file_name_str , len(valid_records), len(rejected_records),  ingestion_time_str)
+		rejects = ingestion_metadata.get("rejects") or {}
+		self.database_sqlite.insert_audit_log(client_id, file_name_str , valid_count, rejected_count,  ingestion_time_str,
+			error_counts=rejects.get("error_counts"))
+
+		result = {
+			"client_id": client_id,
+			"file_name": file_name_str,
+			"status": "success",
+			"valid_row_count": valid_count,
+			"rejected_row_count": rejected_count,
+			"inserted_row_count": member_counts["inserted"],
+			"updated_row_count": member_counts["updated"],
+			"unchanged_row_count": member_counts["unchanged"],
+			"checksum": ingestion_metadata["checksum"],
+			"audit_log": audit_log
+		}
+		if rejects.get("rejects_file"):
+			result["rejects_file"] = rejects["rejects_file"]
+		if delta is not None:
+			result["delta"] = delta
+
+		self.database_sqlite.record_processed_file(client_id, ingestion_metadata["checksum"], file_name_str, result)
+
+		metrics.add("audit", time.perf_counter() - audit_started)
+		result["metrics"] = metrics.to_dict()
+		if self.metrics_exporter is not None:
+			self.metrics_exporter.export(result["metrics"])
+
+		return result
+
+	def _process_input_file(self, client_id: str, file_path: str, file_name: str, metrics: StageMetrics = None) -> Tuple[List[Dict], Dict[str, Any]]:
+		"""
+		Parse/validation errors are raised, the file is then never recorded as processed
+		and can be sent again.
 
-	def _process_input_file(self, client_id: str, file_path: str, file_name: str) -> Tuple[List[Dict], List[Dict]]:
+		Returns - (valid_records, rejects summary)
+		"""
+		metrics = metrics or StageMetrics(client_id, file_name)
 		valid_records = []
-		rejected_records = []
+		rejects = RejectsWriter(client_id, file_name)
 
 		try:
-			df = pd.read_csv(file_path)
-
-			for row in df.to_dict(orient="records"):
-				raw_record = RawMemberSchema(raw_data=row)
-				normalize_record = raw_record.normalize()
-
-				if normalize_record is None:
-					rejected_records.append({ "client_id": client_id,"file_name": file_name,"raw_data": row,"errors": raw_record.errors})
-					continue  # skip to next row
-
-				record_dict = normalize_record.dict()
-				record_dict['client_id'] = client_id
-				valid_records.append(record_dict)
-
-			if rejected_records:
-				rejected_path = Path(f"data/rejected/{client_id}")
-				rejected_path.mkdir(parents=True, exist_ok=True)
-				timestamp = datetime.now().strftime('%y%m%d_%H%M%S')
-				rejected_file = rejected_path / f"rejected_{timestamp}.csv"
-
-				with open(rejected_file, 'w', newline="", encoding="utf-8") as f:
-					writer = csv.writer(f)
-					writer.writerow(["row_data", "error_message"])
-					for record in rejected_records:
-						row_data = str(record.get("raw_data", {}))
-						errors = record.get("errors", [])
-						if callable(errors):
-							error_message = str(errors())
-						else:
-							error_message = str(errors)
-						#error_message = "; ".join(errors) if isinstance(errors, list) else str(errors)
-						writer.writerow([row_data, error_message])
-
-
-		except Exception as e:
-			print(f"Error processing client input file-------------{e}")
+			if self._validates_in_parallel(file_path):
+				valid_records, rejected_records = self._validate_parallel(client_id, file_path, file_name, metrics)
+			else:
+				with metrics.stage("parse", bytes=Path(file_path).stat().st_size) as stage:
+					df = self.csv_reader.read(file_path)
+					stage["rows"] = len(df)
+				with metrics.stage("validate", rows=len(df)):
+					valid_records, rejected_records = self._validate(client_id, file_name, df)
+			with metrics.stage("rejects", rows=len(rejected_records)):
+				rejects.write(rejected_records)
+
+		except Exception:
+			rejects.abort()
+			raise
+
+		with metrics.stage("rejects"):
+			return valid_records, rejects.close()
+
+	def _stream_input_file(self, client_id: str, file_path: str, file_name: str, metrics: StageMetrics = None,
+			ingestion_time: Optional[datetime] = None) -> Tuple[int, Dict[str, Any], Dict[str, int]]:
+		"""
+		Reads, validates, stores and writes rejects self.chunk_size rows at a time.
+		Only one chunk of records is held in memory. Errors are raised like in
+		_process_input_file, chunks stored before the error stay stored.
 
-		return valid_records, rejected_records
+		Returns - (valid_count, rejects summary, {"inserted": n, "updated": m, "unchanged": k})
+		"""
+		metrics = metrics or StageMetrics(client_id, file_name)
+		valid_count = 0
+		member_counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+		rejects = RejectsWriter(client_id, file_name)
 
+		if self.delta:
+			self.database_sqlite.reset_delta_tracking(client_id)
+
+		try:
+			dtypes = None
+			if not self.csv_reader.string_dtypes:
+				with metrics.stage("parse", bytes=Path(file_path).stat().st_size):
+					dtypes = self._resolve_chunk_dtypes(file_path)
+
+			chunks = self.csv_reader.read_chunks(file_path, self.chunk_size, dtype=dtypes)
+			for df in metrics.timed_iter("parse", chunks):
+				with metrics.stage("validate", rows=len(df)):
+					valid_records, rejected_records = self._validate(client_id, file_name, df)
+
+				with metrics.stage("db_upsert", rows=len(valid_records)):
+					chunk_counts = self.database_sqlite.insert_members(client_id, valid_records, delta=self.delta)
+				if self.parquet_storage is not None:
+					with metrics.stage("parquet", rows=len(valid_records)):
+						self.parquet_storage.insert_members(client_id, valid_records, ingestion_time=ingestion_time)
+				for key in member_counts:
+					member_counts[key] += chunk_counts[key]
+				valid_count += len(valid_records)
+				with metrics.stage("rejects", rows=len(rejected_records)):
+					rejects.write(rejected_records)
+
+		except Exception:
+			rejects.abort()
+			raise
+
+		with metrics.stage("rejects"):
+			return valid_count, rejects.close(), member_counts
+
+	def _resolve_chunk_dtypes(self, file_path: str) -> Dict[str, Any]:
+		"""
+		Only needed with MemberCSVReader(string_dtypes=False).
+		pandas infers dtypes per chunk, so a column can be int64 in one chunk and
+		object/float64 in another, which changes str(value) during validation.
+		A first bounded-memory pass works out the dtype each column gets when the
+		whole file is read, so every chunk is parsed the same way.
+		"""
+		import numpy as np
+
+		chunk_dtypes: Dict[str, set] = {}
+		for df in self.csv_reader.read_chunks(file_path, self.chunk_size):
+			for column, dtype in df.dtypes.items():
+				chunk_dtypes.setdefault(column, set()).add(dtype)
+
+		dtypes = {}
+		for column, found in chunk_dtypes.items():
+			if len(found) == 1:
+				dtypes[column] = found.pop()
+			elif all(dtype.kind in "iuf" for dtype in found):
+				dtypes[column] = np.result_type(*found)
+			else:
+				dtypes[column] = object
+		return dtypes
+
+	def _validates_in_parallel(self, file_path: str) -> bool:
+		return (self.validation_workers > 1 and self.csv_reader.string_dtypes
+				and Path(file_path).name.lower().endswith(".csv")
+				and Path(file_path).stat().st_size >= self.parallel_min_bytes)
+
+	def _validate_parallel(self, client_id: str, file_path: str, file_name: str, metrics: StageMetrics) -> Tuple[List[Dict], List[Dict]]:
+		"""
+		Every worker parses and validates one byte range of the mapped file, the results are
+		concatenated in range order and the rejected row_index shifted by the rows before
+		the range - same records, order and row_index as the serial path.
+		The "validate" stage covers parsing in the workers too.
+		"""
+		with metrics.stage("parse", bytes=Path(file_path).stat().st_size):
+			with MappedRawFile(file_path) as mapped:
+				ranges = mapped.split(self.validation_workers)
+
+		from concurrent.futures import ProcessPoolExecutor
 
-	def _deleteme_process_input_file(self, client_id: str, file_path: str, file_name:str) -> Tuple[List[Dict], List[Dict]]:
 		valid_records = []
 		rejected_records = []
+		with metrics.stage("validate") as stage:
+			with ProcessPoolExecutor(max_workers=min(self.validation_workers, len(ranges) or 1)) as pool:
+				futures = [
+					pool.submit(_validate_range_worker, self.csv_reader, self.validation_mode, client_id, file_path, file_name, start, end)
+					for start, end in ranges
+				]
+				row_offset = 0
+				for future in futures:
+					range_valid, range_rejected, row_count = future.result()
+					for record in range_rejected:
+						record["row_index"] += row_offset
+					valid_records.extend(range_valid)
+					rejected_records.extend(range_rejected)
+					row_offset += row_count
+			stage["rows"] = row_offset
+
+		return valid_records, rejected_records
 
+	def _validate(self, client_id: str, file_name: str, df: pd.DataFrame) -> Tuple[List[Dict], List[Dict]]:
+		return _validate_frame(self.validation_mode, client_id, file_name, df)
+
+	@staticmethod
+	def _validate_rows(client_id: str, file_name: str, df: pd.DataFrame) -> Tuple[List[Dict], List[Dict]]:
+		"""
+		Validates every row through RawMemberSchema -> MemberSchema
+		normalize_fast - cached field checks, pydantic only runs for rows that fail them
 		"""
-		Reads the CSV file.
+		from .validation.schema_validation import RawMemberSchema	#Data validation and schema normalization
 
-		Iterates over each row.
+		valid_records = []
+		rejected_records = []
 
-		Validates + normalizes the row against schema in MemberSchema).
+		for row_index, row in zip(df.index, df.to_dict(orient="records")):
+			raw_record = RawMemberSchema(raw_data=row)
+			normalize_record = raw_record.normalize_fast()
 
-		If valid --add to valid_records.
+			if normalize_record is None:
+				rejected_records.append({ "client_id": client_id,"file_name": file_name,"raw_data": row,"errors": raw_record.errors, "row_index": int(row_index)})
+				continue  # skip to next row
 
-		If invalid--add to rejected_records with error details.
+			record_dict = normalize_record.model_dump()
+			record_dict['client_id'] = client_id
+			valid_records.append(record_dict)
 
+		return valid_records, rejected_records
+
+	@staticmethod
+	def _validate_dataframe(client_id: str, file_name: str, df: pd.DataFrame) -> Tuple[List[Dict], List[Dict]]:
 		"""
-		try:
-			#print(f"file_path------------{file_path}")
-			df = pd.read_csv(file_path)
-			#print(df)
-#			for _, row in df.iterrows():  #This works too, but slightly slower on large data because each row is a Pandas Series, not a dict.
-#				try:
-#					raw_record = RawMemberSchema(row.to_dict())
-#					normalize_record = raw_record.normalize()
-#					normalize_record['client_id'] = client_id   #adding client_id during normalization:
-#					valid_records.append(normalize_record.dict())
-#				except ValidationError as e:
-#					rejected_records.append({
-#						"client_id": client_id,
-#						"file_name": file_name,
-#						"raw_data": row,
-#						"errors": e.errors
-#						})
-
-			for row in df.to_dict(orient="records"):
-				try:
-					raw_record = RawMemberSchema(raw_data=row)
-					normalize_record = raw_record.normalize()
-					record_dict = normalize_record.dict()
-					record_dict['client_id'] = client_id
-					valid_records.append(record_dict)
-				except ValidationError as e:
-					rejected_records.append(
-						{
-							"client_id": client_id,
-							"file_name": file_name,
-							"raw_data": row,
-							"errors": e.errors
-						}
-						)
-
-			if rejected_records:
-				#print(rejected_records)
-				rejected_path = Path(f"data/rejected/{client_id}")
-				rejected_path.mkdir(parents=True, exist_ok=True)
-				timestamp = datetime.now().strftime('%y%m%d_%H%M%S')
-				rejected_file = rejected_path / f"rejected_{timestamp}.csv"
-
-				try:
-					with open(rejected_file, 'w', newline="", encoding="utf-8") as f:
-						writer = csv.writer(f)
-						writer.writerow(["row_data", "error_message"])
-						for record in rejected_records:
-							row_data = str(record.get("raw_data", {}))
-							errors = record.get("errors")
-							if callable(errors):
-								error_message = str(errors())
-							else:
-								error_message = str(errors)
-
-							writer.writerow([row_data, error_message])
-				except Exception as e:
-					print(f"Failed to write rejected rows ---- {e}")
-						
-		except Exception as e:
-			print(f"Error processing client input file-------------{e}")
+		Column-wise validation, same records and error messages as _validate_rows
+		"""
+		from .validation.schema_validation import validate_dataframe
+
+		valid_df, rejected_df = validate_dataframe(df)
+
+		valid_records = valid_df.assign(client_id=client_id).to_dict(orient="records")
+		rejected_records = [
+			{"client_id": client_id, "file_name": file_name, "raw_data": row, "errors": errors, "row_index": int(row_index)}
+			for row_index, row, errors in zip(rejected_df.index, rejected_df.drop(columns="errors").to_dict(orient="records"), rejected_df["errors"])
+		]
 
 		return valid_records, rejected_records
 
+def _validate_frame(validation_mode: str, client_id: str, file_name: str, df: pd.DataFrame) -> Tuple[List[Dict], List[Dict]]:
+	if validation_mode == "vectorized":
+		return RadiantGrapgDemoDataPipeline._validate_dataframe(client_id, file_name, df)
+	return RadiantGrapgDemoDataPipeline._validate_rows(client_id, file_name, df)
+
+def _validate_range_worker(csv_reader: MemberCSVReader, validation_mode: str, client_id: str, file_path: str, file_name: str,
+		start: int, end: int) -> Tuple[List[Dict], List[Dict], int]:
+	"""
+	Process pool side of _validate_parallel, nothing but the range is read
+
+	Returns - (valid_records, rejected_records, row count of the range)
+	"""
+	df = csv_reader.read_range(file_path, start, end)
+	valid_records, rejected_records = _validate_frame(validation_mode, client_id, file_name, df)
+	return valid_records, rejected_records, len(df)
+
 def run_pipeline(client_id: str, file_path:str):
 	pipeline = RadiantGrapgDemoDataPipeline()
 	result = pipeline.data_process(client_id, file_path)
 
 	return result
 
+
+"""
+Batch ingestion
+
+Many clients drop files at the same time. Ingestion and validation (CPU bound)
+run on a process pool, every database write goes through one writer - the
+calling process - in manifest order, so SQLite sees a single writer.
+"""
+
+_worker_pipeline = None
+
+def _init_batch_worker(pipeline_options: Dict[str, Any]):
+	global _worker_pipeline
+	_worker_pipeline = RadiantGrapgDemoDataPipeline(**pipeline_options)
+
+def _ingest_and_validate_worker(client_id: str, file_path: str) -> Tuple:
+	"""
+	Returns
+	- ("duplicate", checksum, earlier result)
+	- ("ingested", ingestion_metadata, valid_records, rejected_count)
+	"""
+	metrics = StageMetrics(client_id, file_path)
+	checksum = None
+	if _worker_pipeline.deduplicate:
+		# read only - WAL readers don't block the writer
+		checksum, previous_result = _worker_pipeline.find_processed(client_id, file_path, metrics)
+		if previous_result is not None:
+			return ("duplicate", checksum, previous_result)
+	return ("ingested",) + _worker_pipeline.ingest_and_validate(client_id, file_path, metrics, checksum)
+
+def store_outcome(writer: RadiantGrapgDemoDataPipeline, client_id: str, file_path: str, outcome: Tuple) -> Dict[str, Any]:
+	"""
+	Writer side of _ingest_and_validate_worker - records the skip or stores and audits the file
+	"""
+	if outcome[0] == "duplicate":
+		return writer.skip_duplicate(client_id, file_path, outcome[1], outcome[2])
+	return writer.store_validated(client_id, *outcome[1:])
+
+def available_cores() -> int:
+	try:
+		return len(os.sched_getaffinity(0))
+	except AttributeError:
+		# not available on Windows/macOS
+		return os.cpu_count() or 1
+
+def load_manifest(source) -> List[Tuple[str, str]]:
+	"""
+	Builds the list of (client_id, file_path) pairs to ingest from
+	- a directory tree		- <root>/<client_id>/<file>.csv (or .csv.gz, .csv.zst ...)
+	- a manifest CSV		- with client_id,file_path columns
+	- an iterable of (client_id, file_path) pairs
+	"""
+	if isinstance(source, (str, Path)):
+		source = Path(source)
+		if source.is_dir():
+			return [
+				(client_dir.name, str(file_path))
+				for client_dir in sorted(p for p in source.iterdir() if p.is_dir())
+				for file_path in sorted(client_dir.iterdir()) if is_csv_file(file_path)
+			]
+		with open(source, newline="", encoding="utf-8") as f:
+			return [(row["client_id"], row["file_path"]) for row in csv.DictReader(f)]
+
+	return [(client_id, str(file_path)) for client_id, file_path in source]
+
+def run_batch(source, max_workers: Optional[int] = None, **pipeline_options) -> Dict[str, Any]:
+	"""
+	Ingests every (client_id, file) pair of the manifest (see load_manifest)
+
+	max_workers			- process pool size, defaults to the available cores
+	pipeline_options	- RadiantGrapgDemoDataPipeline options (validation_mode, deduplicate, delta ...).
+						  chunk_size doesn't apply, workers validate whole files
+
+	Returns - summary with the per-file results in manifest order
+	"""
+	from concurrent.futures import ProcessPoolExecutor
+
+	manifest = load_manifest(source)
+	max_workers = max_workers or available_cores()
+	pipeline_options.pop("chunk_size", None)
+	writer = RadiantGrapgDemoDataPipeline(**pipeline_options)
+
+	started = time.perf_counter()
+	results = []
+
+	# workers never audit, only the writer does - no flush thread per worker.
+	# Files are already spread over the pool, no nested pools per file
+	worker_options = dict(pipeline_options, audit_sink="json", validation_workers=1)
+	with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_batch_worker, initargs=(worker_options,)) as pool:
+		# bounded look-ahead, so finished files don't pile up in memory behind a slow one
+		pending = deque()
+		entries = iter(manifest)
+
+		def submit_next():
+			for client_id, file_path in entries:
+				pending.append((client_id, file_path, pool.submit(_ingest_and_validate_worker, client_id, file_path)))
+				return
+
+		for _ in range(max_workers * 2):
+			submit_next()
+
+		while pending:
+			client_id, file_path, future = pending.popleft()
+			submit_next()
+			try:
+				result = store_outcome(writer, client_id, file_path, future.result())
+			except Exception as e:
+				result = {"client_id": client_id, "file_name": file_path, "status": "failed", "error": str(e)}
+			results.append(result)
+	writer.logger.flush()
+
+	succeeded = [r for r in results if r["status"] == "success"]
+	return {
+		"file_count": len(results),
+		"failed_count": sum(1 for r in results if r["status"] == "failed"),
+		"skipped_count": sum(1 for r in results if r["status"] == "skipped_duplicate"),
+		"valid_row_count": sum(r["valid_row_count"] for r in succeeded),
+		"rejected_row_count": sum(r["rejected_row_count"] for r in succeeded),
+		"max_workers": max_workers,
+		"elapsed_seconds": round(time.perf_counter() - started, 3),
+		"files": results
+	}
@@ -0,0 +1,243 @@
+"""
+Per-stage timing and throughput of the pipeline
+
+StageMetrics collects, for one client file, wall time, rows, bytes and memory of
+every stage (checksum, ingest, parse, validate, rejects, db_upsert, parquet, audit).
+A stage entered more than once (streaming chunks) is accumulated.
+
+MetricsExporter writes every file's metrics as a JSON line to
+	data/metrics/pipeline_metrics.jsonl
+and, optionally, running totals of the process in the Prometheus text format to
+	data/metrics/pipeline_metrics-<instance>.prom
+for a node_exporter textfile collector to pick up (stand-in for a /metrics endpoint).
+Every process has its own file and a pipeline_instance label, the collector merges them.
+- instance given	- a stable name for a long running service (watch service, batch writer),
+					  the file is kept and the next run of the service replaces it
+- no instance		- named after the pid, removed when the process exits. Files of pids
+					  that are gone (killed processes) are removed by the next exporter
+
+Memory per stage
+- rss_bytes					- resident set size when the stage ended, largest over its calls
+							  (/proc/self/statm, None where there is no /proc)
+- peak_rss_increase_bytes	- how far the stage pushed the process high-water mark up
+							  (ru_maxrss after - before), 0 when it stayed under an earlier peak
+- process_peak_rss_bytes	- the process high-water mark when the stage ended. A process value,
+							  it includes every earlier stage and file of the process
+Both ru_maxrss values are None where the resource module is not available.
+"""
+
+import atexit
+import json
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+try:
+	import resource
+except ImportError:	# Windows
+	resource = None
+
+
+def peak_rss_bytes() -> Optional[int]:
+	if resource is None:
+		return None
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# kilobytes on Linux, bytes on macOS
+	return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes() -> Optional[int]:
+	try:
+		with open("/proc/self/statm") as f:
+			return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+	except (OSError, ValueError, AttributeError):
+		return None
+
+
+def _rate(amount: int, seconds: float) -> Optional[float]:
+	return round(amount / seconds, 1) if seconds > 0 else None
+
+
+class StageMetrics:
+	"""
+	Stage timings of one client file - plain data, can be sent between processes (see run_batch)
+	"""
+
+	def __init__(self, client_id: str = None, file_name: str = None):
+		self.client_id = client_id
+		self.file_name = str(file_name) if file_name is not None else None
+		self.stages: Dict[str, Dict[str, Any]] = {}
+
+	def add(self, name: str, seconds: float, rows: int = 0, bytes: int = 0, peak_before: Optional[int] = None):
+		"""
+		peak_before - process high-water mark when the stage started, for peak_rss_increase_bytes
+		"""
+		stage = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "rows": 0, "bytes": 0,
+			"rss_bytes": None, "peak_rss_increase_bytes": None, "process_peak_rss_bytes": None})
+		stage["calls"] += 1
+		stage["seconds"] += seconds
+		stage["rows"] += rows
+		stage["bytes"] += bytes
+		rss = current_rss_bytes()
+		if rss is not None:
+			stage["rss_bytes"] = max(stage["rss_bytes"] or 0, rss)
+		peak = peak_rss_bytes()
+		stage["process_peak_rss_bytes"] = peak
+		if peak is not None and peak_before is not None:
+			stage["peak_rss_increase_bytes"] = (stage["peak_rss_increase_bytes"] or 0) + peak - peak_before
+
+	@contextmanager
+	def stage(self, name: str, rows: int = 0, bytes: int = 0):
+		"""
+		Times the block. The yielded dict can be updated with the rows/bytes handled
+			with metrics.stage("validate") as stage:
+				...
+				stage["rows"] = len(df)
+		"""
+		counts = {"rows": rows, "bytes": bytes}
+		peak_before = peak_rss_bytes()
+		started = time.perf_counter()
+		try:
+			yield counts
+		finally:
+			self.add(name, time.perf_counter() - started, counts["rows"], counts["bytes"], peak_before)
+
+	def timed_iter(self, name: str, iterable, rows=len):
+		"""
+		Yields from iterable, the time spent producing each item is added to the stage
+		rows - item -> row count
+		"""
+		iterator = iter(iterable)
+		while True:
+			peak_before = peak_rss_bytes()
+			started = time.perf_counter()
+			try:
+				item = next(iterator)
+			except StopIteration:
+				self.add(name, time.perf_counter() - started, peak_before=peak_before)
+				return
+			self.add(name, time.perf_counter() - started, rows(item), peak_before=peak_before)
+			yield item
+
+	def to_dict(self) -> Dict[str, Any]:
+		stages = {}
+		for name, stage in self.stages.items():
+			stages[name] = dict(stage,
+				seconds=round(stage["seconds"], 6),
+				rows_per_second=_rate(stage["rows"], stage["seconds"]),
+				bytes_per_second=_rate(stage["bytes"], stage["seconds"])
+			)
+		peaks = [stage["process_peak_rss_bytes"] for stage in self.stages.values() if stage["process_peak_rss_bytes"] is not None]
+		return {
+			"client_id": self.client_id,
+			"file_name": self.file_name,
+			"total_seconds": round(sum(stage["seconds"] for stage in self.stages.values()), 6),
+			"process_peak_rss_bytes": max(peaks) if peaks else None,
+			"stages": stages
+		}
+
+
+class MetricsExporter:
+	"""
+	Metrics file (JSON lines, one per processed file) + optional Prometheus text file
+	"""
+
+	PREFIX = "radiantgraph_pipeline"
+	PID_FILE_PATTERN = re.compile(r"pipeline_metrics-(\d+)\.prom")
+
+	def __init__(self, metrics_path="data/metrics", prometheus: bool = False, instance: Optional[str] = None):
+		"""
+		instance - stable name of the Prometheus file and label, None uses the pid (see module doc)
+		"""
+		self.metrics_path = Path(metrics_path)
+		self.metrics_path.mkdir(parents=True, exist_ok=True)
+		self.metrics_file = self.metrics_path / "pipeline_metrics.jsonl"
+		self.instance = instance if instance is not None else str(os.getpid())
+		self.prometheus_file = self.metrics_path / f"pipeline_metrics-{self.instance}.prom"
+		self.prometheus = prometheus
+		self.remove_on_exit = prometheus and instance is None
+		if self.remove_on_exit:
+			self.remove_stale_files()
+			atexit.register(self.close)
+
+		self.file_count = 0
+		self.process_peak_rss_bytes = None
+		self.totals: Dict[str, Dict[str, float]] = {}
+
+	def export(self, metrics: Dict[str, Any]):
+		"""
+		metrics - StageMetrics.to_dict()
+		"""
+		# single small append per file, safe with several processes on the same file
+		with open(self.metrics_file, "a") as f:
+			f.write(json.dumps(dict(metrics, timestamp=time.time()), default=str) + "\n")
+
+		self.file_count += 1
+		if metrics.get("process_peak_rss_bytes") is not None:
+			self.process_peak_rss_bytes = max(self.process_peak_rss_bytes or 0, metrics["process_peak_rss_bytes"])
+		for name, stage in metrics["stages"].items():
+			totals = self.totals.setdefault(name, {"seconds": 0.0, "rows": 0, "bytes": 0, "calls": 0})
+			for key in totals:
+				totals[key] += stage[key]
+
+		if self.prometheus:
+			self.write_prometheus()
+
+	def prometheus_text(self) -> str:
+		"""
+		Running totals of this process in the Prometheus text exposition format, every
+		series carries the pipeline_instance label
+		"""
+		label = f'pipeline_instance="{self.instance}"'
+		lines = [
+			f"# HELP {self.PREFIX}_files_total Client files processed",
+			f"# TYPE {self.PREFIX}_files_total counter",
+			f"{self.PREFIX}_files_total{{{label}}} {self.file_count}",
+		]
+		for metric, key, help_text in (
+			("stage_seconds_total", "seconds", "Wall time spent in the stage"),
+			("stage_rows_total", "rows", "Rows handled by the stage"),
+			("stage_bytes_total", "bytes", "Bytes handled by the stage"),
+			("stage_calls_total", "calls", "Times the stage ran"),
+		):
+			lines.append(f"# HELP {self.PREFIX}_{metric} {help_text}")
+			lines.append(f"# TYPE {self.PREFIX}_{metric} counter")
+			for name in sorted(self.totals):
+				lines.append(f'{self.PREFIX}_{metric}{{{label},stage="{name}"}} {round(self.totals[name][key], 6)}')
+		if self.process_peak_rss_bytes is not None:
+			lines.append(f"# HELP {self.PREFIX}_process_peak_rss_bytes Peak resident set size of the process")
+			lines.append(f"# TYPE {self.PREFIX}_process_peak_rss_bytes gauge")
+			lines.append(f"{self.PREFIX}_process_peak_rss_bytes{{{label}}} {self.process_peak_rss_bytes}")
+		return "\n".join(lines) + "\n"
+
+	def write_prometheus(self):
+		# written then renamed, the collector never reads a partial file
+		temp = self.prometheus_file.with_name(f".{self.prometheus_file.name}.{os.getpid()}")
+		temp.write_text(self.prometheus_text())
+		temp.replace(self.prometheus_file)
+
+	def remove_stale_files(self):
+		"""
+		Removes pid named Prometheus files whose process is gone
+		"""
+		for path in self.metrics_path.glob("pipeline_metrics-*.prom"):
+			match = self.PID_FILE_PATTERN.fullmatch(path.name)
+			if match is None or match.group(1) == self.instance:
+				continue
+			try:
+				os.kill(int(match.group(1)), 0)
+			except ProcessLookupError:
+				path.unlink(missing_ok=True)
+			except (PermissionError, OSError):
+				pass	# alive under another user, or not checkable here
+
+	def close(self):
+		"""
+		Removes the pid named Prometheus file, an instance named file is kept for the collector
+		"""
+		if self.remove_on_exit and os.getpid() == int(self.instance):
+			self.prometheus_file.unlink(missing_ok=True)
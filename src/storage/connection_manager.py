@@ -0,0 +1,99 @@
+"""
+SQLite connection manager
+
+Keeps one open connection per thread (and per process) for reuse, and tunes
+every connection with the configured PRAGMAs.
+WAL journal mode lets analytics readers run while the pipeline is writing.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Tuple
+
+# Default PRAGMAs, any of them can be overridden through DataSQLiteStorage(pragmas=...)
+DEFAULT_PRAGMAS: Dict[str, Any] = {
+	"journal_mode": "WAL",		# readers don't block the writer and vice versa
+	"synchronous": "NORMAL",	# fsync at checkpoints only, safe with WAL
+	"cache_size": -64000,		# negative is KiB, ~64 MB page cache
+	"mmap_size": 268435456,		# 256 MB memory mapped I/O
+	"temp_store": "MEMORY",		# temp tables (members_staging) stay in memory
+	"busy_timeout": 5000,		# ms to wait on a lock instead of failing with "database is locked"
+}
+
+
+class SQLiteConnectionManager:
+	"""
+	Connection reuse and tuning for one SQLite database file
+	"""
+
+	def __init__(self, db_path, pragmas: Dict[str, Any] = None):
+		self.db_path = Path(db_path)
+		self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+		self._local = threading.local()
+		self._lock = threading.Lock()
+		self._connections: List[Tuple[int, sqlite3.Connection]] = []
+
+	def _apply_pragmas(self, conn: sqlite3.Connection):
+		for name, value in self.pragmas.items():
+			if value is not None:
+				conn.execute(f"PRAGMA {name} = {value}")
+
+	def connect(self) -> sqlite3.Connection:
+		"""
+		Creates a new tuned connection, the caller is responsible for closing it
+		"""
+		conn = sqlite3.connect(self.db_path)
+		self._apply_pragmas(conn)
+		return conn
+
+	def connection(self) -> sqlite3.Connection:
+		"""
+		Returns the pooled connection of the current thread, opening it on first use.
+		Pooled connections are in autocommit mode, use transaction() for writes.
+		"""
+		conn = getattr(self._local, "conn", None)
+		# connections must not be shared with a forked child process
+		if conn is None or self._local.pid != os.getpid():
+			conn = sqlite3.connect(self.db_path, isolation_level=None)
+			self._apply_pragmas(conn)
+			self._local.conn = conn
+			self._local.pid = os.getpid()
+			with self._lock:
+				self._connections.append((os.getpid(), conn))
+		return conn
+
+	@contextmanager
+	def transaction(self) -> Iterator[sqlite3.Connection]:
+		"""
+		BEGIN IMMEDIATE ... COMMIT on the pooled connection, ROLLBACK on error.
+		IMMEDIATE takes the write lock up front, so concurrent writers wait
+		busy_timeout instead of failing part way through.
+		"""
+		conn = self.connection()
+		conn.execute("BEGIN IMMEDIATE")
+		try:
+			yield conn
+		except BaseException:
+			conn.execute("ROLLBACK")
+			raise
+		else:
+			conn.execute("COMMIT")
+
+	def close(self):
+		"""
+		Closes every pooled connection opened by this process
+		"""
+		with self._lock:
+			connections, self._connections = self._connections, []
+		for pid, conn in connections:
+			if pid != os.getpid():
+				continue
+			try:
+				conn.close()
+			except sqlite3.ProgrammingError:
+				# opened by another thread that is still alive
+				pass
+		self._local = threading.local()
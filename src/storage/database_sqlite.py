@@ -6,11 +6,275 @@ Data storage using SQLITE
 ○ Ingestion error rate (bad rows / total).
 """
 
+import hashlib
+import json
+import re
 import sqlite3
-import pandas
 from pathlib import Path
-from typing import List
-from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime, date, timedelta, timezone
+
+from .connection_manager import SQLiteConnectionManager
+from .query_cache import QueryResultCache
+
+# Per-connection staging table for bulk member upserts, same column affinity as members
+MEMBERS_STAGING_TABLE = '''
+	CREATE TEMP TABLE IF NOT EXISTS members_staging (
+		member_id INT NOT NULL,
+		first_name TEXT NOT NULL,
+		last_name TEXT NOT NULL,
+		dob TEXT NOT NULL,
+		gender TEXT NOT NULL,
+		phone TEXT NOT NULL,
+		email TEXT,
+		zip5 TEXT NOT NULL,
+		plan_id TEXT NOT NULL,
+		client_id TEXT NOT NULL,
+		row_hash TEXT NOT NULL
+	)
+	'''
+
+# Per-connection set of members seen by delta ingestion, used to count missing members
+DELTA_SEEN_TABLE = '''
+	CREATE TEMP TABLE IF NOT EXISTS delta_seen_members (
+		member_id INT NOT NULL,
+		client_id TEXT NOT NULL,
+		PRIMARY KEY (member_id, client_id)
+	)
+	'''
+
+# Normalized member fields covered by members.row_hash
+ROW_HASH_FIELDS = ('first_name', 'last_name', 'dob', 'gender', 'phone', 'email', 'zip5', 'plan_id')
+
+
+def member_row_hash(member: dict) -> str:
+	"""
+	Content hash of a normalized member record, stored in members.row_hash
+	"""
+	content = "\x1f".join("" if member[field] is None else str(member[field]) for field in ROW_HASH_FIELDS)
+	return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+# Analytics served from the rollup tables - O(number of groups), not O(number of members)
+UNIQUE_MEMBERS_ROLLUP_QUERY = '''
+	SELECT client_id, member_count as unique_member_count
+	FROM client_member_counts
+	ORDER BY client_id
+	'''
+
+TOP_ZIP5_ROLLUP_QUERY = '''
+	SELECT zip5, SUM(member_count) as member_count
+	FROM zip5_member_counts
+	GROUP BY zip5
+	ORDER BY member_count DESC
+	'''
+
+INGESTION_ERROR_RATE_ROLLUP_QUERY = '''
+	SELECT client_id, invalid_rows * 1.0 / total_rows as ingestion_error_rate
+	FROM client_error_totals
+	ORDER BY client_id
+	'''
+
+REJECT_REASONS_ROLLUP_QUERY = '''
+	SELECT client_id, field, code, row_count
+	FROM client_reject_reasons
+	ORDER BY client_id, row_count DESC, field
+	'''
+
+# Lookup access patterns served by the members indexes
+MEMBERS_BY_ZIP5_QUERY = "SELECT client_id, member_id FROM members WHERE zip5 = ?"
+MEMBERS_BY_PLAN_QUERY = "SELECT member_id, plan_id FROM members WHERE client_id = ? AND plan_id = ?"
+MEMBERS_INGESTED_SINCE_QUERY = "SELECT member_id, ingestion_time FROM members WHERE client_id = ? AND ingestion_time >= ?"
+
+# Member identity index - blocking keys that find the same person under another member_id
+# or at another client. key type -> SQL expression over a members shaped row, members
+# with an empty key aren't indexed under it.
+IDENTITY_KEYS = {
+	"name_dob_zip5": "lower(trim(last_name)) || '|' || dob || '|' || zip5",
+	"phone": "phone",
+	"email": "lower(trim(email))",
+}
+
+IDENTITY_LOOKUP_QUERY = "SELECT client_id, member_id FROM member_identity_keys WHERE key_type = ? AND key = ?"
+
+# keys shared by more members than this (placeholder phones, shared family emails) are
+# skipped by likely_duplicates, they say nothing about identity and blow up the pairs
+IDENTITY_MAX_BLOCK_SIZE = 50
+
+
+def identity_key_rows(source: str, where: str = "true") -> str:
+	"""
+	SELECT of (key_type, key, client_id, member_id) for every row of source, one row per non-empty key
+	"""
+	return " UNION ALL ".join(
+		f"SELECT '{key_type}', {expression}, client_id, member_id FROM {source} "
+		f"WHERE ({where}) AND coalesce({expression}, '') <> ''"
+		for key_type, expression in IDENTITY_KEYS.items()
+	)
+
+# Staged members that are new or whose content changed - the rows that get new identity
+# keys and a new members_history version
+STAGED_CHANGED_CONDITION = '''
+	NOT EXISTS (
+		SELECT 1 FROM members m
+		WHERE m.member_id = members_staging.member_id
+		AND m.client_id = members_staging.client_id
+		AND m.row_hash IS members_staging.row_hash
+	)
+	'''
+
+# members_history - one row per version of a member, valid over [valid_from, valid_to),
+# valid_to NULL for the current version. Timestamps are UTC "YYYY-MM-DD HH:MM:SS.ffffff"
+# strings (see history_timestamp) so they compare as text, a plain date means midnight of that day.
+HISTORY_COLUMNS = ('member_id', 'first_name', 'last_name', 'dob', 'gender', 'phone', 'email', 'zip5', 'plan_id', 'client_id', 'row_hash')
+
+MEMBERS_AS_OF_QUERY = '''
+	SELECT member_id, first_name, last_name, dob, gender, phone, email, zip5, plan_id, client_id, row_hash, valid_from, valid_to
+	FROM members_history
+	WHERE client_id = ? AND valid_from <= ? AND (valid_to IS NULL OR valid_to > ?)
+	ORDER BY member_id
+	'''
+
+
+def history_timestamp(value=None) -> str:
+	"""
+	datetime (naive = UTC), date or ISO string -> members_history timestamp, None is now
+
+	Raises - ValueError for a string that is not an ISO date/datetime
+	"""
+	if value is None:
+		value = datetime.now(timezone.utc)
+	if isinstance(value, str):
+		value = datetime.fromisoformat(value.strip())
+	elif isinstance(value, date) and not isinstance(value, datetime):
+		value = datetime(value.year, value.month, value.day)
+	if value.tzinfo is not None:
+		value = value.astimezone(timezone.utc).replace(tzinfo=None)
+	return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def normalized_timestamp_sql(column: str) -> str:
+	"""
+	SQL expression turning a stored date/datetime text (CURRENT_TIMESTAMP, ISO, fractions
+	of any length) into the history_timestamp format, NULL when SQLite can't read it
+	"""
+	return (f"strftime('%Y-%m-%d %H:%M:%S', {column}) || substr(CASE WHEN instr({column}, '.') > 0 "
+		f"THEN substr({column}, instr({column}, '.')) ELSE '.' END || '000000', 1, 7)")
+
+# Small O(number of groups) tables, scanning them is expected
+ROLLUP_TABLES = ("client_member_counts", "zip5_member_counts", "client_error_totals", "client_reject_reasons")
+
+# FROM/JOIN <table> [AS] <alias> - EXPLAIN QUERY PLAN names an aliased table by its alias
+TABLE_ALIAS_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_]\w*)(?:\s+(?:AS\s+)?([A-Za-z_]\w*))?", re.IGNORECASE)
+NOT_AN_ALIAS = {"WHERE", "JOIN", "LEFT", "RIGHT", "FULL", "INNER", "OUTER", "CROSS", "NATURAL", "ON", "USING",
+	"GROUP", "ORDER", "LIMIT", "HAVING", "WINDOW", "UNION", "EXCEPT", "INTERSECT", "INDEXED", "NOT"}
+
+
+def table_aliases(sql: str) -> Dict[str, str]:
+	"""
+	{alias: table} of the FROM/JOIN clauses of sql
+	"""
+	return {alias: table for table, alias in TABLE_ALIAS_PATTERN.findall(sql)
+			if alias and alias.upper() not in NOT_AN_ALIAS}
+
+
+def plan_scan(detail: str, aliases: Dict[str, str] = None) -> Optional[Tuple[str, Optional[str]]]:
+	"""
+	A query plan line that reads a whole table or index - every SCAN, SEARCH is a seek
+
+	Both detail formats are understood
+	- 3.36+		- "SCAN m", "SCAN members USING COVERING INDEX idx_members_zip5"
+	- older		- "SCAN TABLE members AS m", "SCAN TABLE members USING INDEX idx_members_zip5"
+
+	Returns - (table, index or None), None for seeks, constant rows and subqueries
+	"""
+	parts = detail.split()
+	if not parts or parts[0] != "SCAN":
+		return None
+	parts = parts[1:]
+	if parts and parts[0] == "TABLE":
+		parts = parts[1:]
+	if not parts or parts[0] in ("CONSTANT", "SUBQUERY") or parts[0].startswith("("):
+		return None
+	name = parts[0]
+	if len(parts) >= 3 and parts[1] == "AS":
+		table = name		# older format names the table and then the alias
+	else:
+		table = (aliases or {}).get(name, name)
+	index = None
+	if "INDEX" in parts and parts.index("INDEX") + 1 < len(parts):
+		index = parts[parts.index("INDEX") + 1]
+	elif "PRIMARY" in parts:
+		index = "PRIMARY KEY"
+	return table, index
+
+# Schema migrations, applied in order once per database and tracked in PRAGMA user_version.
+# Append new entries, never edit an applied one.
+SCHEMA_MIGRATIONS = [
+	# 1 - covering indexes for the analytics queries and member lookups
+	[
+		"CREATE INDEX IF NOT EXISTS idx_members_client_member ON members(client_id, member_id)",
+		"CREATE INDEX IF NOT EXISTS idx_members_zip5 ON members(zip5, client_id)",
+		"CREATE INDEX IF NOT EXISTS idx_members_client_plan ON members(client_id, plan_id)",
+		"CREATE INDEX IF NOT EXISTS idx_members_client_ingestion_time ON members(client_id, ingestion_time)",
+		"CREATE INDEX IF NOT EXISTS idx_audit_log_client_rows ON audit_log(client_id, invalid_rows, total_rows)",
+	],
+	# 2 - member identity index (see IDENTITY_KEYS), backfilled from the stored members
+	[
+		'''
+		CREATE TABLE IF NOT EXISTS member_identity_keys (
+			key_type TEXT NOT NULL,
+			key TEXT NOT NULL,
+			client_id TEXT NOT NULL,
+			member_id INT NOT NULL,
+			PRIMARY KEY (key_type, key, client_id, member_id)
+		) WITHOUT ROWID
+		''',
+		"CREATE INDEX IF NOT EXISTS idx_member_identity_keys_member ON member_identity_keys(client_id, member_id)",
+		"INSERT OR IGNORE INTO member_identity_keys (key_type, key, client_id, member_id) " + identity_key_rows("members"),
+	],
+	# 3 - per-client data versions, bumped by every write of a client's data (see query)
+	[
+		'''
+		CREATE TABLE IF NOT EXISTS client_data_versions (
+			client_id TEXT PRIMARY KEY,
+			version INTEGER NOT NULL
+		)
+		''',
+	],
+	# 4 - members history (see HISTORY_COLUMNS), the stored members become the first versions
+	[
+		'''
+		CREATE TABLE IF NOT EXISTS members_history (
+			member_id INT NOT NULL,
+			first_name TEXT NOT NULL,
+			last_name TEXT NOT NULL,
+			dob TEXT NOT NULL,
+			gender TEXT NOT NULL,
+			phone TEXT NOT NULL,
+			email TEXT,
+			zip5 TEXT NOT NULL,
+			plan_id TEXT NOT NULL,
+			client_id TEXT NOT NULL,
+			row_hash TEXT,
+			valid_from TEXT NOT NULL,
+			valid_to TEXT,
+			PRIMARY KEY (client_id, member_id, valid_from)
+		)
+		''',
+		"CREATE INDEX IF NOT EXISTS idx_members_history_client_from ON members_history(client_id, valid_from)",
+		"CREATE INDEX IF NOT EXISTS idx_members_history_client_to ON members_history(client_id, valid_to)",
+		f"INSERT OR IGNORE INTO members_history ({', '.join(HISTORY_COLUMNS)}, valid_from) "
+		f"SELECT {', '.join(HISTORY_COLUMNS)}, ingestion_time FROM members",
+	],
+	# 5 - history timestamps backfilled from ingestion_time (CURRENT_TIMESTAMP, no microseconds)
+	# or written as plain dates, rewritten in the history_timestamp format
+	[
+		f"UPDATE OR REPLACE members_history SET valid_from = {normalized_timestamp_sql('valid_from')} "
+		f"WHERE valid_from NOT LIKE '____-__-__ __:__:__.______' AND {normalized_timestamp_sql('valid_from')} IS NOT NULL",
+		f"UPDATE members_history SET valid_to = {normalized_timestamp_sql('valid_to')} "
+		f"WHERE valid_to NOT LIKE '____-__-__ __:__:__.______' AND {normalized_timestamp_sql('valid_to')} IS NOT NULL",
+	],
+]
 
 class DataSQLiteStorage:
 	"""
@@ -18,11 +282,26 @@ class DataSQLiteStorage:
 	Table creation
 	"""
 
-	def __init__(self, db_path = "data/radiantgraphdemo.db"):
+	def __init__(self, db_path = "data/radiantgraphdemo.db", pragmas: Dict[str, Any] = None, query_cache_size: int = 0,
+			history_retention_days: Optional[int] = None):
+		"""
+		pragmas - overrides connection_manager.DEFAULT_PRAGMAS (journal_mode, synchronous,
+		cache_size, mmap_size, temp_store, busy_timeout)
+		query_cache_size - results of query()/the rollup reads kept in an LRU cache,
+		0 disables it. Meant for long lived readers (dashboards), see query
+		history_retention_days - insert_members compacts the client's members_history to
+		this many days (see compact_history), None keeps every version
+		"""
 		self.db_path = Path(db_path)
+		Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+		self.connections = SQLiteConnectionManager(self.db_path, pragmas)
+		self.query_cache = QueryResultCache(query_cache_size) if query_cache_size else None
+		self.history_retention_days = history_retention_days
+		# (connection, PRAGMA data_version, local writes) the version snapshot was read at
+		self._versions_read_at = None
+		self._versions: Dict[str, int] = {}
+		self._local_writes = 0
 
-
-		
 		self._init_sqlite_database()
 
 	def _init_sqlite_database(self):
@@ -31,11 +310,9 @@ class DataSQLiteStorage:
 		parents=True - creates parent directory if doesn't exists
 		exists_ok=True - doesnt raise error if directory already exists
 		"""
-		Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
-		conn = sqlite3.connect(self.db_path)
-
-		#conn = self._db_connection()
+		conn = self.connections.connection()
 		try:
+			conn.execute("BEGIN IMMEDIATE")
 
 			# MEMBER table
 			conn.execute('''
@@ -51,6 +328,7 @@ class DataSQLiteStorage:
 					plan_id TEXT NOT NULL,
 					client_id TEXT NOT NULL,
 					ingestion_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+					row_hash TEXT,
 					PRIMARY KEY (member_id, client_id)
 				)
 				'''
@@ -70,55 +348,603 @@ class DataSQLiteStorage:
 
 				'''
 				)
-			conn.commit()
+
+			# row_hash - added after the first release, older databases get the column here
+			self._ensure_column(conn, "members", "row_hash", "TEXT")
+
+			#PROCESSED FILES table - content hash index used to skip re-ingesting identical files
+			conn.execute('''
+				CREATE TABLE IF NOT EXISTS processed_files (
+					client_id TEXT NOT NULL,
+					checksum TEXT NOT NULL,
+					file_name TEXT NOT NULL,
+					result TEXT NOT NULL,
+					processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+					PRIMARY KEY (client_id, checksum)
+				)
+				'''
+				)
+
+			#ROLLUP tables - kept up to date by insert_members/insert_audit_log
+			rollups_exist = conn.execute(
+				"SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'client_member_counts'"
+				).fetchone()
+			conn.execute('''
+				CREATE TABLE IF NOT EXISTS client_member_counts (
+					client_id TEXT PRIMARY KEY,
+					member_count INTEGER NOT NULL
+				)
+				'''
+				)
+			conn.execute('''
+				CREATE TABLE IF NOT EXISTS zip5_member_counts (
+					client_id TEXT NOT NULL,
+					zip5 TEXT NOT NULL,
+					member_count INTEGER NOT NULL,
+					PRIMARY KEY (client_id, zip5)
+				)
+				'''
+				)
+			conn.execute('''
+				CREATE TABLE IF NOT EXISTS client_error_totals (
+					client_id TEXT PRIMARY KEY,
+					total_rows INTEGER NOT NULL,
+					invalid_rows INTEGER NOT NULL
+				)
+				'''
+				)
+			# fed by the rejects summaries (RejectsWriter), not rebuildable from the base tables
+			conn.execute('''
+				CREATE TABLE IF NOT EXISTS client_reject_reasons (
+					client_id TEXT NOT NULL,
+					field TEXT NOT NULL,
+					code TEXT NOT NULL,
+					row_count INTEGER NOT NULL,
+					PRIMARY KEY (client_id, field, code)
+				)
+				'''
+				)
+			if not rollups_exist:
+				# database created before the rollups, backfill them once
+				self._rebuild_rollups(conn)
+
+			self._apply_migrations(conn)
+
+			conn.execute("COMMIT")
 			#print("table created")
 		except sqlite3.Error as e:
 			#print("DB initiliazation failed")
-			conn.rollback()
-		finally:
-			conn.close()
+			if conn.in_transaction:
+				conn.execute("ROLLBACK")
+			# a half created schema (failed migration, backfill) would only fail later with "no such table"
+			raise
 
-	def insert_members(self, client_id: str, members: List[dict]):
-		conn = sqlite3.connect(self.db_path)
-		try:
-			for member in members:
+	def _apply_migrations(self, conn: sqlite3.Connection):
+		version = conn.execute("PRAGMA user_version").fetchone()[0]
+		for number, statements in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+			for statement in statements:
+				conn.execute(statement)
+			conn.execute(f"PRAGMA user_version = {number}")
+
+	def _ensure_column(self, conn: sqlite3.Connection, table: str, column: str, column_type: str):
+		columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+		if column not in columns:
+			conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+	def insert_members(self, client_id: str, members: List[dict], delta: bool = False, valid_from=None) -> Dict[str, int]:
+		"""
+		Upserts a batch of members in a single transaction
+
+		Rows are bulk loaded into a temp staging table with executemany and merged
+		with one INSERT ... SELECT ... ON CONFLICT(member_id, client_id) DO UPDATE.
+		When the batch holds the same member twice the last one wins, as it did
+		when rows were upserted one at a time.
+
+		delta - rows whose row_hash matches the stored row are left untouched
+		(no write, ingestion_time kept), only new and changed members are written.
+		Members seen are remembered for count_missing_members.
+
+		New and changed members get a new members_history version starting at valid_from
+		(default now), the version they replace ends there. A valid_from before the start of
+		a member's current version raises ValueError and nothing is written.
+
+		Returns - {"inserted": new rows, "updated": rows that replaced an existing member,
+		"unchanged": rows skipped by delta mode}
+		"""
+		if not members:
+			return {"inserted": 0, "updated": 0, "unchanged": 0}
+
+		with self.connections.transaction() as conn:
+			conn.execute(MEMBERS_STAGING_TABLE)
+			conn.execute("DELETE FROM members_staging")
+			conn.executemany('''
+				INSERT INTO members_staging
+				(member_id, first_name, last_name, dob, gender, phone, email, zip5, plan_id, client_id, row_hash)
+				VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+				''', (
+					(
+						member['member_id'],
+						member['first_name'],
+						member['last_name'],
+						member['dob'],
+						member['gender'],
+						member['phone'],
+						member['email'],
+						member['zip5'],
+						member['plan_id'],
+						member['client_id'],
+						member_row_hash(member)
+					)
+					for member in members
+				)
+			)
+
+			# keep the last occurrence of a member within the batch
+			conn.execute('''
+				DELETE FROM members_staging
+				WHERE rowid NOT IN (
+					SELECT MAX(rowid) FROM members_staging GROUP BY member_id, client_id
+				)
+				''')
+
+			existing_count = conn.execute('''
+				SELECT COUNT(*)
+				FROM members_staging s
+				JOIN members m ON m.member_id = s.member_id AND m.client_id = s.client_id
+				''').fetchone()[0]
+			staged_count = conn.execute("SELECT COUNT(*) FROM members_staging").fetchone()[0]
+
+			unchanged_count = 0
+			if delta:
+				conn.execute(DELTA_SEEN_TABLE)
 				conn.execute('''
-							INSERT INTO members
-							(member_id, first_name, last_name, dob, gender, phone, email, zip5, plan_id, client_id)
-							VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-							ON CONFLICT(member_id, client_id) DO UPDATE SET
-								first_name=excluded.first_name,
-								last_name=excluded.last_name,
-								dob=excluded.dob,
-								gender=excluded.gender,
-								phone=excluded.phone,
-								email=excluded.email,
-								zip5=excluded.zip5,
-								plan_id=excluded.plan_id,
-								ingestion_time=CURRENT_TIMESTAMP
-						''', (
-									member['member_id'],
-									member['first_name'],
-									member['last_name'],
-									member['dob'],
-									member['gender'],
-									member['phone'],
-									member['email'],
-									member['zip5'],
-									member['plan_id'],
-									member['client_id']
-							)
+					INSERT OR IGNORE INTO delta_seen_members (member_id, client_id)
+					SELECT member_id, client_id FROM members_staging
+					''')
+				unchanged_count = conn.execute('''
+					DELETE FROM members_staging
+					WHERE EXISTS (
+						SELECT 1 FROM members m
+						WHERE m.member_id = members_staging.member_id
+						AND m.client_id = members_staging.client_id
+						AND m.row_hash = members_staging.row_hash
 					)
-				conn.commit()
-		finally:
-			conn.close()
+					''').rowcount
+
+			# rollups and identity keys need the stored values, so they are updated before the merge
+			self._update_member_rollups(conn)
+			self._update_identity_keys(conn)
+			self._update_history(conn, history_timestamp(valid_from))
+			self._bump_data_versions(conn, "SELECT DISTINCT client_id FROM members_staging")
+			if self.history_retention_days is not None:
+				self._compact_history(conn, client_id, history_timestamp(datetime.now(timezone.utc) - timedelta(days=self.history_retention_days)))
 
-	def insert_audit_log(self, client_id, file_name, valid_record_count, invalid_record_count, ingestion_time):
-		conn = sqlite3.connect(self.db_path)
+			# WHERE true - avoids the parsing ambiguity of INSERT ... SELECT ... ON CONFLICT
+			conn.execute('''
+				INSERT INTO members
+				(member_id, first_name, last_name, dob, gender, phone, email, zip5, plan_id, client_id, row_hash)
+				SELECT member_id, first_name, last_name, dob, gender, phone, email, zip5, plan_id, client_id, row_hash
+				FROM members_staging
+				WHERE true
+				ON CONFLICT(member_id, client_id) DO UPDATE SET
+					first_name=excluded.first_name,
+					last_name=excluded.last_name,
+					dob=excluded.dob,
+					gender=excluded.gender,
+					phone=excluded.phone,
+					email=excluded.email,
+					zip5=excluded.zip5,
+					plan_id=excluded.plan_id,
+					ingestion_time=CURRENT_TIMESTAMP,
+					row_hash=excluded.row_hash
+				''')
+			conn.execute("DELETE FROM members_staging")
 
-		
+		inserted = staged_count - existing_count
+		if delta:
+			return {"inserted": inserted, "updated": existing_count - unchanged_count, "unchanged": unchanged_count}
+		return {"inserted": inserted, "updated": existing_count, "unchanged": 0}
 
-		try:
+	def _update_member_rollups(self, conn: sqlite3.Connection):
+		"""
+		Applies the staged batch to client_member_counts and zip5_member_counts
+		- new member				+1 client, +1 zip5
+		- existing member, new zip5	-1 old zip5, +1 new zip5
+		"""
+		conn.execute('''
+			INSERT INTO client_member_counts (client_id, member_count)
+			SELECT s.client_id, COUNT(*)
+			FROM members_staging s
+			WHERE NOT EXISTS (
+				SELECT 1 FROM members m WHERE m.member_id = s.member_id AND m.client_id = s.client_id
+			)
+			GROUP BY s.client_id
+			ON CONFLICT(client_id) DO UPDATE SET
+				member_count = member_count + excluded.member_count
+			''')
+		conn.execute('''
+			INSERT INTO zip5_member_counts (client_id, zip5, member_count)
+			SELECT m.client_id, m.zip5, -COUNT(*)
+			FROM members_staging s
+			JOIN members m ON m.member_id = s.member_id AND m.client_id = s.client_id
+			WHERE m.zip5 <> s.zip5
+			GROUP BY m.client_id, m.zip5
+			ON CONFLICT(client_id, zip5) DO UPDATE SET
+				member_count = member_count + excluded.member_count
+			''')
+		conn.execute('''
+			INSERT INTO zip5_member_counts (client_id, zip5, member_count)
+			SELECT s.client_id, s.zip5, COUNT(*)
+			FROM members_staging s
+			LEFT JOIN members m ON m.member_id = s.member_id AND m.client_id = s.client_id
+			WHERE m.member_id IS NULL OR m.zip5 <> s.zip5
+			GROUP BY s.client_id, s.zip5
+			ON CONFLICT(client_id, zip5) DO UPDATE SET
+				member_count = member_count + excluded.member_count
+			''')
+		conn.execute("DELETE FROM zip5_member_counts WHERE member_count = 0")
+
+	def _update_identity_keys(self, conn: sqlite3.Connection):
+		"""
+		Re-keys the staged members that are new or changed (row_hash differs), unchanged
+		members keep their keys - no rebuild, only the touched members are written
+		"""
+		conn.execute(f'''
+			DELETE FROM member_identity_keys
+			WHERE (client_id, member_id) IN (
+				SELECT client_id, member_id FROM members_staging WHERE {STAGED_CHANGED_CONDITION}
+			)
+			''')
+		conn.execute("INSERT OR IGNORE INTO member_identity_keys (key_type, key, client_id, member_id) "
+			+ identity_key_rows("members_staging", STAGED_CHANGED_CONDITION))
+
+	def _update_history(self, conn: sqlite3.Connection, valid_from: str):
+		"""
+		Closes the current version of every new or changed staged member and appends the staged one
+
+		Raises - ValueError when valid_from is before a current version's valid_from, closing it
+		there would end it before it started
+		"""
+		backdated = conn.execute(f'''
+			SELECT h.member_id, h.valid_from
+			FROM members_history h
+			JOIN members_staging ON members_staging.client_id = h.client_id AND members_staging.member_id = h.member_id
+			WHERE h.valid_to IS NULL AND h.valid_from > ? AND {STAGED_CHANGED_CONDITION}
+			LIMIT 1
+			''', (valid_from,)).fetchone()
+		if backdated is not None:
+			raise ValueError(f"valid_from {valid_from} is before the current version of member {backdated[0]} ({backdated[1]})")
+		conn.execute(f'''
+			UPDATE members_history SET valid_to = ?
+			WHERE valid_to IS NULL
+			AND (client_id, member_id) IN (
+				SELECT client_id, member_id FROM members_staging WHERE {STAGED_CHANGED_CONDITION}
+			)
+			''', (valid_from,))
+		# OR REPLACE - a second change at the same valid_from replaces the first
+		conn.execute(f'''
+			INSERT OR REPLACE INTO members_history ({', '.join(HISTORY_COLUMNS)}, valid_from, valid_to)
+			SELECT {', '.join(HISTORY_COLUMNS)}, ?, NULL
+			FROM members_staging WHERE {STAGED_CHANGED_CONDITION}
+			''', (valid_from,))
+
+	def members_as_of(self, client_id: str, as_of) -> List[Dict[str, Any]]:
+		"""
+		The client's roster as it was stored at as_of (datetime/date/timestamp string, UTC)
+
+		Returns - member dicts (HISTORY_COLUMNS + valid_from/valid_to) ordered by member_id
+		"""
+		as_of = history_timestamp(as_of)
+		cursor = self.connections.connection().execute(MEMBERS_AS_OF_QUERY, (client_id, as_of, as_of))
+		columns = [description[0] for description in cursor.description]
+		return [dict(zip(columns, row)) for row in cursor]
+
+	def member_history(self, client_id: str, member_id) -> List[Dict[str, Any]]:
+		"""
+		Every stored version of one member, oldest first
+		"""
+		cursor = self.connections.connection().execute(
+			"SELECT * FROM members_history WHERE client_id = ? AND member_id = ? ORDER BY valid_from", (client_id, member_id))
+		columns = [description[0] for description in cursor.description]
+		return [dict(zip(columns, row)) for row in cursor]
+
+	def history_diff(self, client_id: str, since, until) -> Dict[str, List[Dict[str, Any]]]:
+		"""
+		What changed in the client's roster between two points in time. Only members with a
+		version starting or ending in (since, until] are looked at, the cost follows the
+		number of changes, not the roster size.
+
+		Returns - {"added": [member], "removed": [member],
+		"changed": [{"member_id", "fields": [changed fields], "before": member, "after": member}]}
+		"""
+		since, until = history_timestamp(since), history_timestamp(until)
+		conn = self.connections.connection()
+		touched = [row[0] for row in conn.execute('''
+			SELECT member_id FROM members_history WHERE client_id = ? AND valid_from > ? AND valid_from <= ?
+			UNION
+			SELECT member_id FROM members_history WHERE client_id = ? AND valid_to > ? AND valid_to <= ?
+			''', (client_id, since, until, client_id, since, until))]
+
+		def versions_at(as_of: str) -> Dict[Any, Dict[str, Any]]:
+			versions = {}
+			for start in range(0, len(touched), 500):
+				batch = touched[start:start + 500]
+				cursor = conn.execute(f'''
+					SELECT {', '.join(HISTORY_COLUMNS)}, valid_from, valid_to FROM members_history
+					WHERE client_id = ? AND member_id IN ({', '.join('?' * len(batch))})
+					AND valid_from <= ? AND (valid_to IS NULL OR valid_to > ?)
+					''', (client_id, *batch, as_of, as_of))
+				columns = [description[0] for description in cursor.description]
+				for row in cursor:
+					member = dict(zip(columns, row))
+					versions[member["member_id"]] = member
+			return versions
+
+		before, after = versions_at(since), versions_at(until)
+		diff = {"added": [], "removed": [], "changed": []}
+		for member_id in sorted(set(before) | set(after)):
+			old, new = before.get(member_id), after.get(member_id)
+			if old is None:
+				diff["added"].append(new)
+			elif new is None:
+				diff["removed"].append(old)
+			elif old["row_hash"] != new["row_hash"]:
+				fields = [field for field in ROW_HASH_FIELDS if old[field] != new[field]]
+				diff["changed"].append({"member_id": member_id, "fields": fields, "before": old, "after": new})
+		return diff
+
+	def _compact_history(self, conn: sqlite3.Connection, client_id: Optional[str], before: str) -> int:
+		params = (before,) if client_id is None else (client_id, before)
+		return conn.execute(
+			"DELETE FROM members_history WHERE " + ("" if client_id is None else "client_id = ? AND ")
+			+ "valid_to IS NOT NULL AND valid_to <= ?", params
+			).rowcount
+
+	def compact_history(self, client_id: Optional[str] = None, before=None, retention_days: Optional[int] = None) -> int:
+		"""
+		Drops the versions that ended at or before the cutoff. Versions still valid at the
+		cutoff are kept, so point in time queries from the cutoff on stay exact.
+
+		before			- cutoff (datetime/date/timestamp string, UTC)
+		retention_days	- or the cutoff as days back from now
+
+		Returns - versions deleted
+		"""
+		if before is None:
+			if retention_days is None:
+				raise ValueError("compact_history needs before or retention_days")
+			before = datetime.now(timezone.utc) - timedelta(days=retention_days)
+		with self.connections.transaction() as conn:
+			deleted = self._compact_history(conn, client_id, history_timestamp(before))
+			if deleted:
+				self._bump_data_versions(conn, "SELECT DISTINCT client_id FROM members" if client_id is None else "SELECT ? AS client_id",
+					() if client_id is None else (client_id,))
+		return deleted
+
+	def rebuild_identity_index(self):
+		"""
+		Recomputes member_identity_keys from members, only needed if members was changed
+		outside DataSQLiteStorage or IDENTITY_KEYS changed
+		"""
+		with self.connections.transaction() as conn:
+			conn.execute("DELETE FROM member_identity_keys")
+			conn.execute("INSERT OR IGNORE INTO member_identity_keys (key_type, key, client_id, member_id) "
+				+ identity_key_rows("members"))
+			self._bump_data_versions(conn, "SELECT DISTINCT client_id FROM members")
+
+	def find_identity_matches(self, member: Dict[str, Any]) -> List[Dict[str, Any]]:
+		"""
+		Stored members sharing at least one identity key with member (a normalized member
+		record, client_id/member_id optional). The member itself is left out.
+		One primary key seek per key type.
+
+		Returns - [{"client_id", "member_id", "matched_on": [key types]}], most keys matched first
+		"""
+		probe = tuple(member.get(field) for field in ("last_name", "dob", "zip5", "phone", "email"))
+		conn = self.connections.connection()
+		keys = conn.execute(
+			"WITH probe (last_name, dob, zip5, phone, email, client_id, member_id) AS (VALUES (?, ?, ?, ?, ?, NULL, NULL)) "
+			+ identity_key_rows("probe"), probe
+			).fetchall()
+
+		own = (member.get("client_id"), str(member.get("member_id")))
+		matches: Dict[tuple, List[str]] = {}
+		for key_type, key, _, _ in keys:
+			for client_id, member_id in conn.execute(IDENTITY_LOOKUP_QUERY, (key_type, key)):
+				if (client_id, str(member_id)) != own:
+					matches.setdefault((client_id, member_id), []).append(key_type)
+
+		return sorted(
+			({"client_id": client_id, "member_id": member_id, "matched_on": matched_on}
+			 for (client_id, member_id), matched_on in matches.items()),
+			key=lambda match: (-len(match["matched_on"]), match["client_id"], match["member_id"])
+		)
+
+	def likely_duplicates(self, client_id: Optional[str] = None, min_keys: int = 1,
+			max_block_size: int = IDENTITY_MAX_BLOCK_SIZE, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+		"""
+		Batch report of member pairs sharing identity keys - the same person under two
+		member_ids, or sent by two clients. Only members within the same key block are
+		compared, never all pairs.
+
+		client_id		- only pairs with at least one member of this client
+		min_keys		- pairs matching on fewer key types are left out
+		max_block_size	- keys shared by more members are ignored (see IDENTITY_MAX_BLOCK_SIZE)
+
+		Returns - [{"member", "duplicate", "matched_on", "cross_client"}], most keys matched first,
+		member/duplicate are {"client_id", "member_id"}
+		"""
+		sql = '''
+			WITH blocks AS (
+				SELECT key_type, key FROM member_identity_keys
+				GROUP BY key_type, key
+				HAVING COUNT(*) BETWEEN 2 AND ?
+			)
+			SELECT a.client_id, a.member_id, b.client_id, b.member_id, group_concat(a.key_type), COUNT(*) AS keys_matched
+			FROM blocks k
+			JOIN member_identity_keys a ON a.key_type = k.key_type AND a.key = k.key
+			JOIN member_identity_keys b ON b.key_type = k.key_type AND b.key = k.key
+				AND (a.client_id, a.member_id) < (b.client_id, b.member_id)
+			WHERE ? IS NULL OR a.client_id = ? OR b.client_id = ?
+			GROUP BY a.client_id, a.member_id, b.client_id, b.member_id
+			HAVING COUNT(*) >= ?
+			ORDER BY keys_matched DESC, a.client_id, a.member_id, b.client_id, b.member_id
+			'''
+		params = [max_block_size, client_id, client_id, client_id, min_keys]
+		if limit is not None:
+			sql += " LIMIT ?"
+			params.append(limit)
+
+		return [
+			{
+				"member": {"client_id": a_client, "member_id": a_member},
+				"duplicate": {"client_id": b_client, "member_id": b_member},
+				"matched_on": sorted(matched_on.split(",")),
+				"cross_client": a_client != b_client
+			}
+			for a_client, a_member, b_client, b_member, matched_on, _ in self.connections.connection().execute(sql, params)
+		]
+
+	def _rebuild_rollups(self, conn: sqlite3.Connection):
+		conn.execute("DELETE FROM client_member_counts")
+		conn.execute("DELETE FROM zip5_member_counts")
+		conn.execute("DELETE FROM client_error_totals")
+		conn.execute('''
+			INSERT INTO client_member_counts (client_id, member_count)
+			SELECT client_id, COUNT(*) FROM members GROUP BY client_id
+			''')
+		conn.execute('''
+			INSERT INTO zip5_member_counts (client_id, zip5, member_count)
+			SELECT client_id, zip5, COUNT(*) FROM members GROUP BY client_id, zip5
+			''')
+		conn.execute('''
+			INSERT INTO client_error_totals (client_id, total_rows, invalid_rows)
+			SELECT client_id, SUM(total_rows), SUM(invalid_rows) FROM audit_log GROUP BY client_id
+			''')
+
+	def rebuild_rollups(self):
+		"""
+		Recomputes every rollup table from members and audit_log with full scans,
+		only needed if the base tables were changed outside DataSQLiteStorage.
+		client_reject_reasons has no base table and is left as is
+		"""
+		with self.connections.transaction() as conn:
+			self._rebuild_rollups(conn)
+			self._bump_data_versions(conn, "SELECT client_id FROM members UNION SELECT client_id FROM audit_log")
+
+	def _bump_data_versions(self, conn: sqlite3.Connection, client_ids_sql: str, params: tuple = ()):
+		"""
+		+1 on the data version of every client client_ids_sql selects, part of the write's transaction
+		"""
+		conn.execute(f'''
+			INSERT INTO client_data_versions (client_id, version)
+			SELECT client_id, 1 FROM ({client_ids_sql}) WHERE true
+			ON CONFLICT(client_id) DO UPDATE SET version = version + 1
+			''', params)
+		self._local_writes += 1
+
+	def data_versions(self) -> Dict[str, int]:
+		"""
+		{client_id: data version}. Re-read only when PRAGMA data_version says another
+		connection committed, or this instance wrote - otherwise it costs one PRAGMA.
+		"""
+		conn = self.connections.connection()
+		read_at = (conn, conn.execute("PRAGMA data_version").fetchone()[0], self._local_writes)
+		if read_at != self._versions_read_at:
+			self._versions = dict(conn.execute("SELECT client_id, version FROM client_data_versions"))
+			self._versions_read_at = read_at
+		return self._versions
+
+	def query_table(self, sql: str, params: tuple = (), client_id: Optional[str] = None) -> Tuple[List[str], List[tuple]]:
+		"""
+		Runs a read query through the result cache (when query_cache_size is set)
+
+		client_id - the query only reads this client's data: the cached result is kept until
+		that client's data version changes. Without it any client's write invalidates it.
+		Versions are bumped by insert_members, insert_audit_log, record_processed_file and
+		the rebuilds - tables written any other way must not be read through the cache.
+
+		Returns - (column names, rows)
+		"""
+		if self.query_cache is None:
+			cursor = self.connections.connection().execute(sql, params or ())
+			return [description[0] for description in cursor.description], cursor.fetchall()
+
+		versions = self.data_versions()
+		if client_id is not None:
+			scope, version = ("client", client_id), versions.get(client_id, 0)
+		else:
+			scope, version = ("all",), sum(versions.values())
+		key = self.query_cache.key(sql, params, scope)
+		cached = self.query_cache.get(key, version)
+		if cached is None:
+			cursor = self.connections.connection().execute(sql, params or ())
+			cached = ([description[0] for description in cursor.description], cursor.fetchall())
+			self.query_cache.put(key, version, cached)
+		return list(cached[0]), list(cached[1])
+
+	def query(self, sql: str, params: tuple = (), client_id: Optional[str] = None) -> List[tuple]:
+		"""
+		Rows of query_table
+		"""
+		return self.query_table(sql, params, client_id)[1]
+
+	def unique_members_per_client(self) -> List[tuple]:
+		"""
+		Returns - [(client_id, unique_member_count)] from the rollups
+		"""
+		return self.query(UNIQUE_MEMBERS_ROLLUP_QUERY)
+
+	def top_zip5(self, limit: Optional[int] = None) -> List[tuple]:
+		"""
+		Returns - [(zip5, member_count)] across all clients, biggest first, from the rollups
+		"""
+		rows = self.query(TOP_ZIP5_ROLLUP_QUERY)
+		return rows if limit is None else rows[:limit]
+
+	def ingestion_error_rate(self) -> List[tuple]:
+		"""
+		Returns - [(client_id, bad rows / total rows)] from the rollups
+		"""
+		return self.query(INGESTION_ERROR_RATE_ROLLUP_QUERY)
+
+	def reject_reasons(self) -> List[tuple]:
+		"""
+		Returns - [(client_id, field, code, rejected rows)] from the rollups
+		"""
+		return self.query(REJECT_REASONS_ROLLUP_QUERY)
+
+	def reset_delta_tracking(self, client_id: str):
+		"""
+		Forgets the members seen by earlier delta runs of the client, call before a new file
+		"""
+		conn = self.connections.connection()
+		conn.execute(DELTA_SEEN_TABLE)
+		conn.execute("DELETE FROM delta_seen_members WHERE client_id = ?", (client_id,))
+
+	def count_missing_members(self, client_id: str) -> int:
+		"""
+		Stored members of the client that were not in any delta batch since reset_delta_tracking
+		(i.e. dropped from the client's full roster). Only counted, nothing is deleted.
+		"""
+		conn = self.connections.connection()
+		conn.execute(DELTA_SEEN_TABLE)
+		return conn.execute('''
+			SELECT COUNT(*) FROM members m
+			WHERE m.client_id = ?
+			AND NOT EXISTS (
+				SELECT 1 FROM delta_seen_members d
+				WHERE d.member_id = m.member_id AND d.client_id = m.client_id
+			)
+			''', (client_id,)).fetchone()[0]
+
+	def insert_audit_log(self, client_id, file_name, valid_record_count, invalid_record_count, ingestion_time,
+			error_counts: Dict[str, Dict[str, int]] = None):
+		"""
+		error_counts - {field: {code: rejected rows}} of the file (RejectsWriter summary),
+		added to client_reject_reasons
+		"""
+		with self.connections.transaction() as conn:
 			conn.execute('''
 				INSERT INTO audit_log
 				(client_id, file_name, total_rows, valid_rows, invalid_rows, ingestion_time)
@@ -131,15 +957,112 @@ class DataSQLiteStorage:
 					invalid_record_count,
 					ingestion_time
 					))
-			conn.commit()
-		finally:
-			conn.close()
+			conn.execute('''
+				INSERT INTO client_error_totals (client_id, total_rows, invalid_rows)
+				VALUES(?, ?, ?)
+				ON CONFLICT(client_id) DO UPDATE SET
+					total_rows = total_rows + excluded.total_rows,
+					invalid_rows = invalid_rows + excluded.invalid_rows
+				''', (client_id, valid_record_count+invalid_record_count, invalid_record_count))
+			if error_counts:
+				conn.executemany('''
+					INSERT INTO client_reject_reasons (client_id, field, code, row_count)
+					VALUES(?, ?, ?, ?)
+					ON CONFLICT(client_id, field, code) DO UPDATE SET
+						row_count = row_count + excluded.row_count
+					''', [
+						(client_id, field or "", code, count)
+						for field, codes in error_counts.items()
+						for code, count in codes.items()
+					])
+			self._bump_data_versions(conn, "SELECT ? AS client_id", (client_id,))
+
+	def get_processed_file(self, client_id: str, checksum: str) -> Optional[Dict[str, Any]]:
+		"""
+		Looks up a file the client already sent with the same content
+		Returns - the stored pipeline result, None if this content wasn't processed yet
+		"""
+		row = self.connections.connection().execute(
+			"SELECT result, processed_at FROM processed_files WHERE client_id = ? AND checksum = ?",
+			(client_id, checksum)
+			).fetchone()
+		if row is None:
+			return None
+
+		result = json.loads(row[0])
+		result["processed_at"] = row[1]
+		return result
+
+	def record_processed_file(self, client_id: str, checksum: str, file_name: str, result: Dict[str, Any]):
+		"""
+		Adds a successfully processed file to the content hash index
+		"""
+		with self.connections.transaction() as conn:
+			conn.execute('''
+				INSERT OR REPLACE INTO processed_files
+				(client_id, checksum, file_name, result)
+				VALUES(?, ?, ?, ?)
+				''', (client_id, checksum, file_name, json.dumps(result, default=str)))
+			self._bump_data_versions(conn, "SELECT ? AS client_id", (client_id,))
+
+	def explain_query_plan(self, sql: str, params: tuple = None) -> List[str]:
+		"""
+		Returns - the detail lines of EXPLAIN QUERY PLAN, e.g. "SCAN members USING COVERING INDEX idx_members_zip5"
+		"""
+		sql = sql.strip().rstrip(";")
+		if params is None:
+			params = (None,) * sql.count("?")
+		return [row[3] for row in self.connections.connection().execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+	def full_table_scans(self, sql: str, params: tuple = None, allowed_tables=ROLLUP_TABLES, allowed_indexes=()) -> List[str]:
+		"""
+		Tables the query reads whole - any SCAN of a table, also through an index
+		("SCAN members USING COVERING INDEX ..." still reads every index entry), only
+		a SEARCH with a seek (... (zip5=?)) doesn't count. Aliases are resolved to the table.
+
+		allowed_tables	- tables that may be scanned (small rollups)
+		allowed_indexes	- indexes whose full scan is accepted for this query
+		"""
+		aliases = table_aliases(sql)
+		conn = self.connections.connection()
+		schema_tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+		tables = []
+		for detail in self.explain_query_plan(sql, params):
+			scan = plan_scan(detail, aliases)
+			if scan is None:
+				continue
+			table, index = scan
+			# CTEs and materialized subqueries are scanned under their own names
+			if table in schema_tables and table not in allowed_tables and index not in allowed_indexes:
+				tables.append(table)
+		return tables
+
+	def check_query_plans(self, queries: Dict[str, str], allowed_tables=ROLLUP_TABLES, allowed_index_scans: Dict[str, Tuple[str, ...]] = None):
+		"""
+		Raises RuntimeError naming every query that falls back to a full table or index scan
+		queries				- {name: sql}
+		allowed_index_scans	- {name: index names} full index scans that query is meant to do
+		"""
+		allowed_index_scans = allowed_index_scans or {}
+		offenders = {}
+		for name, sql in queries.items():
+			tables = self.full_table_scans(sql, allowed_tables=allowed_tables, allowed_indexes=allowed_index_scans.get(name, ()))
+			if tables:
+				offenders[name] = tables
+		if offenders:
+			details = "; ".join(f"{name} scans {', '.join(tables)}" for name, tables in offenders.items())
+			raise RuntimeError(f"Full table scan in query plan: {details}")
 
 	def _db_connection(self) -> sqlite3.Connection:
 		"""
-		Creates a SQLite db connection
+		Creates a SQLite db connection with the configured PRAGMAs (WAL, cache, mmap ...)
+		The caller owns it and closes it, it is not taken from the pool
 		Returns - connection object
 		"""
-		conn = sqlite3.connect(self.db_path)
-		#conn.execute("")
-		return conn
+		return self.connections.connect()
+
+	def close(self):
+		"""
+		Closes the pooled connections
+		"""
+		self.connections.close()
@@ -0,0 +1,220 @@
+"""
+Data storage using Parquet - columnar serving layer alongside SQLite
+
+data/parquet/members/client_id=<client_id>/ingestion_date=<YYYY-MM-DD>/part-*.parquet
+
+- Receives the same normalized records as DataSQLiteStorage.insert_members
+- Files are append only, a re-sent member is a new row; reads keep the latest
+  row per (client_id, member_id) and compact() folds small files together.
+  Latest is the highest (ingestion_time, write_sequence): the chunks of a streamed
+  file share its ingestion_time, write_sequence orders them as they were written
+- Reads push column projection and partition/row filters down to pyarrow,
+  client_id/ingestion_date filters prune whole directories
+
+Needs pyarrow (optional dependency) - pip install pyarrow
+"""
+
+import threading
+import time
+import uuid
+from datetime import datetime, date
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Sequence
+
+try:
+	import pyarrow as pa
+	import pyarrow.compute as pc
+	import pyarrow.dataset as ds
+	import pyarrow.parquet as pq
+except ImportError:
+	pa = None
+
+MEMBER_COLUMNS = ("member_id", "first_name", "last_name", "dob", "gender", "phone", "email", "zip5", "plan_id")
+PARTITION_COLUMNS = ("client_id", "ingestion_date")
+
+
+def _member_schema():
+	return pa.schema([
+		("member_id", pa.string()),
+		("first_name", pa.string()),
+		("last_name", pa.string()),
+		("dob", pa.date32()),
+		("gender", pa.string()),
+		("phone", pa.string()),
+		("email", pa.string()),
+		("zip5", pa.string()),
+		("plan_id", pa.string()),
+		("ingestion_time", pa.timestamp("us")),
+		("write_sequence", pa.int64()),
+	])
+
+
+def _dataset_schema():
+	return _member_schema().append(pa.field("client_id", pa.string())).append(pa.field("ingestion_date", pa.string()))
+
+
+_sequence_lock = threading.Lock()
+_last_sequence = 0
+
+
+def next_write_sequence() -> int:
+	"""
+	Increasing within the process, wall clock nanoseconds so writes of other processes order too
+	"""
+	global _last_sequence
+	with _sequence_lock:
+		_last_sequence = max(time.time_ns(), _last_sequence + 1)
+		return _last_sequence
+
+
+def _partitioning():
+	return ds.partitioning(pa.schema([("client_id", pa.string()), ("ingestion_date", pa.string())]), flavor="hive")
+
+
+class DataParquetStorage:
+	"""
+	Partitioned Parquet dataset of normalized members
+	"""
+
+	def __init__(self, root="data/parquet/members"):
+		if pa is None:
+			raise ImportError("DataParquetStorage needs pyarrow - pip install pyarrow")
+		self.root = Path(root)
+		self.root.mkdir(parents=True, exist_ok=True)
+
+	def _partition_path(self, client_id: str, ingestion_date: str) -> Path:
+		return self.root / f"client_id={client_id}" / f"ingestion_date={ingestion_date}"
+
+	def insert_members(self, client_id: str, members: List[dict], ingestion_time: datetime = None) -> Dict[str, Any]:
+		"""
+		Writes the batch as one new file in the client's partition for the ingestion date
+
+		Returns - {"written": row count, "file": path or None}
+		"""
+		if not members:
+			return {"written": 0, "file": None}
+
+		ingestion_time = ingestion_time or datetime.now()
+		write_sequence = next_write_sequence()
+		rows = []
+		for member in members:
+			row = {column: member.get(column) for column in MEMBER_COLUMNS}
+			row["member_id"] = str(row["member_id"])
+			if isinstance(row["dob"], str):
+				row["dob"] = date.fromisoformat(row["dob"])
+			row["ingestion_time"] = ingestion_time
+			row["write_sequence"] = write_sequence
+			rows.append(row)
+
+		table = pa.Table.from_pylist(rows, schema=_member_schema())
+		partition = self._partition_path(client_id, ingestion_time.date().isoformat())
+		partition.mkdir(parents=True, exist_ok=True)
+		file_path = partition / f"part-{ingestion_time.strftime('%y%m%d_%H%M%S_%f')}-{uuid.uuid4().hex[:8]}.parquet"
+		pq.write_table(table, file_path)
+
+		return {"written": table.num_rows, "file": str(file_path)}
+
+	def _dataset(self):
+		# explicit schema - files written before write_sequence read it as null
+		return ds.dataset(self.root, format="parquet", schema=_dataset_schema(), partitioning=_partitioning())
+
+	def partition_filter(self, client_id: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None):
+		"""
+		Filter expression on the partition columns - only matching directories are read
+		since/until - ingestion dates, YYYY-MM-DD, inclusive
+		"""
+		expression = None
+		for condition in (
+			ds.field("client_id") == client_id if client_id is not None else None,
+			ds.field("ingestion_date") >= since if since is not None else None,
+			ds.field("ingestion_date") <= until if until is not None else None,
+		):
+			if condition is not None:
+				expression = condition if expression is None else expression & condition
+		return expression
+
+	def read_members(self, columns: Optional[Sequence[str]] = None, filter=None, latest_only: bool = True):
+		"""
+		Reads members as a pyarrow Table
+
+		columns		- projection, only these columns are decoded
+		filter		- pyarrow expression (see partition_filter), pushed down to partition and row group pruning
+		latest_only	- keep only the newest row of each (client_id, member_id)
+		"""
+		read_columns = list(columns) if columns is not None else list(MEMBER_COLUMNS) + list(PARTITION_COLUMNS)
+		if latest_only:
+			read_columns = list(dict.fromkeys(read_columns + ["client_id", "member_id", "ingestion_time", "write_sequence"]))
+
+		table = self._dataset().to_table(columns=read_columns, filter=filter)
+		if latest_only and table.num_rows:
+			table = self._latest_rows(table)
+		if columns is not None:
+			table = table.select(list(columns))
+		elif "write_sequence" in table.column_names:
+			table = table.drop_columns(["write_sequence"])
+		return table
+
+	def _latest_rows(self, table):
+		"""
+		Newest row per (client_id, member_id), the same view the SQLite upsert keeps.
+		The sort is stable, within one write the last occurrence wins as in the upsert
+		"""
+		# files written before write_sequence sort first among rows of the same ingestion_time
+		index = table.schema.get_field_index("write_sequence")
+		table = table.set_column(index, "write_sequence", pc.fill_null(table.column(index), 0))
+		table = table.sort_by([("ingestion_time", "ascending"), ("write_sequence", "ascending")])
+		table = table.append_column("_row", pa.array(range(table.num_rows), pa.int64()))
+		latest = table.group_by(["client_id", "member_id"], use_threads=False).aggregate([("_row", "max")])
+		return table.take(latest.column("_row_max")).drop_columns(["_row"])
+
+	def compact(self, client_id: Optional[str] = None, min_files: int = 2) -> Dict[str, int]:
+		"""
+		Rewrites every partition holding at least min_files files as a single file,
+		keeping only the latest row per member within the partition
+
+		Returns - {"partitions": compacted partitions, "files_removed": n}
+		"""
+		pattern = f"client_id={client_id}" if client_id is not None else "client_id=*"
+		compacted = 0
+		removed = 0
+		for partition in sorted(self.root.glob(f"{pattern}/ingestion_date=*")):
+			files = sorted(partition.glob("*.parquet"))
+			if len(files) < min_files:
+				continue
+
+			table = ds.dataset([str(f) for f in files], format="parquet", schema=_member_schema()).to_table()
+			# partition columns are only in the path, _latest_rows needs client_id
+			client_value = partition.parent.name.split("=", 1)[1]
+			table = table.append_column("client_id", pa.array([client_value] * table.num_rows, pa.string()))
+			table = self._latest_rows(table).drop_columns(["client_id"])
+
+			target = partition / f"part-compacted-{uuid.uuid4().hex[:8]}.parquet"
+			# dot files are ignored by dataset discovery, readers never see a half written file
+			temp = partition / f".{target.name}.tmp"
+			pq.write_table(table, temp)
+			temp.rename(target)
+			for f in files:
+				f.unlink()
+
+			compacted += 1
+			removed += len(files)
+
+		return {"partitions": compacted, "files_removed": removed}
+
+	def unique_members_per_client(self, filter=None) -> List[tuple]:
+		"""
+		Returns - [(client_id, unique_member_count)]
+		"""
+		table = self.read_members(columns=["client_id", "member_id"], filter=filter, latest_only=False)
+		counts = table.group_by("client_id").aggregate([("member_id", "count_distinct")])
+		return sorted(zip(counts.column("client_id").to_pylist(), counts.column("member_id_count_distinct").to_pylist()))
+
+	def top_zip5(self, limit: Optional[int] = None, filter=None) -> List[tuple]:
+		"""
+		Returns - [(zip5, member_count)] over the latest row of each member, biggest first
+		"""
+		table = self.read_members(columns=["zip5"], filter=filter)
+		counts = table.group_by("zip5").aggregate([("zip5", "count")])
+		rows = sorted(zip(counts.column("zip5").to_pylist(), counts.column("zip5_count").to_pylist()),
+					  key=lambda row: (-row[1], row[0]))
+		return rows if limit is None else rows[:limit]
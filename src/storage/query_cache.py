@@ -0,0 +1,79 @@
+"""
+LRU cache of analytics query results
+
+Entries are keyed on the normalized SQL (whitespace outside quoted literals and
+identifiers collapsed, trailing ";" dropped),
+the parameters and the scope the version is counted over (a client or all clients), and stored with the data version they were read at
+(see DataSQLiteStorage.query - per-client counters bumped by every ingest write).
+A get with a different version is a miss and drops the entry, so a result is never
+served after a relevant client's data changed.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+# '...' and "..." spans ('' / "" escape the quote inside), or a run of whitespace
+SQL_QUOTED_OR_WHITESPACE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|\s+")
+
+
+def normalize_sql(sql: str) -> str:
+	"""
+	Whitespace runs become one space, quoted literals are kept exactly - 'a  b' and 'a b' are other queries
+	"""
+	collapsed = SQL_QUOTED_OR_WHITESPACE.sub(lambda match: match.group(1) or " ", sql)
+	return collapsed.strip().rstrip(";").rstrip()
+
+
+class QueryResultCache:
+	def __init__(self, max_entries: int = 256):
+		if max_entries <= 0:
+			raise ValueError(f"max_entries must be positive: {max_entries}")
+		self.max_entries = max_entries
+		self._entries: "OrderedDict[Tuple[str, tuple, tuple], Tuple[Hashable, Any]]" = OrderedDict()
+		self._lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	@staticmethod
+	def key(sql: str, params=(), scope: tuple = ()) -> Tuple[str, tuple, tuple]:
+		"""
+		scope - what the version of the entry counts, e.g. ("client", client_id) or ("all",).
+		The same query stored under another scope is another entry
+		"""
+		return normalize_sql(sql), tuple(params or ()), tuple(scope)
+
+	def get(self, key: Tuple[str, tuple, tuple], version: Hashable) -> Optional[Any]:
+		"""
+		Returns - the cached value if it was stored at version, else None
+		"""
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None and entry[0] == version:
+				self._entries.move_to_end(key)
+				self.hits += 1
+				return entry[1]
+			if entry is not None:
+				del self._entries[key]
+			self.misses += 1
+			return None
+
+	def put(self, key: Tuple[str, tuple, tuple], version: Hashable, value: Any):
+		with self._lock:
+			self._entries[key] = (version, value)
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+				self.evictions += 1
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+
+	def stats(self) -> Dict[str, int]:
+		with self._lock:
+			return {"entries": len(self._entries), "max_entries": self.max_entries,
+					"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
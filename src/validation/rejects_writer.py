@@ -0,0 +1,164 @@
+"""
+Streaming writer for rejected rows
+
+data/rejected/<client_id>/rejected_<timestamp>_<pid>_<id>.jsonl.gz
+data/rejected/<client_id>/rejected_<timestamp>_<pid>_<id>.summary.json
+
+- One gzip compressed JSON line per rejected row: the original columns under "row",
+  the df row index and structured errors [{"field", "code", "message"}]
+- Rows are written in batches as they are rejected, nothing else is kept in memory
+- The file is written under a dot-prefixed temp name and renamed on close, no reader
+  sees a half written file; nothing is created when no row is rejected
+- The summary holds the error counts per field/code, so error analytics
+  don't need to re-read the rejects
+"""
+
+import gzip
+import json
+import math
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List
+
+
+# MemberSchema validator message -> rule code, one per validation rule
+RULE_CODES = (
+    ("Invalid DOB format", "dob_format"),
+    ("Invalid DOB type", "dob_type"),
+    ("Invalid gender", "gender_value"),
+    ("Invalid phone number", "phone_length"),
+    ("Invalid zip code", "zip5_format"),
+    ("Invalid email format", "email_format"),
+)
+
+
+def error_code(message: str) -> Dict[str, str]:
+    """
+    RawMemberSchema error message -> {"field", "code", "message"}
+
+    "member_id is required"                                   -> member_id / required
+    "phone: Value error, Invalid phone number ..."             -> phone / phone_length
+    "email: value is not a valid email address: ..."           -> email / email_format
+    "<field>: <message no rule matches>"                       -> <field> / <field>_invalid
+    """
+    if message.endswith(" is required"):
+        return {"field": message[:-len(" is required")], "code": "required", "message": message}
+    field, sep, detail = message.partition(": ")
+    if not sep:
+        return {"field": None, "code": "invalid", "message": message}
+    for fragment, code in RULE_CODES:
+        if fragment in detail:
+            return {"field": field, "code": code, "message": message}
+    # pydantic's own EmailStr errors ("value is not a valid email address: ...")
+    if field == "email":
+        return {"field": field, "code": "email_format", "message": message}
+    return {"field": field, "code": f"{field}_invalid", "message": message}
+
+
+def _json_value(value):
+    # pandas hands back numpy scalars and NaN for empty cells
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+class RejectsWriter:
+    """
+    Writes rejected records ({"raw_data", "errors", "row_index"}) of one client file
+    """
+
+    def __init__(self, client_id: str, file_name: str, root="data/rejected", batch_size: int = 1000):
+        self.client_id = client_id
+        self.file_name = str(file_name)
+        self.batch_size = batch_size
+
+        directory = Path(root) / client_id
+        name = f"rejected_{datetime.now().strftime('%y%m%d_%H%M%S_%f')}_{os.getpid()}_{uuid.uuid4().hex[:6]}"
+        self.path = directory / f"{name}.jsonl.gz"
+        self.summary_path = directory / f"{name}.summary.json"
+        self._temp_path = directory / f".{name}.jsonl.gz.tmp"
+
+        self.rejected_row_count = 0
+        self.error_counts: Dict[str, Dict[str, int]] = {}
+        self._file = None
+        self._buffer: List[bytes] = []
+
+    def write(self, rejected_records: List[Dict[str, Any]]):
+        for record in rejected_records:
+            errors = [error_code(message) for message in record.get("errors", [])]
+            for error in errors:
+                codes = self.error_counts.setdefault(error["field"], {})
+                codes[error["code"]] = codes.get(error["code"], 0) + 1
+
+            line = {
+                "client_id": self.client_id,
+                "file_name": self.file_name,
+                "row_index": record.get("row_index"),
+                "row": {str(column): _json_value(value) for column, value in record.get("raw_data", {}).items()},
+                "errors": errors
+            }
+            self._buffer.append((json.dumps(line, default=str) + "\n").encode("utf-8"))
+            self.rejected_row_count += 1
+
+            if len(self._buffer) >= self.batch_size:
+                self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        if self._file is None:
+            self._temp_path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = gzip.open(self._temp_path, "wb", compresslevel=6)
+        self._file.write(b"".join(self._buffer))
+        self._buffer = []
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "client_id": self.client_id,
+            "file_name": self.file_name,
+            "rejects_file": str(self.path) if self.rejected_row_count else None,
+            "rejected_row_count": self.rejected_row_count,
+            "error_counts": self.error_counts
+        }
+
+    def close(self) -> Dict[str, Any]:
+        """
+        Finishes the rejects file and writes the summary next to it
+
+        Returns - summary()
+        """
+        self._flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._temp_path.rename(self.path)
+            with open(self.summary_path, "w") as f:
+                json.dump(self.summary(), f, indent=2)
+        return self.summary()
+
+    def abort(self):
+        """
+        The file failed - drops what was written, no rejects file or summary is left behind
+        """
+        self._buffer = []
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._temp_path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_rejects(path) -> List[Dict[str, Any]]:
+    """ Reads a rejects file back, one dict per rejected row """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
@@ -1,7 +1,51 @@
-from pydantic import BaseModel, EmailStr, Field, field_validator, ValidationError
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field, TypeAdapter, field_validator, ValidationError
+from typing import Optional, List, Tuple
 from datetime import date, datetime
+from functools import lru_cache
 import re
+import pandas as pd
+
+
+# -------------------
+# Precompiled patterns and cached parsers, shared by the validators and the fast path.
+# Inputs repeat a small set of dob/zip/phone/email values, every distinct value is
+# parsed once per process (bounded by FAST_CACHE_SIZE)
+# -------------------
+
+FAST_CACHE_SIZE = 65536
+
+REQUIRED_FIELDS = ['member_id', 'first_name', 'last_name']
+VALID_GENDERS = frozenset(('M', 'F', 'O'))
+_NON_DIGITS = re.compile(r'\D')
+
+
+@lru_cache(maxsize=FAST_CACHE_SIZE)
+def _parse_dob(v: str) -> Optional[date]:
+    """ YYYY-MM-DD -> date, None when invalid """
+    try:
+        return datetime.strptime(v, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=FAST_CACHE_SIZE)
+def _normalize_phone(v: str) -> Optional[str]:
+    """ phone_validator without the exception, None when invalid """
+    digits = _NON_DIGITS.sub('', v)
+    if len(digits) != 10:
+        return None
+    return f"{digits[:3]}-{digits[3:6]}-{digits[6:]}"
+
+
+@lru_cache(maxsize=FAST_CACHE_SIZE)
+def _normalize_zip5(v: str) -> Optional[str]:
+    """ zip5_validator without the exception, None when invalid """
+    digits = _NON_DIGITS.sub('', v)
+    if '-' in v:
+        v = v.strip('-')[:1]  # all-dash values are rejected below, not an IndexError
+    if len(digits) != 5 or not v.isdigit():
+        return None
+    return digits
 
 
 class MemberSchema(BaseModel):
@@ -30,10 +74,10 @@ class MemberSchema(BaseModel):
     @classmethod
     def parse_dob(cls, v):
         if isinstance(v, str):
-            try:
-                return datetime.strptime(v, "%Y-%m-%d").date()
-            except ValueError:
+            parsed = _parse_dob(v)
+            if parsed is None:
                 raise ValueError("Invalid DOB format, expected YYYY-MM-DD")
+            return parsed
         elif isinstance(v, date):
             return v
         else:
@@ -42,29 +86,25 @@ class MemberSchema(BaseModel):
     @field_validator('gender')
     @classmethod
     def gender_validator(cls, v: str):
-        valid_genders = ['M', 'F', 'O']
-        if v.upper() not in valid_genders:
+        if v.upper() not in VALID_GENDERS:
             raise ValueError("Invalid gender, must be M/F/O")
         return v.upper()
 
     @field_validator('phone')
     @classmethod
     def phone_validator(cls, v: str):
-        digits = re.sub(r'\D', '', v)
-        if len(digits) != 10:
+        normalized = _normalize_phone(v)
+        if normalized is None:
             raise ValueError("Invalid phone number: must have 10 digits")
-        return f"{digits[:3]}-{digits[3:6]}-{digits[6:]}"
+        return normalized
 
     @field_validator('zip5')
     @classmethod
     def zip5_validator(cls, v: str):
-        digits = re.sub(r'\D', '', v)
-        if '-' in v:
-        	v = v.strip('-')[0]
-
-        if len(digits) != 5 or not v.isdigit():
+        normalized = _normalize_zip5(v)
+        if normalized is None:
             raise ValueError("Invalid zip code: must have 5 digits")
-        return digits
+        return normalized
 
     @field_validator('email')
     @classmethod
@@ -84,9 +124,9 @@ class RawMemberSchema:
         self.raw_data = raw_data
         self.errors: List[str] = []
 
-    def normalize(self) -> Optional[MemberSchema]:
+    def _normalized_data(self) -> dict:
         # Strip and prepare raw data
-        normalized_data = {
+        return {
             'member_id': str(self.raw_data.get('member_id', '')).strip(),
             'first_name': str(self.raw_data.get('first_name', '')).strip(),
             'last_name': str(self.raw_data.get('last_name', '')).strip(),
@@ -98,8 +138,11 @@ class RawMemberSchema:
             'plan_id': str(self.raw_data.get('plan_id', '')).strip()
         }
 
+    def normalize(self) -> Optional[MemberSchema]:
+        normalized_data = self._normalized_data()
+
         # Check required fields first
-        for field in ['member_id', 'first_name', 'last_name']:
+        for field in REQUIRED_FIELDS:
             if not normalized_data[field]:
                 self.errors.append(f"{field} is required")
 
@@ -117,3 +160,148 @@ class RawMemberSchema:
                 msg = err.get("msg", "")
                 self.errors.append(f"{loc}: {msg}")
             return None
+
+    def normalize_fast(self) -> Optional[MemberSchema]:
+        """
+        Same result and errors as normalize(), cheaper for valid rows.
+
+        Fields are checked with the cached parsers and a passing row is built with
+        MemberSchema.model_construct, skipping the validators. A row failing any check
+        goes through normalize() so the error messages come from pydantic as before.
+        """
+        data = self._normalized_data()
+        if not all(data[field] for field in REQUIRED_FIELDS):
+            return self.normalize()
+
+        dob = _parse_dob(data['dob'])
+        gender = data['gender'].upper()
+        phone = _normalize_phone(data['phone'])
+        zip5 = _normalize_zip5(data['zip5'])
+        email, email_errors = _check_email(data['email'])
+        if dob is None or gender not in VALID_GENDERS or phone is None or zip5 is None or email_errors:
+            return self.normalize()
+
+        return MemberSchema.model_construct(
+            member_id=data['member_id'],
+            first_name=data['first_name'],
+            last_name=data['last_name'],
+            dob=dob,
+            gender=gender,
+            phone=phone,
+            zip5=zip5,
+            plan_id=data['plan_id'],
+            email=email
+        )
+
+
+# -------------------
+# Column-wise (vectorized) validation
+# -------------------
+
+_email_adapter = TypeAdapter(Optional[EmailStr])
+
+
+def _raw_column(df: pd.DataFrame, field: str) -> pd.Series:
+    """
+    Column equivalent of str(raw_data.get(field, '')).strip() in RawMemberSchema.normalize
+    """
+    if field in df.columns:
+        column = df[field]
+    elif field == 'zip5' and 'zip_code' in df.columns:
+        column = df['zip_code']
+    else:
+        return pd.Series('', index=df.index, dtype=object)
+    return column.astype(str).str.strip()
+
+
+def _map_unique(column: pd.Series, func) -> Tuple[pd.Series, pd.Series]:
+    """
+    Runs func once per distinct value and maps (value, errors) back onto the column
+    """
+    values, errors = {}, {}
+    for v in column.unique():
+        values[v], errors[v] = func(v)
+    return column.map(values), column.map(errors)
+
+
+def _check_dob(v: str):
+    parsed = _parse_dob(v)
+    if parsed is None:
+        return None, ("dob: Value error, Invalid DOB format, expected YYYY-MM-DD",)
+    return parsed, None
+
+
+@lru_cache(maxsize=FAST_CACHE_SIZE)
+def _check_email(v: str):
+    try:
+        return _email_adapter.validate_python(v), None
+    except ValidationError as e:
+        return None, tuple(f"email: {err.get('msg', '')}" for err in e.errors())
+
+
+def _rule_errors(failed: pd.Series, message: str) -> pd.Series:
+    return failed.map({True: (message,), False: None})
+
+
+def validate_dataframe(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Validate and normalize a whole frame of raw member rows column by column.
+
+    Applies the same rules as RawMemberSchema.normalize/MemberSchema, but on pandas
+    columns instead of one pydantic model per row. dob and email are checked once per
+    distinct value.
+
+    Returns:
+        (valid_df, rejected_df)
+        valid_df    - normalized columns in MemberSchema field order, input index kept
+        rejected_df - the original raw rows plus an 'errors' column holding the same
+                      list of messages RawMemberSchema.errors would contain
+    """
+    data = {field: _raw_column(df, field) for field in MemberSchema.model_fields}
+
+    # Required fields short-circuit the rest of the checks, same as normalize()
+    missing = pd.concat([data[field] == '' for field in REQUIRED_FIELDS], axis=1, keys=REQUIRED_FIELDS)
+    has_required_error = missing.any(axis=1)
+
+    # dob
+    data['dob'], dob_errors = _map_unique(data['dob'], _check_dob)
+
+    # gender
+    data['gender'] = data['gender'].str.upper()
+    gender_errors = _rule_errors(~data['gender'].isin(VALID_GENDERS),
+                                 "gender: Value error, Invalid gender, must be M/F/O")
+
+    # phone
+    phone_digits = data['phone'].str.replace(_NON_DIGITS, '', regex=True)
+    phone_errors = _rule_errors(phone_digits.str.len() != 10,
+                                "phone: Value error, Invalid phone number: must have 10 digits")
+    data['phone'] = phone_digits.str[:3] + '-' + phone_digits.str[3:6] + '-' + phone_digits.str[6:]
+
+    # zip5 - same dash handling as zip5_validator, where only the first character of
+    # v.strip('-') is checked. An all-dash value gets the normal zip5 error
+    zip5 = data['zip5']
+    zip5_digits = zip5.str.replace(_NON_DIGITS, '', regex=True)
+    zip5_checked = zip5.where(~zip5.str.contains('-', regex=False), zip5.str.strip('-').str[:1])
+    zip5_errors = _rule_errors((zip5_digits.str.len() != 5) | ~zip5_checked.str.isdigit(),
+                               "zip5: Value error, Invalid zip code: must have 5 digits")
+    data['zip5'] = zip5_digits
+
+    # email
+    data['email'], email_errors = _map_unique(data['email'], _check_email)
+
+    # pydantic reports errors in MemberSchema field order
+    field_errors = pd.concat([dob_errors, gender_errors, phone_errors, zip5_errors, email_errors], axis=1)
+    rejected_mask = has_required_error | field_errors.notna().any(axis=1)
+
+    errors = []
+    for idx in df.index[rejected_mask]:
+        if has_required_error[idx]:
+            errors.append([f"{field} is required" for field in REQUIRED_FIELDS if missing.at[idx, field]])
+        else:
+            errors.append([msg for rule in field_errors.loc[idx] if isinstance(rule, tuple) for msg in rule])
+
+    valid_df = pd.DataFrame(data, index=df.index)[~rejected_mask]
+    rejected_df = df[rejected_mask].copy()
+    rejected_df['errors'] = pd.Series(errors, index=rejected_df.index, dtype=object)
+
+    return valid_df, rejected_df
@@ -0,0 +1,168 @@
+"""
+Watch-folder ingestion service - the "client drops a file in S3" trigger, running locally
+
+data/landing/<client_id>/<file>.csv[.gz|.zst]		(S3 stand-in, clients upload here)
+
+- A poller lists the landing folder every poll_interval seconds
+- Debounce: a file is picked up once its size and mtime haven't changed for settle_seconds,
+  dot files and *.tmp/*.part (uploads in progress) are ignored
+- Backpressure: picked up files go through a bounded asyncio queue, the poller waits
+  while the queue is full instead of listing more files
+- Worker pool: same split as run_batch, processes ingest + validate, one writer thread
+  does all database writes
+- Done files are moved to <landing>/_processed/<client_id>/, failed ones to _failed/,
+  so they aren't picked up again
+
+python pipeline.py --watch [landing folder]
+"""
+
+import asyncio
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple, Callable
+
+from .ingestion.csv_reader import CSV_SUFFIXES
+from .main import RadiantGrapgDemoDataPipeline, available_cores, store_outcome, _init_batch_worker, _ingest_and_validate_worker
+
+PROCESSED_DIR = "_processed"
+FAILED_DIR = "_failed"
+IN_PROGRESS_SUFFIXES = (".tmp", ".part")
+
+
+class WatchFolderService:
+	def __init__(self, landing_path="data/landing", max_workers: Optional[int] = None, queue_size: Optional[int] = None,
+				 poll_interval: float = 1.0, settle_seconds: float = 2.0, suffixes=CSV_SUFFIXES,
+				 on_result: Callable[[Dict[str, Any]], None] = None, **pipeline_options):
+		"""
+		max_workers			- ingest/validate processes, defaults to the available cores
+		queue_size			- files waiting for a worker, defaults to 2 * max_workers
+		poll_interval		- seconds between two listings of the landing folder
+		settle_seconds		- a file must be unchanged this long before it is picked up
+		suffixes			- file name endings to pick up
+		on_result			- called with every file's pipeline result (plus latency_seconds)
+		pipeline_options	- RadiantGrapgDemoDataPipeline options, chunk_size doesn't apply
+		"""
+		self.landing_path = Path(landing_path)
+		self.landing_path.mkdir(parents=True, exist_ok=True)
+		self.max_workers = max_workers or available_cores()
+		self.queue_size = queue_size or self.max_workers * 2
+		self.poll_interval = poll_interval
+		self.settle_seconds = settle_seconds
+		self.suffixes = tuple(suffixes)
+		self.on_result = on_result
+
+		pipeline_options.pop("chunk_size", None)
+		self.pipeline_options = pipeline_options
+		self.writer = RadiantGrapgDemoDataPipeline(**pipeline_options)
+
+		# path -> ((size, mtime_ns), unchanged since, first seen)
+		self._candidates: Dict[Path, Tuple[tuple, float, float]] = {}
+		self._in_flight = set()
+
+	def scan(self) -> List[Tuple[str, Path, float]]:
+		"""
+		Lists the landing folder once
+
+		Returns - [(client_id, path, first seen)] of the files that have settled
+		"""
+		now = time.time()
+		ready = []
+		present = set()
+		for client_dir in sorted(self.landing_path.iterdir()):
+			if not client_dir.is_dir() or client_dir.name.startswith(("_", ".")):
+				continue
+			for path in sorted(client_dir.iterdir()):
+				if (path.name.startswith(".") or path.suffix in IN_PROGRESS_SUFFIXES or not path.name.lower().endswith(self.suffixes)
+						or path in self._in_flight or not path.is_file()):
+					continue
+				present.add(path)
+				stat = path.stat()
+				signature = (stat.st_size, stat.st_mtime_ns)
+				seen = self._candidates.get(path)
+				if seen is None or seen[0] != signature:
+					# new or still being written - (re)start the settle timer
+					self._candidates[path] = (signature, now, seen[2] if seen else now)
+				elif now - seen[1] >= self.settle_seconds:
+					ready.append((client_dir.name, path, seen[2]))
+					del self._candidates[path]
+
+		for path in list(self._candidates):
+			if path not in present:
+				del self._candidates[path]
+		return ready
+
+	async def run(self, stop: Optional[asyncio.Event] = None):
+		"""
+		Watches until stop is set, then finishes the files already queued
+		"""
+		stop = stop or asyncio.Event()
+		loop = asyncio.get_running_loop()
+		queue = asyncio.Queue(maxsize=self.queue_size)
+		# workers never audit, only the writer does and validate serially (see run_batch)
+		worker_options = dict(self.pipeline_options, audit_sink="json", validation_workers=1)
+
+		with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_batch_worker, initargs=(worker_options,)) as pool, \
+				ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline-writer") as writer_thread:
+			workers = [asyncio.create_task(self._worker(queue, pool, writer_thread)) for _ in range(self.max_workers)]
+			try:
+				while not stop.is_set():
+					for client_id, path, first_seen in await loop.run_in_executor(None, self.scan):
+						self._in_flight.add(path)
+						await queue.put((client_id, path, first_seen))	# waits while the workers are behind
+					try:
+						await asyncio.wait_for(stop.wait(), self.poll_interval)
+					except asyncio.TimeoutError:
+						pass
+				await queue.join()
+			finally:
+				for worker in workers:
+					worker.cancel()
+				await asyncio.gather(*workers, return_exceptions=True)
+				self.writer.logger.flush()
+
+	async def _worker(self, queue: asyncio.Queue, pool: ProcessPoolExecutor, writer_thread: ThreadPoolExecutor):
+		loop = asyncio.get_running_loop()
+		while True:
+			client_id, path, first_seen = await queue.get()
+			try:
+				try:
+					outcome = await loop.run_in_executor(pool, _ingest_and_validate_worker, client_id, str(path))
+					result = await loop.run_in_executor(writer_thread, store_outcome, self.writer, client_id, str(path), outcome)
+				except Exception as e:
+					result = {"client_id": client_id, "file_name": str(path), "status": "failed", "error": str(e)}
+
+				# drop -> queryable
+				result["latency_seconds"] = round(time.time() - first_seen, 3)
+				self._archive(client_id, path, result["status"] != "failed")
+				self._in_flight.discard(path)
+				if self.on_result is not None:
+					self.on_result(result)
+			except Exception as e:
+				print(f"Watch folder worker error {path}-------------{e}")
+			finally:
+				queue.task_done()
+
+	def _archive(self, client_id: str, path: Path, succeeded: bool):
+		target_dir = self.landing_path / (PROCESSED_DIR if succeeded else FAILED_DIR) / client_id
+		target_dir.mkdir(parents=True, exist_ok=True)
+		target = target_dir / path.name
+		if target.exists():
+			target = target_dir / f"{path.stem}_{uuid.uuid4().hex[:6]}{path.suffix}"
+		path.rename(target)
+
+
+def watch(landing_path="data/landing", **options):
+	"""
+	Runs the service until Ctrl+C
+	"""
+	def print_result(result):
+		print(f"{result['client_id']} {result['file_name']} {result['status']} "
+			  f"valid={result.get('valid_row_count')} rejected={result.get('rejected_row_count')} latency={result['latency_seconds']}s")
+
+	service = WatchFolderService(landing_path, on_result=print_result, **options)
+	try:
+		asyncio.run(service.run())
+	except KeyboardInterrupt:
+		pass
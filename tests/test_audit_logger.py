@@ -0,0 +1,108 @@
+"""
+Test for audit logger.py and jsonl_sink.py
+"""
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from src.audit.logger import AuditLogger
+from src.audit.jsonl_sink import AuditLogReader, JsonlAuditSink
+
+
+def _metadata(client_id, checksum):
+	return {
+		"client_id": client_id,
+		"file_name": f"{client_id}.csv",
+		"ingestion_time": datetime(2025, 3, 1, 9),
+		"checksum": checksum
+	}
+
+
+def test_json_sink_files_do_not_collide(tmp_path):
+	logger = AuditLogger(audit_path=tmp_path)
+
+	paths = {logger.audit_log(1, 0, _metadata("client_001", "abc")) for _ in range(20)}
+
+	assert len(paths) == 20
+	assert json.loads(Path(paths.pop()).read_text())["client_id"] == "client_001"
+
+
+def test_jsonl_sink_appends_and_indexes(tmp_path):
+	logger = AuditLogger(audit_path=tmp_path, sink="jsonl", flush_interval=60)
+	for i in range(10):
+		logger.audit_log(i, 1, _metadata(f"client_00{i % 2}", f"sum{i}"))
+	logger.audit_skip(_metadata("client_000", "sum0"), {"file_name": "client_000.csv"})
+	logger.close()
+
+	segments = list((tmp_path / "segments").glob("*.jsonl"))
+	assert len(segments) == 1
+	assert len(segments[0].read_text().splitlines()) == 11
+
+	reader = AuditLogReader(tmp_path)
+	assert [r["valid_row_count"] for r in reader.find(client_id="client_001")] == [1, 3, 5, 7, 9]
+	assert [r["event_type"] for r in reader.find(checksum="sum0")] == ["ingestion", "ingestion_skipped_duplicate"]
+	assert len(reader.find(since="2000-01-01", until="2999-01-01")) == 11
+	assert reader.find(until="2000-01-01") == []
+
+
+def test_jsonl_sink_rotates_segments(tmp_path):
+	sink = JsonlAuditSink(tmp_path, segment_max_bytes=200, flush_interval=60)
+	refs = [sink.append({"event_type": "ingestion", "client_id": "c", "timestamp": datetime.now(), "n": i, "pad": "x" * 80})
+			for i in range(5)]
+	sink.close()
+
+	assert len(list((tmp_path / "segments").glob("*.jsonl"))) == 5
+	segment, offset = refs[3].rsplit(":", 1)
+	with open(segment, "rb") as f:
+		f.seek(int(offset))
+		assert json.loads(f.readline())["n"] == 3
+	assert [r["n"] for r in AuditLogReader(tmp_path).find(client_id="c")] == [0, 1, 2, 3, 4]
+
+
+def test_jsonl_sinks_in_same_second_use_own_segments(tmp_path):
+	first = JsonlAuditSink(tmp_path, flush_interval=60)
+	second = JsonlAuditSink(tmp_path, flush_interval=60)
+	first.append({"event_type": "ingestion", "client_id": "a", "timestamp": datetime.now(), "n": 1, "pad": "x" * 50})
+	second.append({"event_type": "ingestion", "client_id": "b", "timestamp": datetime.now(), "n": 2})
+	first.close()
+	second.close()
+
+	assert len(list((tmp_path / "segments").glob("*.jsonl"))) == 2
+	assert [r["n"] for r in AuditLogReader(tmp_path).find(client_id="b")] == [2]
+
+
+def test_jsonl_sink_keeps_records_when_a_write_fails(tmp_path, monkeypatch, capsys):
+	from src.audit import jsonl_sink
+
+	real_append = jsonl_sink._append
+	failures = []
+
+	def failing_append(path, data):
+		if len(failures) < 2:
+			failures.append(path)
+			raise OSError("No space left on device")
+		real_append(path, data)
+
+	monkeypatch.setattr(jsonl_sink, "_append", failing_append)
+	sink = JsonlAuditSink(tmp_path, flush_interval=60)
+	sink.append({"event_type": "ingestion", "client_id": "c", "timestamp": datetime.now(), "n": 0})
+
+	with pytest.raises(OSError):
+		sink.flush()
+	assert AuditLogReader(tmp_path).find(client_id="c") == []
+
+	# the background thread survives its failure and writes the records on the next interval
+	sink.flush_interval = 0.01
+	sink._wake.set()
+	for _ in range(200):
+		if AuditLogReader(tmp_path).find(client_id="c"):
+			break
+		time.sleep(0.01)
+	sink.append({"event_type": "ingestion", "client_id": "c", "timestamp": datetime.now(), "n": 1})
+	sink.close()
+
+	assert "Audit flush error" in capsys.readouterr().out
+	assert [r["n"] for r in AuditLogReader(tmp_path).find(client_id="c")] == [0, 1]
@@ -0,0 +1,39 @@
+"""
+Test for the benchmarks harness
+"""
+import pandas as pd
+import pytest
+
+from benchmarks.generate_members import generate_member_files
+from benchmarks.run_benchmarks import run_benchmark, compare
+from src.validation.schema_validation import validate_dataframe
+
+
+def test_generated_files_follow_rates(tmp_path):
+	manifest = generate_member_files(tmp_path, rows=2001, clients=2, error_rate=0.1, duplicate_rate=0.2, seed=1)
+
+	assert [client_id for client_id, _ in manifest] == ["client_001", "client_002"]
+	df = pd.read_csv(manifest[0][1])
+	assert len(df) == 1001
+	assert 0.05 < 1 - df["member_id"].nunique() / len(df) < 0.35
+	_, rejected_df = validate_dataframe(df)
+	assert 0.05 < len(rejected_df) / len(df) < 0.15
+	# same seed, same file
+	again = generate_member_files(tmp_path / "again", rows=2001, clients=2, error_rate=0.1, duplicate_rate=0.2, seed=1)
+	assert open(again[1][1]).read() == open(manifest[1][1]).read()
+
+
+def test_benchmark_run_and_compare(tmp_path):
+	result = run_benchmark(tmp_path, rows=300, clients=2, normalize_rows=50)
+
+	assert result["stages"]["validate_dataframe"]["rows"] == 300
+	assert result["stages"]["normalize"]["rows"] == 50
+	assert "query_unique_members_rollup" in result["stages"]
+	assert compare(result, result) == []
+
+	baseline = dict(result, stages=dict(result["stages"], parse=dict(result["stages"]["parse"], seconds=0.0)))
+	slower = dict(result, stages=dict(result["stages"], parse=dict(result["stages"]["parse"], seconds=1.0)))
+	assert [r["stage"] for r in compare(slower, baseline)] == ["parse"]
+
+	with pytest.raises(ValueError):
+		compare(result, dict(result, config=dict(result["config"], rows=1)))
@@ -0,0 +1,63 @@
+"""
+Test for the python -m src command line and lazy imports
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from src.cli import main
+
+ROOT = Path(__file__).parent.parent
+SAMPLE_FILE = ROOT / "sample_inputs" / "sample_data.csv"
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+	monkeypatch.chdir(tmp_path)
+	return tmp_path
+
+
+@pytest.mark.parametrize("module", ["src.main", "src.cli", "analytics_queries"])
+def test_entry_points_import_no_heavy_modules(module):
+	code = f"import sys, {module}; print([m for m in ('pandas', 'numpy', 'pydantic', 'pyarrow') if m in sys.modules])"
+	output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True).stdout
+	assert output.strip() == "[]"
+
+
+@pytest.mark.parametrize("audit_sink", ["json", "jsonl"])
+def test_ingest_query_audit(workdir, capsys, audit_sink):
+	assert main(["ingest", str(SAMPLE_FILE), "--client-id", "client_001", "--audit-sink", audit_sink]) == 0
+	result = json.loads(capsys.readouterr().out)
+	assert (result["status"], result["valid_row_count"], result["rejected_row_count"]) == ("success", 14, 6)
+
+	assert main(["query", "unique-members", "--json"]) == 0
+	assert json.loads(capsys.readouterr().out) == [{"client_id": "client_001", "unique_member_count": 14}]
+
+	assert main(["query", "top-zip5", "--limit", "1"]) == 0
+	lines = capsys.readouterr().out.splitlines()
+	assert lines[0] == "zip5\tmember_count" and len(lines) == 2
+
+	assert main(["ingest", str(SAMPLE_FILE), "--client-id", "client_001", "--audit-sink", audit_sink]) == 0
+	assert json.loads(capsys.readouterr().out)["status"] == "skipped_duplicate"
+
+	assert main(["audit", "--client-id", "client_001"]) == 0
+	records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+	assert [record["event_type"] for record in records] == ["ingestion", "ingestion_skipped_duplicate"]
+
+	assert main(["audit", "--event-type", "ingestion", "--client-id", "client_002"]) == 0
+	assert capsys.readouterr().out == ""
+
+	assert main(["history", "client_001", "--since", "2000-01-01"]) == 0
+	diff = json.loads(capsys.readouterr().out)
+	assert (len(diff["added"]), diff["removed"], diff["changed"]) == (14, [], [])
+
+
+def test_ingest_failure_exits_non_zero(workdir, capsys):
+	broken = workdir / "broken.csv.gz"
+	broken.write_bytes(SAMPLE_FILE.read_bytes())	# not gzip
+
+	assert main(["ingest", str(broken), "--client-id", "client_001"]) == 1
+	assert json.loads(capsys.readouterr().out)["status"] == "failed"
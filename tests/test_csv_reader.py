@@ -0,0 +1,101 @@
+"""
+Test for csv_reader.py
+"""
+import gzip
+
+import pandas as pd
+import pytest
+
+from src.ingestion.csv_reader import MemberCSVReader, is_csv_file, PYARROW_AVAILABLE
+
+CSV = (
+	"member_id,first_name,last_name,dob,gender,phone,email,zip5,plan_id,notes\n"
+	"0012,John,Doe,1980-05-15,M,555-123-4567,john@example.com,02134,PLAN_A,x\n"
+	"0013,,Smith,1975-12-20,F,555-987-6543,,,PLAN_B,y\n"
+)
+
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+def test_strings_projection_and_gzip(tmp_path, engine):
+	if engine == "pyarrow" and not PYARROW_AVAILABLE:
+		pytest.skip("pyarrow not installed")
+	plain = tmp_path / "members.csv"
+	plain.write_text(CSV)
+	compressed = tmp_path / "members.csv.gz"
+	with gzip.open(compressed, "wt") as f:
+		f.write(CSV)
+
+	reader = MemberCSVReader(engine=engine)
+	for path in (plain, compressed):
+		df = reader.read(path)
+		assert "notes" not in df.columns
+		assert df["member_id"].tolist() == ["0012", "0013"]
+		assert df["zip5"].tolist() == ["02134", ""]
+		assert df["first_name"].tolist() == ["John", ""]
+
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+def test_compressed_semicolon_file(tmp_path, engine):
+	if engine == "pyarrow" and not PYARROW_AVAILABLE:
+		pytest.skip("pyarrow not installed")
+	path = tmp_path / "members.csv.gz"
+	with gzip.open(path, "wt") as f:
+		f.write(CSV.replace(",", ";"))
+
+	df = MemberCSVReader(engine=engine).read(path)
+
+	assert "notes" not in df.columns
+	assert df["member_id"].tolist() == ["0012", "0013"]
+	assert df["zip5"].tolist() == ["02134", ""]
+	assert [chunk["plan_id"].tolist() for chunk in MemberCSVReader().read_chunks(path, chunk_size=1)] == [["PLAN_A"], ["PLAN_B"]]
+
+
+def test_chunks_match_whole_read(tmp_path):
+	path = tmp_path / "members.csv"
+	path.write_text(CSV)
+	reader = MemberCSVReader(engine="c")
+
+	chunks = list(reader.read_chunks(path, chunk_size=1))
+
+	assert [row for chunk in chunks for row in chunk.to_dict(orient="records")] == reader.read(path).to_dict(orient="records")
+
+
+def test_inference_mode_keeps_old_behavior(tmp_path):
+	path = tmp_path / "members.csv"
+	path.write_text(CSV)
+
+	df = MemberCSVReader(columns=None, string_dtypes=False, engine="c").read(path)
+
+	assert df["zip5"].tolist()[0] == 2134.0
+	assert "notes" in df.columns
+
+
+def test_zstd(tmp_path):
+	zstandard = pytest.importorskip("zstandard")
+	path = tmp_path / "members.csv.zst"
+	path.write_bytes(zstandard.ZstdCompressor().compress(CSV.encode()))
+
+	assert MemberCSVReader().read(path)["zip5"].tolist() == ["02134", ""]
+
+
+def test_is_csv_file():
+	assert is_csv_file("a/members.CSV.gz")
+	assert not is_csv_file("a/members.json")
+
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+def test_read_range_matches_whole_read(tmp_path, engine):
+	if engine == "pyarrow" and not PYARROW_AVAILABLE:
+		pytest.skip("pyarrow not installed")
+	from src.ingestion.mapped_file import MappedRawFile
+
+	path = tmp_path / "members.csv"
+	path.write_text(CSV.splitlines(keepends=True)[0] + "".join(CSV.splitlines(keepends=True)[1:]) * 5)
+	reader = MemberCSVReader(engine=engine)
+
+	with MappedRawFile(path) as mapped:
+		ranges = mapped.split(3)
+	parts = [reader.read_range(path, start, end) for start, end in ranges]
+
+	assert len(parts) == 3
+	assert pd.concat(parts, ignore_index=True).equals(reader.read(path))
@@ -1,9 +1,405 @@
 import sys
 import os
 import sqlite3
+from datetime import datetime, timezone
 from pathlib import Path
 
-from src.storage.database_sqlite import DataSQLiteStorage
+import pytest
+
+from src.storage.database_sqlite import DataSQLiteStorage, SCHEMA_MIGRATIONS, history_timestamp, plan_scan
+
+def _member(member_id, zip5="94105", client_id="client_001"):
+	return {
+		"member_id": member_id,
+		"first_name": "John",
+		"last_name": "Doe",
+		"dob": "1980-05-15",
+		"gender": "M",
+		"phone": "555-123-4567",
+		"email": "john.doe@email.com",
+		"zip5": zip5,
+		"plan_id": "PLAN_A",
+		"client_id": client_id
+	}
+
+
+def test_insert_members_bulk_counts(tmp_path):
+	storage = DataSQLiteStorage(db_path=tmp_path / "members.db")
+
+	first = storage.insert_members("client_001", [_member("1001"), _member("1002")])
+	second = storage.insert_members("client_001", [_member("1002", zip5="94107"), _member("1003")])
+
+	assert first == {"inserted": 2, "updated": 0, "unchanged": 0}
+	assert second == {"inserted": 1, "updated": 1, "unchanged": 0}
+
+	conn = storage._db_connection()
+	rows = conn.execute("SELECT member_id, zip5 FROM members ORDER BY member_id").fetchall()
+	conn.close()
+	assert rows == [(1001, "94105"), (1002, "94107"), (1003, "94105")]
+
+
+def test_insert_members_duplicate_in_batch_last_wins(tmp_path):
+	storage = DataSQLiteStorage(db_path=tmp_path / "members.db")
+
+	counts = storage.insert_members("client_001", [_member("1001"), _member("1001", zip5="94199")])
+
+	# the second occurrence replaces the first within the batch, it isn't an update of a stored member
+	assert counts == {"inserted": 1, "updated": 0, "unchanged": 0}
+	conn = storage._db_connection()
+	rows = conn.execute("SELECT member_id, zip5 FROM members").fetchall()
+	conn.close()
+	assert rows == [(1001, "94199")]
+
+
+def test_insert_members_empty_batch(tmp_path):
+	storage = DataSQLiteStorage(db_path=tmp_path / "members.db")
+
+	assert storage.insert_members("client_001", []) == {"inserted": 0, "updated": 0, "unchanged": 0}
+
+
+def test_connection_pool_reuse_and_pragmas(tmp_path):
+	storage = DataSQLiteStorage(db_path=tmp_path / "members.db", pragmas={"cache_size": -2000})
+
+	conn = storage.connections.connection()
+
+	assert storage.connections.connection() is conn
+	assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+	assert conn.execute("PRAGMA cache_size").fetchone()[0] == -2000
+	storage.close()
+
+
+def test_reader_not_blocked_by_open_write(tmp_path):
+	storage = DataSQLiteStorage(db_path=tmp_path / "members.db")
+	storage.insert_members("client_001", [_member("1001")])
+
+	reader = storage._db_connection()
+	with storage.connections.transaction() as conn:
+		conn.execute("UPDATE members SET zip5 = '94199'")
+		# WAL - the reader sees the last committed state instead of "database is locked"
+		assert reader.execute("SELECT zip5 FROM members").fetchall() == [("94105",)]
+	assert reader.execute("SELECT zip5 FROM members").fetchall() == [("94199",)]
+	reader.close()
+	storage.close()
+
+
+def test_insert_members_delta_skips_unchanged(tmp_path):
+	storage = DataSQLiteStorage(db_path=tmp_path / "members.db")
+	storage.insert_members("client_001", [_member("1001"), _member("1002"), _member("1003")])
+	conn = storage._db_connection()
+	conn.execute("UPDATE members SET ingestion_time = '2000-01-01 00:00:00'")
+	conn.commit()
+
+	storage.reset_delta_tracking("client_001")
+	counts = storage.insert_members("client_001", [_member("1001"), _member("1002", zip5="94107"), _member("1004")], delta=True)
+
+	assert counts == {"inserted": 1, "updated": 1, "unchanged": 1}
+	assert storage.count_missing_members("client_001") == 1
+	rows = dict(conn.execute("SELECT member_id, ingestion_time FROM members").fetchall())
+	# unchanged row not rewritten
+	assert rows[1001] == "2000-01-01 00:00:00"
+	assert rows[1002] != "2000-01-01 00:00:00"
+	conn.close()
+
+
+def _full_scan_rollups(storage):
+	conn = storage._db_connection()
+	clients = conn.execute("SELECT client_id, COUNT(*) FROM members GROUP BY client_id ORDER BY client_id").fetchall()
+	zips = dict(conn.execute("SELECT zip5, COUNT(*) FROM members GROUP BY zip5").fetchall())
+	conn.close()
+	return clients, zips
+
+
+def test_rollups_follow_inserts_and_updates(tmp_path):
+	storage = DataSQLiteStorage(db_path=tmp_path / "members.db")
+
+	storage.insert_members("client_001", [_member("1001"), _member("1002"), _member("1003", zip5="94107")])
+	storage.insert_members("client_002", [_member("1001", client_id="client_002")])
+	# zip change, unchanged row and a new member, in delta and normal mode
+	storage.insert_members("client_001", [_member("1002", zip5="94107"), _member("1004", zip5="94110")], delta=True)
+	storage.insert_members("client_001", [_member("1001", zip5="94107"), _member("1001", zip5="94110")])
+	storage.insert_audit_log("client_001", "a.csv", 3, 1, "2025-01-01")
+	storage.insert_audit_log("client_001", "b.csv", 4, 0, "2025-01-02")
+
+	clients, zips = _full_scan_rollups(storage)
+	assert storage.unique_members_per_client() == clients
+	assert dict(storage.top_zip5()) == zips
+	assert zips == {"94105": 1, "94107": 2, "94110": 2}
+	assert [count for _, count in storage.top_zip5(limit=2)] == [2, 2]
+	assert storage.ingestion_error_rate() == [("client_001", 1 / 8)]
+
+
+def test_rollups_backfilled_for_existing_database(tmp_path):
+	db_path = tmp_path / "members.db"
+	storage = DataSQLiteStorage(db_path=db_path)
+	storage.insert_members("client_001", [_member("1001"), _member("1002", zip5="94107")])
+	conn = storage._db_connection()
+	conn.execute("DROP TABLE client_member_counts")
+	conn.execute("DROP TABLE zip5_member_counts")
+	conn.commit()
+	conn.close()
+	storage.close()
+
+	reopened = DataSQLiteStorage(db_path=db_path)
+
+	assert reopened.unique_members_per_client() == [("client_001", 2)]
+	assert dict(reopened.top_zip5()) == {"94105": 1, "94107": 1}
+
+
+def test_migrations_add_indexes_once(tmp_path):
+	db_path = tmp_path / "members.db"
+	DataSQLiteStorage(db_path=db_path).close()
+	storage = DataSQLiteStorage(db_path=db_path)
+
+	conn = storage._db_connection()
+	indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+	version = conn.execute("PRAGMA user_version").fetchone()[0]
+	conn.close()
+
+	assert version == len(SCHEMA_MIGRATIONS)
+	assert {"idx_members_zip5", "idx_members_client_member", "idx_audit_log_client_rows"} <= indexes
+
+
+def test_shipped_queries_have_no_full_table_scan(tmp_path):
+	from analytics_queries import SHIPPED_QUERIES, ALLOWED_INDEX_SCANS
+
+	storage = DataSQLiteStorage(db_path=tmp_path / "members.db")
+
+	storage.check_query_plans(SHIPPED_QUERIES, allowed_index_scans=ALLOWED_INDEX_SCANS)
+	with pytest.raises(RuntimeError, match="top_zip5 scans members"):
+		storage.check_query_plans({"top_zip5": SHIPPED_QUERIES["top_zip5"]})
+
+
+def test_check_query_plans_flags_full_scan(tmp_path):
+	storage = DataSQLiteStorage(db_path=tmp_path / "members.db")
+
+	with pytest.raises(RuntimeError, match="by_first_name scans members"):
+		storage.check_query_plans({"by_first_name": "SELECT * FROM members WHERE first_name = ?"})
+
+	# index scans, aliases and the pre-3.36 "SCAN TABLE" format are full scans too
+	assert storage.full_table_scans("SELECT * FROM members WHERE first_name LIKE ? ORDER BY zip5") == ["members"]
+	assert storage.full_table_scans("SELECT m.member_id FROM members AS m WHERE m.first_name = ?") == ["members"]
+	assert storage.full_table_scans("SELECT * FROM members m WHERE m.zip5 = ?") == []
+	assert plan_scan("SCAN TABLE members AS m USING COVERING INDEX idx_members_zip5") == ("members", "idx_members_zip5")
+	assert plan_scan("SCAN TABLE audit_log") == ("audit_log", None)
+	assert plan_scan("SEARCH TABLE members USING INDEX idx_members_zip5 (zip5=?)") is None
+
+
+def test_identity_index_lookup_and_duplicates(tmp_path):
+	storage = DataSQLiteStorage(db_path=tmp_path / "members.db")
+	storage.insert_members("client_001", [
+		_member("1001"),
+		dict(_member("1002"), last_name="Smith", email="smith@email.com"),			# same phone only
+		dict(_member("1003"), last_name="Roe", phone="555-000-0000", email=None),	# nothing shared
+	])
+	storage.insert_members("client_002", [dict(_member("77", client_id="client_002"), email="John.Doe@Email.com", phone="555-999-0000")])
+
+	matches = storage.find_identity_matches(_member("1001"))
+	assert matches == [
+		{"client_id": "client_002", "member_id": 77, "matched_on": ["name_dob_zip5", "email"]},
+		{"client_id": "client_001", "member_id": 1002, "matched_on": ["phone"]},
+	]
+
+	pairs = storage.likely_duplicates()
+	assert [(p["member"]["member_id"], p["duplicate"]["member_id"], p["matched_on"], p["cross_client"]) for p in pairs] == [
+		(1001, 77, ["email", "name_dob_zip5"], True),
+		(1001, 1002, ["phone"], False),
+	]
+	assert len(storage.likely_duplicates(min_keys=2)) == 1
+	assert storage.likely_duplicates(max_block_size=1) == []
+
+
+def test_identity_index_follows_changed_rows(tmp_path):
+	storage = DataSQLiteStorage(db_path=tmp_path / "members.db")
+	storage.insert_members("client_001", [_member("1001"), dict(_member("1002"), last_name="Smith", email=None)])
+	assert len(storage.likely_duplicates()) == 1
+
+	# 1002 changes phone - its old key is gone, no rebuild needed
+	storage.insert_members("client_001", [dict(_member("1002"), last_name="Smith", email=None, phone="555-222-3333")])
+	assert storage.likely_duplicates() == []
+
+	conn = storage._db_connection()
+	indexed = conn.execute("SELECT key_type, key, client_id, member_id FROM member_identity_keys ORDER BY 1, 2, 4").fetchall()
+	conn.close()
+	storage.rebuild_identity_index()
+	conn = storage._db_connection()
+	assert conn.execute("SELECT key_type, key, client_id, member_id FROM member_identity_keys ORDER BY 1, 2, 4").fetchall() == indexed
+	conn.close()
+
+
+def test_identity_index_backfilled_by_migration(tmp_path):
+	db_path = tmp_path / "members.db"
+	storage = DataSQLiteStorage(db_path=db_path)
+	storage.insert_members("client_001", [_member("1001"), _member("1002")])
+	conn = storage._db_connection()
+	conn.execute("DROP TABLE member_identity_keys")
+	conn.execute("PRAGMA user_version = 1")
+	conn.commit()
+	conn.close()
+	storage.close()
+
+	reopened = DataSQLiteStorage(db_path=db_path)
+
+	assert [p["matched_on"] for p in reopened.likely_duplicates()] == [["email", "name_dob_zip5", "phone"]]
+
+
+def test_failed_migration_is_raised_and_rolled_back(tmp_path, monkeypatch):
+	import src.storage.database_sqlite as database_sqlite
+
+	monkeypatch.setattr(database_sqlite, "SCHEMA_MIGRATIONS", SCHEMA_MIGRATIONS + [["UPDATE no_such_table SET x = 1"]])
+	with pytest.raises(sqlite3.OperationalError):
+		DataSQLiteStorage(db_path=tmp_path / "members.db")
+
+	conn = sqlite3.connect(tmp_path / "members.db")
+	try:
+		assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+		assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'members'").fetchall() == []
+	finally:
+		conn.close()
+
+
+def test_query_cache_invalidated_per_client(tmp_path):
+	from src.storage.database_sqlite import MEMBERS_BY_ZIP5_QUERY
+
+	storage = DataSQLiteStorage(db_path=tmp_path / "members.db", query_cache_size=8)
+	storage.insert_members("client_001", [_member("1001")])
+	storage.insert_members("client_002", [_member("2001", client_id="client_002")])
+	by_client = "SELECT member_id FROM members WHERE client_id = ? ORDER BY member_id"
+
+	assert storage.query(by_client, ("client_001",), client_id="client_001") == [(1001,)]
+	assert storage.query(by_client + " ;", ("client_001",), client_id="client_001") == [(1001,)]	# same normalized SQL
+	assert storage.unique_members_per_client() == storage.unique_members_per_client()
+	assert storage.query_cache.stats()["hits"] == 2
+
+	# another client's write keeps client_001's entry, the cross-client rollup is re-read
+	storage.insert_members("client_002", [_member("2002", client_id="client_002")])
+	assert storage.query(by_client, ("client_001",), client_id="client_001") == [(1001,)]
+	assert storage.unique_members_per_client() == [("client_001", 1), ("client_002", 2)]
+	assert storage.query_cache.stats()["hits"] == 3
+
+	# delta with nothing changed doesn't bump the version
+	storage.insert_members("client_001", [_member("1001")], delta=True)
+	storage.query(by_client, ("client_001",), client_id="client_001")
+	assert storage.query_cache.stats()["hits"] == 4
+
+	# a write from another connection (another process in production) is seen through PRAGMA data_version
+	writer = DataSQLiteStorage(db_path=tmp_path / "members.db")
+	writer.insert_members("client_001", [_member("1002")])
+	assert storage.query(by_client, ("client_001",), client_id="client_001") == [(1001,), (1002,)]
+	assert storage.query(MEMBERS_BY_ZIP5_QUERY, ("94105",)) == storage.query(MEMBERS_BY_ZIP5_QUERY, ("94105",))
+
+
+def test_query_cache_keeps_scoped_and_unscoped_entries_apart(tmp_path):
+	storage = DataSQLiteStorage(db_path=tmp_path / "members.db", query_cache_size=8)
+	storage.insert_members("client_001", [_member("1001")])
+	storage.insert_members("client_002", [_member("2001", client_id="client_002")])
+	count = "SELECT COUNT(*) FROM members WHERE client_id = ?"
+
+	# stored at the sum of all versions (2), which is client_001's version after the next write
+	assert storage.query(count, ("client_001",)) == [(1,)]
+	storage.insert_members("client_001", [_member("1002")])
+
+	assert storage.query(count, ("client_001",), client_id="client_001") == [(2,)]
+	assert storage.query(count, ("client_001",)) == [(2,)]
+	assert storage.query_cache.stats()["hits"] == 0
+
+
+def test_query_cache_keeps_whitespace_inside_literals(tmp_path):
+	storage = DataSQLiteStorage(db_path=tmp_path / "members.db", query_cache_size=8)
+
+	assert storage.query("SELECT 'a  b'") == [("a  b",)]
+	assert storage.query("SELECT 'a b'") == [("a b",)]
+	assert storage.query("SELECT   'a  b' ;") == [("a  b",)]
+	assert storage.query_cache.stats()["hits"] == 1
+
+
+def test_query_cache_lru_eviction():
+	from src.storage.query_cache import QueryResultCache
+
+	cache = QueryResultCache(max_entries=2)
+	for name in ("a", "b"):
+		cache.put(cache.key(f"SELECT {name}"), 1, name)
+	assert cache.get(cache.key("SELECT a"), 1) == "a"		# a is now the most recent
+	cache.put(cache.key("SELECT c"), 1, "c")
+
+	assert cache.get(cache.key("SELECT b"), 1) is None
+	assert cache.get(cache.key("  SELECT   a ; "), 1) == "a"
+	assert cache.get(cache.key("SELECT c"), 2) is None		# stale version drops the entry
+	assert cache.stats() == {"entries": 1, "max_entries": 2, "hits": 2, "misses": 2, "evictions": 1}
+
+
+def test_members_history_point_in_time_and_diff(tmp_path):
+	storage = DataSQLiteStorage(db_path=tmp_path / "members.db")
+	storage.insert_members("client_001", [_member("1001"), _member("1002")], valid_from="2025-01-01")
+	storage.insert_members("client_001", [_member("1002", zip5="94107"), _member("1003")], valid_from="2025-02-01")
+	storage.insert_members("client_001", [_member("1001")], delta=True, valid_from="2025-03-01")	# unchanged, no version
+
+	def roster(as_of):
+		return [(m["member_id"], m["zip5"]) for m in storage.members_as_of("client_001", as_of)]
+
+	assert roster("2024-12-31") == []
+	assert roster("2025-01-15") == [(1001, "94105"), (1002, "94105")]
+	assert roster("2025-03-15") == [(1001, "94105"), (1002, "94107"), (1003, "94105")]
+	assert [m["valid_to"] for m in storage.member_history("client_001", 1002)] == ["2025-02-01 00:00:00.000000", None]
+	assert len(storage.member_history("client_001", 1001)) == 1
+
+	diff = storage.history_diff("client_001", "2025-01-15", "2025-03-15")
+	assert [m["member_id"] for m in diff["added"]] == [1003]
+	assert diff["removed"] == []
+	assert [(c["member_id"], c["fields"], c["before"]["zip5"], c["after"]["zip5"]) for c in diff["changed"]] == [(1002, ["zip5"], "94105", "94107")]
+	assert storage.history_diff("client_001", "2025-02-15", "2025-03-15") == {"added": [], "removed": [], "changed": []}
+
+
+def test_members_history_compaction_keeps_point_in_time_from_cutoff(tmp_path):
+	storage = DataSQLiteStorage(db_path=tmp_path / "members.db")
+	for month, zip5 in (("01", "94105"), ("02", "94107"), ("03", "94109")):
+		storage.insert_members("client_001", [_member("1001", zip5=zip5)], valid_from=f"2025-{month}-01")
+	storage.insert_members("client_002", [_member("2001", client_id="client_002")], valid_from="2025-01-01")
+	storage.insert_members("client_002", [_member("2001", zip5="94107", client_id="client_002")], valid_from="2025-02-01")
+
+	assert storage.compact_history("client_001", before="2025-02-15") == 1
+	assert [m["zip5"] for m in storage.members_as_of("client_001", "2025-02-15")] == ["94107"]
+	assert len(storage.member_history("client_002", 2001)) == 2
+	with pytest.raises(ValueError):
+		storage.compact_history()
+
+	# retention on ingest - everything before now minus 0 days that already ended goes
+	retained = DataSQLiteStorage(db_path=tmp_path / "members.db", history_retention_days=0)
+	retained.insert_members("client_002", [_member("2001", zip5="94109", client_id="client_002")])
+	assert [m["zip5"] for m in retained.member_history("client_002", 2001)] == ["94109"]
+	assert len(retained.member_history("client_001", 1001)) == 2
+
+
+def test_members_history_backfilled_by_migration(tmp_path):
+	db_path = tmp_path / "members.db"
+	storage = DataSQLiteStorage(db_path=db_path)
+	storage.insert_members("client_001", [_member("1001"), _member("1002")])
+	conn = storage._db_connection()
+	conn.execute("DROP TABLE members_history")
+	conn.execute("PRAGMA user_version = 3")
+	conn.commit()
+	conn.close()
+	storage.close()
+
+	reopened = DataSQLiteStorage(db_path=db_path)
+
+	assert [m["member_id"] for m in reopened.members_as_of("client_001", datetime.now(timezone.utc))] == [1001, 1002]
+	# ingestion_time is CURRENT_TIMESTAMP, the backfilled valid_from gets the microseconds of history_timestamp
+	valid_from = reopened.member_history("client_001", 1001)[0]["valid_from"]
+	assert valid_from == history_timestamp(valid_from)
+	assert valid_from.endswith(".000000")
+
+
+def test_members_history_rejects_backdated_valid_from(tmp_path):
+	storage = DataSQLiteStorage(db_path=tmp_path / "members.db")
+	storage.insert_members("client_001", [_member("1001")], valid_from="2025-02-01")
+
+	with pytest.raises(ValueError):
+		storage.insert_members("client_001", [_member("1001", zip5="94107"), _member("1002")], valid_from="2025-01-01")
+
+	assert [(m["zip5"], m["valid_to"]) for m in storage.member_history("client_001", 1001)] == [("94105", None)]
+	assert storage.member_history("client_001", 1002) == []
+	assert storage.query("SELECT zip5 FROM members") == [("94105",)]
+
 
 def test_database_initialization():
 	test_db_path = "test_radiantgraphdemo_database.db"
@@ -15,4 +411,4 @@ def test_database_initialization():
 		print("Database file not created")
 		return False
 
-test_database_initialization()
\ No newline at end of file
+test_database_initialization()
@@ -1,10 +1,10 @@
 """
 Test for ingest_s3_simulation.py
 """
-import os
-import sys
-import json
 from pathlib import Path
+
+import pytest
+
 from src.ingestion.ingest_s3_simulation import IngestionS3Simulator
 
 
@@ -22,6 +22,145 @@ def test_ingest_s3_simulation():
 	print("Upload success")
 
 	simulator.delete_file("test_client", "251001_180439_test_member_data.csv")
-	
+
+
+def test_upload_file_single_pass_checksums(tmp_path):
+	import hashlib
+
+	source = tmp_path / "members.csv"
+	# larger than one copy block, not a multiple of it
+	payload = b"member_id,first_name,last_name\n" + b"123,John,Doe\n" * 200000
+	source.write_bytes(payload)
+	simulator = IngestionS3Simulator(raw_path=tmp_path / "raw", checksum_algorithms=("blake2b",))
+
+	metadata = simulator.upload_file("test_client", str(source))
+
+	assert Path(metadata["local_path"]).read_bytes() == payload
+	assert metadata["file_size"] == len(payload)
+	assert metadata["checksum"] == hashlib.md5(payload).hexdigest()
+	assert metadata["checksums"] == {
+		"md5": hashlib.md5(payload).hexdigest(),
+		"blake2b": hashlib.blake2b(payload).hexdigest()
+	}
+	assert metadata["checksum"] == simulator.get_metadata("test_client", Path(metadata["local_path"]).name)["checksum"]
+
+
+def test_upload_content_checksums_match_file_upload(tmp_path):
+	source = tmp_path / "members.csv"
+	source.write_bytes(b"member_id\n1\n")
+	simulator = IngestionS3Simulator(raw_path=tmp_path / "raw", checksum_algorithms=("sha256",))
+
+	from_file = simulator.upload_file("test_client", str(source))
+	from_content = simulator.upload_file("test_client", "members_copy.csv", content=source.read_bytes())
+
+	assert from_file["checksums"] == from_content["checksums"]
+
+
+def test_compressed_object_served_from_sidecar(tmp_path):
+	from src.ingestion.csv_reader import MemberCSVReader
+
+	source = tmp_path / "members.csv"
+	payload = b"member_id,first_name,last_name\n" + b"0123,John,Doe\n" * 1000
+	source.write_bytes(payload)
+	simulator = IngestionS3Simulator(raw_path=tmp_path / "raw", compression="gzip")
+	metadata = simulator.upload_file("test_client", str(source))
+	name = Path(metadata["local_path"]).name
+
+	sidecar = simulator.compress_object("test_client", name)
+
+	assert not Path(metadata["local_path"]).exists()
+	assert sidecar["local_path"].endswith(".csv.gz") and sidecar["stored_size"] < len(payload)
+	with simulator.open_object("test_client", name) as f:
+		assert f.read() == payload
+	df = MemberCSVReader(columns=None).read(sidecar["local_path"])
+	assert len(df) == 1000 and df["member_id"][0] == "0123"
+
+	# size and checksum come from the sidecar - the object isn't read again
+	Path(sidecar["local_path"]).write_bytes(b"overwritten")
+	found = simulator.get_metadata("test_client", name)
+	assert (found["file_size"], found["checksum"], found["compression"]) == (len(payload), metadata["checksum"], "gzip")
+	assert simulator.get_metadata("test_client", name + ".gz")["checksum"] == metadata["checksum"]
+
+	assert simulator.delete_file("test_client", name)
+	assert simulator.get_metadata("test_client", name) is None
+	assert simulator.list_objects("test_client") == []
+
+
+def test_retention_archives_then_deletes(tmp_path):
+	from datetime import datetime, timedelta
+
+	source = tmp_path / "members.csv"
+	source.write_bytes(b"member_id\n1\n")
+	simulator = IngestionS3Simulator(raw_path=tmp_path / "raw")
+	first = simulator.upload_file("test_client", str(source))
+	second = simulator.upload_file("test_client", "members_2.csv", content=b"member_id\n2\n")
+	# an object from before sidecars existed gets one the first time it is looked at
+	legacy = tmp_path / "raw" / "test_client" / "old_members.csv"
+	legacy.write_bytes(b"member_id\n3\n")
+	assert simulator.get_metadata("test_client", legacy.name)["file_size"] == len(b"member_id\n3\n")
+
+	later = datetime.now() + timedelta(days=40)
+	assert sorted(simulator.apply_retention(archive_after_days=30, now=later)["archived"]) == sorted(
+		[Path(first["local_path"]).name, Path(second["local_path"]).name, legacy.name])
+	archived = simulator.get_metadata("test_client", Path(second["local_path"]).name)
+	assert archived["tier"] == "archive" and archived["local_path"].startswith(str(tmp_path / "archive"))
+	with simulator.open_object("test_client", Path(second["local_path"]).name) as f:
+		assert f.read() == b"member_id\n2\n"
+
+	assert simulator.apply_retention(archive_after_days=30, delete_after_days=365, now=later) == {"archived": [], "deleted": []}
+	assert len(simulator.apply_retention(delete_after_days=365, now=later + timedelta(days=365))["deleted"]) == 3
+	assert list((tmp_path / "archive" / "test_client").iterdir()) == []
+
+
+def test_same_second_uploads_get_distinct_objects(tmp_path):
+	source = tmp_path / "members.csv"
+	source.write_bytes(b"member_id\n1\n")
+	simulator = IngestionS3Simulator(raw_path=tmp_path / "raw")
+
+	first = simulator.upload_file("test_client", str(source))
+	second = simulator.upload_file("test_client", "members.csv", content=b"member_id\n2\n")
+
+	assert first["local_path"] != second["local_path"]
+	assert Path(first["local_path"]).read_bytes() == b"member_id\n1\n"
+	assert simulator.get_metadata("test_client", Path(first["local_path"]).name)["checksum"] == first["checksum"]
+	assert simulator.get_metadata("test_client", Path(second["local_path"]).name)["checksum"] == second["checksum"]
+
+
+def test_retention_skips_objects_removed_concurrently(tmp_path):
+	from datetime import datetime, timedelta
+
+	simulator = IngestionS3Simulator(raw_path=tmp_path / "raw")
+	for number in (1, 2):
+		simulator.upload_file("test_client", f"members_{number}.csv", content=f"member_id\n{number}\n".encode())
+	listed = simulator.list_objects("test_client")
+	# another process deletes both objects after this run listed the index
+	for sidecar in listed:
+		simulator.delete_file("test_client", sidecar["object"])
+	simulator.list_objects = lambda client_id=None: [dict(sidecar) for sidecar in listed]
+
+	later = datetime.now() + timedelta(days=40)
+	assert simulator.apply_retention(archive_after_days=30, now=later) == {"archived": [], "deleted": []}
+	assert len(simulator.apply_retention(delete_after_days=30, now=later)["deleted"]) == 2
+
+
+def test_upload_checks_the_dedup_checksum_against_the_copy(tmp_path):
+	import hashlib
+
+	source = tmp_path / "members.csv"
+	source.write_bytes(b"member_id\n1\n")
+	simulator = IngestionS3Simulator(raw_path=tmp_path / "raw", checksum_algorithms=("sha256",))
+	md5 = simulator.file_checksum(source)
+
+	metadata = simulator.upload_file("test_client", str(source), expected_checksums={"md5": md5})
+	assert metadata["checksums"] == {"md5": md5, "sha256": hashlib.sha256(b"member_id\n1\n").hexdigest()}
+
+	# changed after the dedup hash - nothing is stored under the stale checksum
+	source.write_bytes(b"member_id\n2\n")
+	with pytest.raises(ValueError):
+		simulator.upload_file("test_client", str(source), expected_checksums={"md5": md5})
+	assert [o["checksum"] for o in simulator.list_objects("test_client")] == [md5]
+	assert len(list((tmp_path / "raw" / "test_client").iterdir())) == 1
+
+
 if __name__ == "__main__":
-	test_ingest_s3_simulation()
\ No newline at end of file
+	test_ingest_s3_simulation()
@@ -0,0 +1,304 @@
+"""
+Test for main.py pipeline
+"""
+import gzip
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from src.main import RadiantGrapgDemoDataPipeline, load_manifest, run_batch
+from src.validation.rejects_writer import read_rejects
+from src.ingestion.csv_reader import MemberCSVReader
+
+SAMPLE_FILE = Path(__file__).parent.parent / "sample_inputs" / "sample_data.csv"
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+	# pipeline writes to relative data/ paths
+	monkeypatch.chdir(tmp_path)
+	return tmp_path
+
+
+def _members(db_path="data/radiantgraphdemo.db"):
+	conn = sqlite3.connect(db_path)
+	try:
+		return conn.execute("SELECT member_id, client_id, zip5, phone FROM members ORDER BY member_id").fetchall()
+	finally:
+		conn.close()
+
+
+def test_whole_file_counts(workdir):
+	pipeline = RadiantGrapgDemoDataPipeline()
+
+	result = pipeline.data_process("client_001", str(SAMPLE_FILE))
+
+	assert result["valid_row_count"] == 14
+	assert result["rejected_row_count"] == 6
+	assert len(_members()) == 14
+
+
+@pytest.mark.parametrize("validation_mode", ["row", "vectorized"])
+def test_streaming_matches_whole_file(workdir, validation_mode):
+	whole = RadiantGrapgDemoDataPipeline(validation_mode=validation_mode)
+	whole_result = whole.data_process("client_001", str(SAMPLE_FILE))
+	whole_members = _members()
+
+	streaming = RadiantGrapgDemoDataPipeline(validation_mode=validation_mode, chunk_size=3)
+	streaming_result = streaming.data_process("client_002", str(SAMPLE_FILE))
+
+	assert streaming_result["valid_row_count"] == whole_result["valid_row_count"]
+	assert streaming_result["rejected_row_count"] == whole_result["rejected_row_count"]
+	client_002 = [(m, z, p) for m, c, z, p in _members() if c == "client_002"]
+	assert client_002 == [(m, z, p) for m, c, z, p in whole_members]
+
+	rejected_files = list(Path("data/rejected/client_002").glob("*.jsonl.gz"))
+	assert [str(f) for f in rejected_files] == [streaming_result["rejects_file"]]
+	assert len(read_rejects(rejected_files[0])) == streaming_result["rejected_row_count"]
+
+
+@pytest.mark.parametrize("string_dtypes", [True, False])
+def test_streaming_dtypes_follow_whole_file(workdir, string_dtypes):
+	"""With inferred dtypes zip5 is int64 in the first chunk, float64 in the second and object overall"""
+	data_file = workdir / "mixed.csv"
+	data_file.write_text(
+		"member_id,first_name,last_name,dob,gender,phone,email,zip5,plan_id\n"
+		"1,A,B,1980-01-01,M,5551234567,a@example.com,94105,P\n"
+		"2,A,B,1980-01-01,M,5551234567,a@example.com,94107,P\n"
+		"3,A,B,1980-01-01,M,5551234567,a@example.com,94108,P\n"
+		"4,A,B,1980-01-01,M,5551234567,a@example.com,,P\n"
+		"5,A,B,1980-01-01,M,5551234567,a@example.com,9410A,P\n"
+	)
+
+	reader = MemberCSVReader(string_dtypes=string_dtypes)
+	whole = RadiantGrapgDemoDataPipeline(csv_reader=reader).data_process("client_001", str(data_file))
+	streaming = RadiantGrapgDemoDataPipeline(chunk_size=2, csv_reader=reader).data_process("client_002", str(data_file))
+
+	assert (streaming["valid_row_count"], streaming["rejected_row_count"]) == (whole["valid_row_count"], whole["rejected_row_count"])
+	assert (whole["valid_row_count"], whole["rejected_row_count"]) == (3, 2)
+
+
+def test_load_manifest_from_directory_and_csv(workdir):
+	for client_id in ("client_b", "client_a"):
+		(workdir / "drop" / client_id).mkdir(parents=True)
+		(workdir / "drop" / client_id / "members.csv").write_text(SAMPLE_FILE.read_text())
+	(workdir / "manifest.csv").write_text(f"client_id,file_path\nclient_x,{SAMPLE_FILE}\n")
+
+	assert [c for c, _ in load_manifest(workdir / "drop")] == ["client_a", "client_b"]
+	assert load_manifest(workdir / "manifest.csv") == [("client_x", str(SAMPLE_FILE))]
+
+
+def test_run_batch_parallel_summary(workdir):
+	manifest = [("client_001", SAMPLE_FILE), ("client_002", SAMPLE_FILE), ("client_003", workdir / "missing.csv")]
+
+	summary = run_batch(manifest, max_workers=2)
+
+	assert summary["file_count"] == 3
+	assert summary["failed_count"] == 1
+	assert [r["client_id"] for r in summary["files"]] == ["client_001", "client_002", "client_003"]
+	assert summary["files"][2]["status"] == "failed"
+	assert summary["valid_row_count"] == 28
+	assert summary["rejected_row_count"] == 12
+	assert len(_members()) == 28
+
+
+def test_identical_file_is_skipped(workdir):
+	pipeline = RadiantGrapgDemoDataPipeline()
+
+	first = pipeline.data_process("client_001", str(SAMPLE_FILE))
+	second = pipeline.data_process("client_001", str(SAMPLE_FILE))
+
+	assert second["status"] == "skipped_duplicate"
+	assert second["checksum"] == first["checksum"]
+	assert second["valid_row_count"] == first["valid_row_count"]
+	assert Path(second["skip_audit_log"]).exists()
+	# no second copy in the raw store and no second audit_log row
+	assert len(list(Path("data/raw/client_001").iterdir())) == 1
+	conn = sqlite3.connect("data/radiantgraphdemo.db")
+	assert conn.execute("SELECT COUNT(*) FROM audit_log").fetchone()[0] == 1
+	conn.close()
+
+
+@pytest.mark.parametrize("chunk_size", [None, 5])
+def test_failed_file_is_not_recorded_as_processed(workdir, chunk_size):
+	broken = workdir / "broken.csv.gz"
+	broken.write_bytes(SAMPLE_FILE.read_bytes())	# not gzip, fails while parsing
+	pipeline = RadiantGrapgDemoDataPipeline(chunk_size=chunk_size)
+
+	for _ in range(2):	# the resend is processed (and fails) again, not skipped
+		with pytest.raises(Exception):
+			pipeline.data_process("client_001", str(broken))
+
+	assert list(Path("data/rejected").rglob("*.gz*")) == []
+	summary = run_batch([("client_001", broken)], max_workers=1)
+	assert (summary["failed_count"], summary["files"][0]["status"]) == (1, "failed")
+
+
+@pytest.mark.parametrize("validation_mode", ["row", "vectorized"])
+def test_all_dash_zip_rejects_only_that_row(workdir, validation_mode):
+	lines = SAMPLE_FILE.read_text().splitlines()
+	header = lines[0].split(",")
+	row = lines[1].split(",")
+	row[header.index("zip5")] = "-"
+	data_file = workdir / "dash_zip.csv"
+	data_file.write_text("\n".join([lines[0], ",".join(row), lines[1]]) + "\n")
+
+	result = RadiantGrapgDemoDataPipeline(validation_mode=validation_mode).data_process("client_001", str(data_file))
+
+	assert (result["valid_row_count"], result["rejected_row_count"]) == (1, 1)
+
+
+def test_deduplicate_disabled_reprocesses(workdir):
+	RadiantGrapgDemoDataPipeline().data_process("client_001", str(SAMPLE_FILE))
+
+	result = RadiantGrapgDemoDataPipeline(deduplicate=False).data_process("client_001", str(SAMPLE_FILE))
+
+	assert result["status"] == "success"
+	assert result["updated_row_count"] == 14
+
+
+def test_run_batch_skips_already_processed(workdir):
+	run_batch([("client_001", SAMPLE_FILE)], max_workers=1)
+
+	summary = run_batch([("client_001", SAMPLE_FILE), ("client_002", SAMPLE_FILE)], max_workers=1)
+
+	assert summary["skipped_count"] == 1
+	assert [r["status"] for r in summary["files"]] == ["skipped_duplicate", "success"]
+
+
+def test_delta_mode_reports_changes(workdir):
+	RadiantGrapgDemoDataPipeline().data_process("client_001", str(SAMPLE_FILE))
+	lines = SAMPLE_FILE.read_text().splitlines()
+	# change member 1001's plan, drop member 1020
+	lines[1] = lines[1].replace("PLAN_A", "PLAN_Z")
+	changed_file = workdir / "changed.csv"
+	changed_file.write_text("\n".join(lines[:-1]) + "\n")
+
+	result = RadiantGrapgDemoDataPipeline(delta=True, report_missing=True).data_process("client_001", str(changed_file))
+
+	assert result["delta"] == {"new": 0, "changed": 1, "unchanged": 12, "missing": 1}
+	assert json.loads(Path(result["audit_log"]).read_text())["delta"] == result["delta"]
+
+
+@pytest.mark.parametrize("chunk_size", [None, 5])
+def test_parquet_serving_layer_receives_valid_records(workdir, chunk_size):
+	pytest.importorskip("pyarrow")
+	from src.storage.parquet_storage import DataParquetStorage
+
+	result = RadiantGrapgDemoDataPipeline(parquet_root="data/parquet/members", chunk_size=chunk_size).data_process("client_001", str(SAMPLE_FILE))
+
+	storage = DataParquetStorage("data/parquet/members")
+	assert storage.unique_members_per_client() == [("client_001", 14)]
+	# rows carry the file's ingestion time from the audit record, not the write time
+	audited = json.loads(Path(result["audit_log"]).read_text())["ingestion_time"]
+	ingestion_times = set(storage.read_members(columns=["ingestion_time"]).column("ingestion_time").to_pylist())
+	assert [time.isoformat() for time in ingestion_times] == [audited]
+
+
+def test_streamed_parquet_latest_matches_sqlite(workdir):
+	pytest.importorskip("pyarrow")
+	from src.storage.parquet_storage import DataParquetStorage
+
+	# 10 members re-sent across chunks of 3 rows with a different plan each time
+	rows = [f"{1001 + i % 10},John,Doe,1980-05-15,M,555-123-4567,john.doe@email.com,94105,PLAN_{i}" for i in range(60)]
+	path = workdir / "members.csv"
+	path.write_text("member_id,first_name,last_name,dob,gender,phone,email,zip5,plan_id\n" + "\n".join(rows) + "\n")
+
+	RadiantGrapgDemoDataPipeline(parquet_root="data/parquet/members", chunk_size=3).data_process("client_001", str(path))
+
+	conn = sqlite3.connect("data/radiantgraphdemo.db")
+	try:
+		stored = conn.execute("SELECT CAST(member_id AS TEXT), plan_id FROM members ORDER BY member_id").fetchall()
+	finally:
+		conn.close()
+	latest = DataParquetStorage("data/parquet/members").read_members(columns=["member_id", "plan_id"]).to_pylist()
+	assert sorted((row["member_id"], row["plan_id"]) for row in latest) == stored
+	assert stored[0] == ("1001", "PLAN_50")
+
+
+def test_rejects_are_structured_and_summarized(workdir):
+	result = RadiantGrapgDemoDataPipeline().data_process("client_001", str(SAMPLE_FILE))
+
+	rejects = read_rejects(result["rejects_file"])
+	assert len(rejects) == result["rejected_row_count"]
+	# original columns are kept, errors carry field and code
+	assert set(rejects[0]["row"]) == set(SAMPLE_FILE.read_text().splitlines()[0].split(","))
+	assert all({"field", "code", "message"} <= set(e) for r in rejects for e in r["errors"])
+	# one code per validation rule, nothing falls back to a generic code
+	codes = {e["code"] for r in rejects for e in r["errors"]}
+	assert codes and codes <= {"required", "dob_format", "dob_type", "gender_value", "phone_length", "zip5_format", "email_format"}
+
+	summary = json.loads(Path(result["rejects_file"].replace(".jsonl.gz", ".summary.json")).read_text())
+	expected = {}
+	for r in rejects:
+		for e in r["errors"]:
+			expected[(e["field"], e["code"])] = expected.get((e["field"], e["code"]), 0) + 1
+	assert {(f, c): n for f, codes in summary["error_counts"].items() for c, n in codes.items()} == expected
+
+	conn = sqlite3.connect("data/radiantgraphdemo.db")
+	stored = conn.execute("SELECT field, code, row_count FROM client_reject_reasons WHERE client_id = 'client_001'").fetchall()
+	conn.close()
+	assert {(f, c): n for f, c, n in stored} == expected
+
+
+@pytest.mark.parametrize("chunk_size", [None, 5])
+def test_stage_metrics_are_recorded(workdir, chunk_size):
+	result = RadiantGrapgDemoDataPipeline(chunk_size=chunk_size, prometheus=True).data_process("client_001", str(SAMPLE_FILE))
+
+	stages = result["metrics"]["stages"]
+	assert {"checksum", "ingest", "parse", "validate", "rejects", "db_upsert", "audit"} <= set(stages)
+	assert stages["validate"]["rows"] == 20
+	assert stages["db_upsert"]["rows"] == 14
+	assert stages["ingest"]["bytes"] == SAMPLE_FILE.stat().st_size
+
+	# audit record has every stage before the audit write
+	audited = json.loads(Path(result["audit_log"]).read_text())["metrics"]
+	assert set(audited["stages"]) == set(stages) - {"audit"}
+
+	exported = [json.loads(line) for line in Path("data/metrics/pipeline_metrics.jsonl").read_text().splitlines()]
+	assert [m["stages"]["validate"]["rows"] for m in exported] == [20]
+	assert f'radiantgraph_pipeline_stage_rows_total{{pipeline_instance="{os.getpid()}",stage="validate"}} 20' in Path(f"data/metrics/pipeline_metrics-{os.getpid()}.prom").read_text()
+
+
+def test_compressed_client_file(workdir):
+	compressed = workdir / "sample_data.csv.gz"
+	with gzip.open(compressed, "wt") as f:
+		f.write(SAMPLE_FILE.read_text())
+
+	result = RadiantGrapgDemoDataPipeline().data_process("client_001", str(compressed))
+
+	assert (result["valid_row_count"], result["rejected_row_count"]) == (14, 6)
+
+
+@pytest.mark.parametrize("chunk_size", [None, 5])
+def test_raw_copy_compressed_after_parse(workdir, chunk_size):
+	result = RadiantGrapgDemoDataPipeline(chunk_size=chunk_size, raw_compression="gzip").data_process("client_001", str(SAMPLE_FILE))
+
+	assert (result["valid_row_count"], result["rejected_row_count"]) == (14, 6)
+	assert "compress" in result["metrics"]["stages"]
+	raw_objects = list(Path("data/raw/client_001").glob("*_sample_data.csv*"))
+	assert [path.suffix for path in raw_objects] == [".gz"]
+	assert gzip.decompress(raw_objects[0].read_bytes()) == SAMPLE_FILE.read_bytes()
+
+
+@pytest.mark.parametrize("validation_mode", ["row", "vectorized"])
+def test_parallel_validation_matches_serial(workdir, validation_mode):
+	# sample rows repeated, so every range has valid and rejected rows
+	lines = SAMPLE_FILE.read_text().splitlines()
+	large = workdir / "large.csv"
+	large.write_text(lines[0] + "\n" + "".join(line + "\n" for line in lines[1:]) * 10)
+
+	serial = RadiantGrapgDemoDataPipeline(validation_mode=validation_mode)
+	parallel = RadiantGrapgDemoDataPipeline(validation_mode=validation_mode, validation_workers=3, parallel_min_bytes=0)
+	assert parallel._validates_in_parallel(str(large))
+
+	serial_metadata, serial_valid, serial_rejected = serial.ingest_and_validate("client_001", str(large))
+	parallel_metadata, parallel_valid, parallel_rejected = parallel.ingest_and_validate("client_001", str(large))
+
+	assert (parallel_rejected, len(parallel_valid)) == (serial_rejected, len(serial_valid)) == (60, 140)
+	assert parallel_valid == serial_valid
+	assert read_rejects(parallel_metadata["rejects"]["rejects_file"]) == read_rejects(serial_metadata["rejects"]["rejects_file"])
+	assert parallel_metadata["metrics"].to_dict()["stages"]["validate"]["rows"] == 200
@@ -0,0 +1,65 @@
+"""
+Test for mapped_file.py
+"""
+import hashlib
+
+import pytest
+
+from src.ingestion.mapped_file import MappedRawFile
+from src.ingestion.csv_reader import MemberCSVReader
+
+HEADER = b"member_id,first_name,last_name\n"
+
+
+def test_checksums_match_hashlib(tmp_path):
+	payload = HEADER + b"123,John,Doe\n" * 100000
+	path = tmp_path / "members.csv"
+	path.write_bytes(payload)
+
+	with MappedRawFile(path) as mapped:
+		checksums = mapped.checksums({"md5": hashlib.md5(), "sha256": hashlib.sha256()})
+
+	assert checksums == {"md5": hashlib.md5(payload).hexdigest(), "sha256": hashlib.sha256(payload).hexdigest()}
+
+
+@pytest.mark.parametrize("payload, rows", [
+	(b"", 0),
+	(HEADER, 0),
+	(HEADER + b"1,a,b\n2,c,d\n", 2),
+	(HEADER + b"1,a,b\n2,c,d", 2),
+])
+def test_count_rows(tmp_path, payload, rows):
+	path = tmp_path / "members.csv"
+	path.write_bytes(payload)
+
+	with MappedRawFile(path) as mapped:
+		assert mapped.count_rows() == rows
+
+
+def test_split_is_newline_aligned_and_covers_every_row(tmp_path):
+	lines = [f"{i},first_{i},last_{'x' * (i % 7)}\n".encode() for i in range(1000)]
+	path = tmp_path / "members.csv"
+	path.write_bytes(HEADER + b"".join(lines))
+
+	with MappedRawFile(path) as mapped:
+		ranges = mapped.split(4)
+		chunks = [bytes(mapped.buffer[start:end]) for start, end in ranges]
+		assert len(ranges) == 4
+		assert ranges[0][0] == len(HEADER) and ranges[-1][1] == mapped.size
+		assert all(chunk.endswith(b"\n") for chunk in chunks)
+		assert b"".join(chunks).splitlines(keepends=True) == lines
+
+		# ranges aren't made smaller than min_bytes
+		assert len(mapped.split(4, min_bytes=mapped.size)) == 1
+
+
+def test_delimiter_sniffing(tmp_path):
+	path = tmp_path / "members.csv"
+	path.write_bytes(b"member_id;first_name;zip5\n0012;John;02134\n")
+
+	with MappedRawFile(path) as mapped:
+		assert mapped.delimiter() == ";"
+
+	df = MemberCSVReader().read(path)
+	assert df["member_id"].tolist() == ["0012"]
+	assert df["zip5"].tolist() == ["02134"]
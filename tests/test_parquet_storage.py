@@ -0,0 +1,73 @@
+"""
+Test for parquet_storage.py
+"""
+from datetime import datetime, date
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from src.storage.parquet_storage import DataParquetStorage
+
+
+def _member(member_id, zip5="94105"):
+	return {
+		"member_id": member_id,
+		"first_name": "John",
+		"last_name": "Doe",
+		"dob": date(1980, 5, 15),
+		"gender": "M",
+		"phone": "555-123-4567",
+		"email": None,
+		"zip5": zip5,
+		"plan_id": "PLAN_A",
+		"client_id": "unused"
+	}
+
+
+def test_partitioned_write_and_latest_read(tmp_path):
+	storage = DataParquetStorage(root=tmp_path / "members")
+
+	storage.insert_members("client_001", [_member("1001"), _member("1002")], ingestion_time=datetime(2025, 3, 1, 9))
+	storage.insert_members("client_001", [_member("1002", zip5="94107")], ingestion_time=datetime(2025, 3, 2, 9))
+	storage.insert_members("client_002", [_member("1001", zip5="94110")], ingestion_time=datetime(2025, 3, 2, 9))
+
+	assert (tmp_path / "members" / "client_id=client_001" / "ingestion_date=2025-03-01").is_dir()
+	assert storage.unique_members_per_client() == [("client_001", 2), ("client_002", 1)]
+	assert storage.top_zip5() == [("94105", 1), ("94107", 1), ("94110", 1)]
+
+	# partition pruning - only client_001 directories are read
+	client_001 = storage.read_members(columns=["member_id", "zip5"], filter=storage.partition_filter(client_id="client_001"))
+	assert sorted(client_001.to_pylist(), key=lambda r: r["member_id"]) == [
+		{"member_id": "1001", "zip5": "94105"},
+		{"member_id": "1002", "zip5": "94107"}
+	]
+	march_1 = storage.read_members(columns=["member_id"], filter=storage.partition_filter(until="2025-03-01"))
+	assert sorted(march_1.column("member_id").to_pylist()) == ["1001", "1002"]
+
+
+def test_compaction_merges_small_files(tmp_path):
+	storage = DataParquetStorage(root=tmp_path / "members")
+	for hour, zip5 in ((9, "94105"), (10, "94107"), (11, "94110")):
+		storage.insert_members("client_001", [_member("1001", zip5=zip5)], ingestion_time=datetime(2025, 3, 1, hour))
+	partition = tmp_path / "members" / "client_id=client_001" / "ingestion_date=2025-03-01"
+
+	result = storage.compact()
+
+	assert result == {"partitions": 1, "files_removed": 3}
+	assert len(list(partition.glob("*.parquet"))) == 1
+	assert storage.read_members(columns=["member_id", "zip5"], latest_only=False).to_pylist() == [
+		{"member_id": "1001", "zip5": "94110"}
+	]
+
+
+def test_latest_row_follows_write_order_within_one_ingestion_time(tmp_path):
+	storage = DataParquetStorage(root=tmp_path / "members")
+	ingestion_time = datetime(2025, 3, 1, 9)
+	# chunks of one streamed file, each later chunk re-sends 1001
+	for zip5 in ("94105", "94107", "94110", "94111", "94112"):
+		storage.insert_members("client_001", [_member("1001", zip5=zip5)], ingestion_time=ingestion_time)
+
+	assert storage.read_members(columns=["zip5"]).column("zip5").to_pylist() == ["94112"]
+	storage.compact()
+	assert storage.read_members(columns=["zip5"], latest_only=False).column("zip5").to_pylist() == ["94112"]
@@ -0,0 +1,45 @@
+"""
+Test for rejects_writer.py
+"""
+import numpy as np
+
+from src.validation.rejects_writer import RejectsWriter, error_code, read_rejects
+
+
+def test_error_codes():
+	assert error_code("member_id is required")["field"] == "member_id"
+	assert error_code("member_id is required")["code"] == "required"
+	assert error_code("zip5: Value error, Invalid zip code: must have 5 digits")["field"] == "zip5"
+	assert error_code("zip5: Value error, Invalid zip code: must have 5 digits")["code"] == "zip5_format"
+	assert error_code("phone: Value error, Invalid phone number: must have 10 digits")["code"] == "phone_length"
+	assert error_code("dob: Value error, Invalid DOB format, expected YYYY-MM-DD")["code"] == "dob_format"
+	assert error_code("gender: Value error, Invalid gender, must be M/F/O")["code"] == "gender_value"
+	assert error_code("email: value is not a valid email address: An email address must have an @-sign.")["code"] == "email_format"
+	assert error_code("plan_id: Input should be a valid string")["code"] == "plan_id_invalid"
+
+
+def test_batched_writes_and_summary(tmp_path):
+	records = [
+		{"raw_data": {"member_id": np.int64(i), "zip5": np.nan}, "errors": ["zip5: Value error, bad", "email: bad"], "row_index": i}
+		for i in range(5)
+	]
+
+	with RejectsWriter("client_001", "members.csv", root=tmp_path, batch_size=2) as writer:
+		writer.write(records[:3])
+		writer.write(records[3:])
+		# still under the temp name until closed
+		assert not writer.path.exists()
+
+	rows = read_rejects(writer.path)
+	assert [r["row_index"] for r in rows] == [0, 1, 2, 3, 4]
+	assert rows[1]["row"] == {"member_id": 1, "zip5": None}
+	assert writer.summary()["error_counts"] == {"zip5": {"zip5_invalid": 5}, "email": {"email_format": 5}}
+	assert writer.summary_path.exists()
+
+
+def test_no_rejects_no_file(tmp_path):
+	writer = RejectsWriter("client_001", "members.csv", root=tmp_path)
+	writer.write([])
+
+	assert writer.close()["rejects_file"] is None
+	assert not (tmp_path / "client_001").exists()
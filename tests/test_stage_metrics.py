@@ -0,0 +1,76 @@
+"""
+Test for stage_metrics.py
+"""
+import os
+import pickle
+
+from src.metrics.stage_metrics import StageMetrics, MetricsExporter, current_rss_bytes, peak_rss_bytes
+
+
+def test_stages_accumulate_and_rates():
+	metrics = StageMetrics("client_001", "members.csv")
+	with metrics.stage("validate", rows=10) as stage:
+		stage["bytes"] = 100
+	metrics.add("validate", 0.5, rows=10, bytes=100)
+	chunks = list(metrics.timed_iter("parse", [[1, 2], [3]]))
+
+	result = pickle.loads(pickle.dumps(metrics)).to_dict()
+
+	assert chunks == [[1, 2], [3]]
+	assert result["stages"]["validate"]["calls"] == 2
+	assert result["stages"]["validate"]["rows"] == 20
+	assert result["stages"]["validate"]["bytes"] == 200
+	assert result["stages"]["validate"]["rows_per_second"] > 0
+	assert result["stages"]["parse"]["rows"] == 3
+	assert result["total_seconds"] >= 0.5
+
+
+def test_exporter_totals_in_prometheus_text(tmp_path):
+	exporter = MetricsExporter(tmp_path, prometheus=True)
+	for _ in range(2):
+		metrics = StageMetrics("client_001", "members.csv")
+		metrics.add("db_upsert", 0.25, rows=1500000)
+		exporter.export(metrics.to_dict())
+
+	text = (tmp_path / f"pipeline_metrics-{os.getpid()}.prom").read_text()
+	assert f'radiantgraph_pipeline_files_total{{pipeline_instance="{os.getpid()}"}} 2' in text
+	assert f'radiantgraph_pipeline_stage_rows_total{{pipeline_instance="{os.getpid()}",stage="db_upsert"}} 3000000' in text
+	assert f'radiantgraph_pipeline_stage_seconds_total{{pipeline_instance="{os.getpid()}",stage="db_upsert"}} 0.5' in text
+	assert len((tmp_path / "pipeline_metrics.jsonl").read_text().splitlines()) == 2
+
+
+def test_stage_memory_is_measured_per_stage():
+	# enough to go past whatever earlier tests of this process peaked at
+	size = max(peak_rss_bytes() - current_rss_bytes(), 0) + 64 * 1024 * 1024
+	metrics = StageMetrics("client_001", "members.csv")
+	with metrics.stage("parse"):
+		buffer = bytearray(size)
+		buffer[::4096] = b"x" * len(buffer[::4096])
+	with metrics.stage("validate"):
+		pass
+	del buffer
+
+	result = metrics.to_dict()
+
+	parse, validate = result["stages"]["parse"], result["stages"]["validate"]
+	assert parse["rss_bytes"] >= size
+	assert parse["peak_rss_increase_bytes"] > 0
+	assert validate["peak_rss_increase_bytes"] == 0
+	assert result["process_peak_rss_bytes"] == max(parse["process_peak_rss_bytes"], validate["process_peak_rss_bytes"])
+
+
+def test_pid_prometheus_file_is_removed_and_instance_file_kept(tmp_path):
+	stale = tmp_path / "pipeline_metrics-999999999.prom"	# no such pid
+	stale.write_text("")
+	exporter = MetricsExporter(tmp_path, prometheus=True)
+	exporter.export(StageMetrics("client_001", "members.csv").to_dict())
+	service = MetricsExporter(tmp_path, prometheus=True, instance="watch")
+	service.export(StageMetrics("client_001", "members.csv").to_dict())
+
+	assert not stale.exists()
+	assert exporter.prometheus_file.exists()
+	exporter.close()
+	service.close()
+
+	assert [path.name for path in tmp_path.glob("*.prom")] == ["pipeline_metrics-watch.prom"]
+	assert 'radiantgraph_pipeline_files_total{pipeline_instance="watch"} 1' in service.prometheus_file.read_text()
@@ -1,5 +1,21 @@
 import pytest
-from validation.schema_validation import RawMemberSchema, MemberSchema
+import pandas as pd
+from pathlib import Path
+from validation.schema_validation import RawMemberSchema, MemberSchema, validate_dataframe
+
+SAMPLE_FILE = Path(__file__).parent.parent / "sample_inputs" / "sample_data.csv"
+
+
+def _row_by_row(df):
+    valid, rejected = [], []
+    for row in df.to_dict(orient="records"):
+        record = RawMemberSchema(row)
+        normalized = record.normalize()
+        if normalized is None:
+            rejected.append(record.errors)
+        else:
+            valid.append(normalized.model_dump())
+    return valid, rejected
 
 class TestValidation:
 
@@ -67,3 +83,81 @@ class TestValidation:
         assert len(record.errors) > 0
         # Should contain a last_name required error
         assert any("last_name" in e.lower() and "required" in e.lower() for e in record.errors)
+
+    def test_vectorized_matches_row_by_row_on_sample(self):
+        """Test validate_dataframe gives the same records and errors as normalize()"""
+        df = pd.read_csv(SAMPLE_FILE)
+        valid, rejected = _row_by_row(df)
+
+        valid_df, rejected_df = validate_dataframe(df)
+
+        assert valid_df.to_dict(orient="records") == valid
+        assert rejected_df["errors"].tolist() == rejected
+        assert len(valid_df) + len(rejected_df) == len(df)
+
+    def test_vectorized_matches_row_by_row_on_edge_cases(self):
+        """Test required-field short circuit, multiple errors and normalization"""
+        df = pd.DataFrame([
+            {'member_id': '1', 'first_name': 'a', 'last_name': 'b', 'dob': '1980-1-5', 'gender': 'o',
+             'phone': '(555)1234567', 'email': 'Foo@EXAMPLE.com', 'zip5': '941-05', 'plan_id': 'P'},
+            {'member_id': '', 'first_name': '', 'last_name': 'b', 'dob': 'bad', 'gender': 'q',
+             'phone': '1', 'email': 'a', 'zip5': '9', 'plan_id': 'P'},
+            {'member_id': '3', 'first_name': 'a', 'last_name': 'b', 'dob': 'bad', 'gender': 'q',
+             'phone': '1', 'email': 'a', 'zip5': '9410A', 'plan_id': 'P'},
+        ])
+        valid, rejected = _row_by_row(df)
+
+        valid_df, rejected_df = validate_dataframe(df)
+
+        assert valid_df.to_dict(orient="records") == valid
+        assert rejected_df["errors"].tolist() == rejected
+        # Rejected frame keeps the raw input values
+        assert rejected_df.iloc[0]["first_name"] == ''
+
+    def test_vectorized_empty_frame(self):
+        """Test empty input gives two empty frames"""
+        df = pd.read_csv(SAMPLE_FILE).head(0)
+
+        valid_df, rejected_df = validate_dataframe(df)
+
+        assert valid_df.empty
+        assert rejected_df.empty
+
+    def test_fast_path_matches_normalize(self):
+        """Test normalize_fast gives the same model and errors as normalize()"""
+        df = pd.concat([pd.read_csv(SAMPLE_FILE), pd.DataFrame([
+            {'member_id': '1', 'first_name': 'a', 'last_name': 'b', 'dob': '1980-1-5', 'gender': 'o',
+             'phone': '(555)1234567', 'email': 'Foo@EXAMPLE.com', 'zip5': '941-05', 'plan_id': 'P'},
+            {'member_id': '', 'first_name': '', 'last_name': 'b', 'dob': 'bad', 'gender': 'q',
+             'phone': '1', 'email': 'a', 'zip5': '9', 'plan_id': 'P'},
+            {'member_id': '3', 'first_name': 'a', 'last_name': 'b', 'dob': '1980-02-30', 'gender': 'F',
+             'phone': '555.123.4567', 'email': 'a@b.com', 'zip5': '9410A', 'plan_id': 'P'},
+        ])], ignore_index=True)
+
+        for row in df.to_dict(orient="records"):
+            slow, fast = RawMemberSchema(row), RawMemberSchema(row)
+            expected = slow.normalize()
+            actual = fast.normalize_fast()
+
+            assert fast.errors == slow.errors
+            if expected is None:
+                assert actual is None
+            else:
+                assert actual.model_dump() == expected.model_dump()
+                assert list(actual.model_dump()) == list(expected.model_dump())
+
+    def test_all_dash_zip_is_rejected_in_both_modes(self):
+        """Test an all-dash zip is one rejected row with the zip5 error, row by row and vectorized"""
+        raw_data = {'member_id': '1', 'first_name': 'a', 'last_name': 'b', 'dob': '1980-01-15', 'gender': 'M',
+                    'phone': '5551234567', 'email': 'a@b.com', 'zip5': '---', 'plan_id': 'P'}
+        df = pd.DataFrame([raw_data, dict(raw_data, member_id='2', zip5='-'), dict(raw_data, member_id='3', zip5='94105')])
+
+        record = RawMemberSchema(raw_data)
+        assert record.normalize_fast() is None
+        assert record.errors == ["zip5: Value error, Invalid zip code: must have 5 digits"]
+
+        valid, rejected = _row_by_row(df)
+        valid_df, rejected_df = validate_dataframe(df)
+        assert (len(valid), len(rejected)) == (1, 2)
+        assert valid_df.to_dict(orient="records") == valid
+        assert rejected_df["errors"].tolist() == rejected
@@ -0,0 +1,67 @@
+"""
+Test for watch_service.py
+"""
+import asyncio
+import sqlite3
+import time
+from pathlib import Path
+
+import pytest
+
+from src.watch_service import WatchFolderService
+
+SAMPLE_FILE = Path(__file__).parent.parent / "sample_inputs" / "sample_data.csv"
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+	# pipeline writes to relative data/ paths
+	monkeypatch.chdir(tmp_path)
+	return tmp_path
+
+
+def test_scan_waits_for_the_file_to_settle(workdir):
+	service = WatchFolderService("data/landing", max_workers=1, settle_seconds=0.2)
+	drop = Path("data/landing/client_001")
+	drop.mkdir(parents=True)
+	(drop / "members.csv.part").write_text("partial")
+	(drop / "members.csv").write_text("member_id\n")
+
+	assert service.scan() == []
+	with open(drop / "members.csv", "a") as f:
+		f.write("1\n")
+	time.sleep(0.25)
+	# changed since the last scan - settle timer restarts
+	assert service.scan() == []
+	time.sleep(0.25)
+	assert [(client_id, path.name) for client_id, path, _ in service.scan()] == [("client_001", "members.csv")]
+
+
+def test_dropped_files_are_ingested_and_archived(workdir):
+	results = []
+
+	async def run():
+		stop = asyncio.Event()
+
+		def on_result(result):
+			results.append(result)
+			if len(results) == 2:
+				stop.set()
+
+		service = WatchFolderService("data/landing", max_workers=2, queue_size=1, poll_interval=0.02,
+									 settle_seconds=0.05, on_result=on_result)
+		for client_id in ("client_001", "client_002"):
+			(Path("data/landing") / client_id).mkdir(parents=True)
+			(Path("data/landing") / client_id / "members.csv").write_text(SAMPLE_FILE.read_text())
+		await asyncio.wait_for(service.run(stop), timeout=60)
+
+	asyncio.run(run())
+
+	assert sorted((r["client_id"], r["status"], r["valid_row_count"]) for r in results) == [
+		("client_001", "success", 14), ("client_002", "success", 14)]
+	assert all(r["latency_seconds"] >= 0.05 for r in results)
+	assert sorted(p.parent.name for p in Path("data/landing/_processed").glob("*/members.csv")) == ["client_001", "client_002"]
+	assert not list(Path("data/landing").glob("client_*/*.csv"))
+	conn = sqlite3.connect("data/radiantgraphdemo.db")
+	assert conn.execute("SELECT COUNT(*) FROM members").fetchone()[0] == 28
+	conn.close()